@@ -0,0 +1,123 @@
+import threading
+from typing import Dict, Generator, List, Optional, Set
+
+import numpy as np
+
+class SemanticAnswerCache:
+    """
+    Caches final answers by query *meaning*: a new query whose embedding is
+    within 'threshold' cosine similarity of an answered one (against the same
+    index version) gets the stored answer back.
+
+    Lookup cost stays flat as the cache grows:
+      - up to 'exact_scan_limit' entries: one vectorized NumPy scan (exact)
+      - beyond that: multi-table random-hyperplane LSH picks a few hundred
+        candidates, which are then scored exactly
+    Storage is a fixed-capacity ring buffer (oldest answers are replaced first).
+    """
+    def __init__(self, capacity: int = 100_000, threshold: float = 0.95, exact_scan_limit: int = 4096,
+                 lsh_tables: int = 16, lsh_bits: int = 14, seed: int = 0):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.exact_scan_limit = exact_scan_limit
+        self.lsh_tables = lsh_tables
+        self.lsh_bits = lsh_bits
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stored": 0}
+        self._reset(dim=None, index_version=None)
+
+    def _reset(self, dim: Optional[int], index_version: Optional[int]):
+        self.dim = dim
+        self.index_version = index_version
+        self.count = 0
+        self.next_slot = 0
+        self._answers: List[Optional[str]] = [None] * self.capacity
+        self._queries: List[Optional[str]] = [None] * self.capacity
+        self._matrix = None
+        self._codes = None
+        self._buckets: List[Dict[int, Set[int]]] = [dict() for _ in range(self.lsh_tables)]
+        if dim is not None:
+            self._matrix = np.zeros((self.capacity, dim), dtype=np.float32)
+            self._codes = np.zeros((self.capacity, self.lsh_tables), dtype=np.int64)
+            self._planes = self._rng.standard_normal((self.lsh_tables * self.lsh_bits, dim)).astype(np.float32)
+            self._bit_weights = (1 << np.arange(self.lsh_bits, dtype=np.int64))
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _lsh_codes(self, v: np.ndarray) -> np.ndarray:
+        bits = (self._planes @ v > 0).reshape(self.lsh_tables, self.lsh_bits)
+        return bits.astype(np.int64) @ self._bit_weights
+
+    def _candidates(self, codes: np.ndarray) -> np.ndarray:
+        slots: Set[int] = set()
+        for table, code in enumerate(codes.tolist()):
+            slots.update(self._buckets[table].get(code, ()))
+        return np.fromiter(slots, dtype=np.int64, count=len(slots))
+
+    def lookup(self, query_vector, index_version: int) -> Optional[str]:
+        """Returns the cached answer for a semantically equivalent query, or None."""
+        with self._lock:
+            if self.count == 0 or index_version != self.index_version:
+                self._stats["misses"] += 1
+                return None
+            v = self._normalize(query_vector)
+            if self.count <= self.exact_scan_limit:
+                candidates = None
+                sims = self._matrix[:self.count] @ v
+            else:
+                candidates = self._candidates(self._lsh_codes(v))
+                if len(candidates) == 0:
+                    self._stats["misses"] += 1
+                    return None
+                sims = self._matrix[candidates] @ v
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                self._stats["misses"] += 1
+                return None
+            slot = best if candidates is None else int(candidates[best])
+            self._stats["hits"] += 1
+            return self._answers[slot]
+
+    def store(self, query: str, query_vector, answer: str, index_version: int):
+        with self._lock:
+            v = self._normalize(query_vector)
+            if self.dim is None or index_version != self.index_version:
+                # New index version: every stored answer may be outdated
+                self._reset(dim=len(v), index_version=index_version)
+
+            slot = self.next_slot
+            if self._answers[slot] is not None:
+                # Evict the previous occupant from the LSH tables
+                for table, code in enumerate(self._codes[slot].tolist()):
+                    self._buckets[table].get(code, set()).discard(slot)
+
+            codes = self._lsh_codes(v)
+            self._matrix[slot] = v
+            self._codes[slot] = codes
+            self._answers[slot] = answer
+            self._queries[slot] = query
+            for table, code in enumerate(codes.tolist()):
+                self._buckets[table].setdefault(code, set()).add(slot)
+
+            self.next_slot = (slot + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self._stats["stored"] += 1
+
+    @staticmethod
+    def replay(answer: str, chunk_chars: int = 64) -> Generator[str, None, None]:
+        """Streams a cached answer in chunks, like a live generation would."""
+        for i in range(0, len(answer), chunk_chars):
+            yield answer[i : i + chunk_chars]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self.count
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,114 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, Generic, List, Sequence, Tuple, TypeVar
+
+from langchain_core.embeddings import Embeddings
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Cross-request batching for model calls.
+    Concurrent callers submit lists of items; a single scheduler thread
+    gathers them for up to 'window_ms' (or until 'max_batch' items are
+    waiting), runs 'fn' once on the combined batch and hands every caller
+    back its own slice of the results. One forward pass instead of N
+    competing ones keeps throughput up under load.
+    """
+    def __init__(self, fn: Callable[[List[T]], Sequence[R]], name: str, max_batch: int = 128,
+                 window_ms: float = 5.0):
+        self.fn = fn
+        self.name = name
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self._queue: "queue.Queue[Tuple[List[T], Future]]" = queue.Queue()
+        self._pending_items = 0
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "requests": 0, "items": 0, "max_batch_items": 0, "last_batch_items": 0}
+        self._thread = threading.Thread(target=self._loop, name=f"batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, items: List[T]) -> "Future[List[R]]":
+        future: Future = Future()
+        if not items:
+            future.set_result([])
+            return future
+        with self._lock:
+            self._pending_items += len(items)
+        self._queue.put((list(items), future))
+        return future
+
+    def run(self, items: List[T]) -> List[R]:
+        """Blocking helper: submit and wait for this caller's results."""
+        return self.submit(items).result()
+
+    def _loop(self):
+        while True:
+            requests = [self._queue.get()]
+            n_items = len(requests[0][0])
+            deadline = time.monotonic() + self.window
+            while n_items < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                requests.append(request)
+                n_items += len(request[0])
+            self._run_batch(requests, n_items)
+
+    def _run_batch(self, requests: List[Tuple[List[T], Future]], n_items: int):
+        with self._lock:
+            self._pending_items -= n_items
+            self._stats["batches"] += 1
+            self._stats["requests"] += len(requests)
+            self._stats["items"] += n_items
+            self._stats["last_batch_items"] = n_items
+            self._stats["max_batch_items"] = max(self._stats["max_batch_items"], n_items)
+
+        batch = [item for items, _ in requests for item in items]
+        try:
+            results = self.fn(batch)
+        except Exception as e:
+            for _, future in requests:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for items, future in requests:
+            future.set_result(list(results[offset : offset + len(items)]))
+            offset += len(items)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["queue_depth"] = self._pending_items
+        stats["avg_batch_items"] = round(stats["items"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["avg_requests_per_batch"] = round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+class BatchedQueryEmbeddings(Embeddings):
+    """
+    Routes query embeddings from concurrent requests through a MicroBatcher.
+    Document embeddings (ingestion) are already batched and go straight through.
+    Note: batches are encoded with embed_documents, which is only correct for
+    models that encode queries and documents the same way (true for all-MiniLM-L6-v2).
+    """
+    def __init__(self, inner: Embeddings, max_batch: int = 64, window_ms: float = 3.0):
+        self.inner = inner
+        self.batcher = MicroBatcher(inner.embed_documents, name="embed", max_batch=max_batch, window_ms=window_ms)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.batcher.run([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Several queries submitted together (one forward pass, up to max_batch)."""
+        return self.batcher.run(texts)
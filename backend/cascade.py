@@ -0,0 +1,101 @@
+import time
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+# Tiers, cheapest first
+TIERS = ("dense", "fast", "precise")
+
+class RerankCascade:
+    """
+    Adaptive reranking of one query's dense candidates. Reranking only decides
+    which candidates make the top_n (and their order), so each tier stops as
+    soon as that is clear:
+      1. Dense: if the dense scores already separate the top_n from the rest
+         (gap at the cut >= skip_margin of the score range), no model runs.
+      2. Candidate count: only candidates within 'dense_window' (fraction of
+         the score range) of the best one go on, at least min_candidates.
+      3. Fast: every remaining candidate is scored by a small cross-encoder
+         (TinyBERT-L2). If its scores separate clearly at the top_n cut
+         (gap >= fast_margin), that ranking is used.
+      4. Precise: otherwise the uncertain top slice (fast scores within
+         fast_margin of the cut, at most precise_max) is rescored by the
+         full reranker and ranked first; the rest keep the fast order.
+    Dense scores may be on any scale (cosine, negated distance); reranker
+    scores are sigmoid probabilities. Skipped candidates get a None score.
+    """
+    def __init__(self, fast: Callable[[List[List[str]]], Sequence[float]],
+                 precise: Callable[[List[List[str]]], Sequence[float]],
+                 top_n: int = 5, min_candidates: int = 8, dense_window: float = 0.6,
+                 skip_margin: float = 0.35, fast_margin: float = 0.1, precise_max: int = 10):
+        self.fast = fast
+        self.precise = precise
+        self.top_n = top_n
+        self.min_candidates = min_candidates
+        self.dense_window = dense_window
+        self.skip_margin = skip_margin
+        self.fast_margin = fast_margin
+        self.precise_max = precise_max
+        self._lock = threading.Lock()
+        self._stats = {"queries": 0, "dense_candidates": 0, "reranked": 0, "precise_pairs": 0,
+                       **{f"tier_{tier}": 0 for tier in TIERS}}
+
+    def _dense_cut(self, scores: List[float]) -> Tuple[bool, int]:
+        """Returns (dense scores separate the top_n?, number of candidates to rerank)."""
+        n = len(scores)
+        spread = scores[0] - scores[-1] if n else 0.0
+        if n <= self.top_n:
+            return True, n  # Every candidate is used anyway
+        if spread > 0 and (scores[self.top_n - 1] - scores[self.top_n]) / spread >= self.skip_margin:
+            return True, n
+        floor = scores[0] - self.dense_window * spread
+        count = sum(1 for s in scores if s >= floor)
+        return False, min(n, max(count, self.min_candidates, self.top_n + 1))
+
+    def rank(self, query: str, hits: List[Tuple[Document, float]]) -> Tuple[List[Tuple[Document, Optional[float]]], dict]:
+        """
+        'hits': dense (Document, score) pairs, best first.
+        Returns (all candidates best first, with their final scores, and a
+        trace: tier, candidates reranked, precise pairs, seconds).
+        Raises if a reranker fails.
+        """
+        start = time.perf_counter()
+        scores = [float(s) for _, s in hits]
+        skip, count = self._dense_cut(scores)
+        if skip:
+            ranked = [(doc, None) for doc, _ in hits]
+            trace = {"tier": "dense", "candidates": 0, "precise": 0}
+        else:
+            docs = [doc for doc, _ in hits[:count]]
+            fast_scores = [float(s) for s in self.fast([[query, d.page_content] for d in docs])]
+            ranked = sorted(zip(docs, fast_scores), key=lambda x: x[1], reverse=True)
+            cut = ranked[self.top_n - 1][1]
+            if ranked[self.top_n][1] <= cut - self.fast_margin:
+                trace = {"tier": "fast", "candidates": count, "precise": 0}
+            else:
+                size = sum(1 for _, s in ranked if s >= cut - self.fast_margin)
+                size = min(max(size, self.top_n + 1), self.precise_max, len(ranked))
+                head = [doc for doc, _ in ranked[:size]]
+                precise_scores = [float(s) for s in self.precise([[query, d.page_content] for d in head])]
+                ranked = sorted(zip(head, precise_scores), key=lambda x: x[1], reverse=True) + ranked[size:]
+                trace = {"tier": "precise", "candidates": count, "precise": size}
+            ranked += [(doc, None) for doc, _ in hits[count:]]
+        trace["seconds"] = time.perf_counter() - start
+
+        with self._lock:
+            self._stats["queries"] += 1
+            self._stats["dense_candidates"] += len(hits)
+            self._stats["reranked"] += trace["candidates"]
+            self._stats["precise_pairs"] += trace["precise"]
+            self._stats[f"tier_{trace['tier']}"] += 1
+        return ranked, trace
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        queries = stats["queries"]
+        stats["avg_reranked"] = round(stats["reranked"] / queries, 1) if queries else 0.0
+        # Cross-encoder pairs avoided vs. scoring every dense candidate with the full reranker
+        stats["precise_pairs_saved"] = stats["dense_candidates"] - stats["precise_pairs"]
+        return stats
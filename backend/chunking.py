@@ -0,0 +1,215 @@
+import re
+import os
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+VISUAL_PREFIX = "[Visual Diagram"
+_HEADING_RE = re.compile(
+    r"^(\d+(\.\d+)*\.?\s+\S.*"          # 7.5.1 Interrupt Response Time
+    r"|[A-Z][A-Z0-9\-/&,()]*( [A-Z0-9\-/&,()]+)+"  # ELECTRICAL CHARACTERISTICS
+    r"|(Table|Figure|Section|Chapter)\s+[\dA-Z].*)$"
+)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\[(])")
+
+class TokenCounter:
+    """
+    Counts tokens with the reranker's WordPiece tokenizer when available
+    (that is the budget that matters for truncation), else estimates them.
+    """
+    def __init__(self, tokenizer_path: Optional[str] = None):
+        self._tokenizer = None
+        if tokenizer_path and os.path.exists(tokenizer_path):
+            try:
+                from tokenizers import Tokenizer
+                self._tokenizer = Tokenizer.from_file(tokenizer_path)
+                self._tokenizer.no_truncation()
+                self._tokenizer.no_padding()
+            except Exception as e:
+                print(f"⚠️ Tokenizer unavailable ({e}). Falling back to estimated token counts.")
+
+    def count(self, text: str) -> int:
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+        # ~1.3 WordPiece tokens per word/punctuation mark on technical English
+        return int(len(re.findall(r"\w+|[^\w\s]", text)) * 1.3)
+
+class Block:
+    """A unit the chunker won't split unless it alone exceeds the budget."""
+    __slots__ = ("kind", "text", "tokens")
+
+    def __init__(self, kind: str, text: str, tokens: int):
+        self.kind = kind      # "heading" | "text" | "table" | "visual"
+        self.text = text
+        self.tokens = tokens
+
+class Chunker:
+    """
+    Splits page Documents into token-budgeted chunks with overlap.
+    Boundaries follow the page structure: headings start a new chunk (and stay
+    attached to the text after them), tables and visual descriptions are kept
+    whole. Every chunk keeps the page's metadata ('page', 'source', ...) so
+    [Page X] citations keep working.
+    """
+    def __init__(self, max_tokens: int = 256, overlap_tokens: int = 32, counter: Optional[TokenCounter] = None,
+                 min_table_lines: int = 4):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        self.counter = counter or TokenCounter()
+        self.min_table_lines = min_table_lines
+
+    # --- Structure ---
+
+    @staticmethod
+    def _is_table_line(line: str) -> bool:
+        # PyMuPDF emits table cells as short lines, or as columns separated by runs of spaces/tabs
+        return len(line) <= 30 or "\t" in line or "|" in line or len(re.findall(r"\S {2,}\S", line)) >= 2
+
+    def _blocks(self, text: str) -> List[Block]:
+        blocks: List[Block] = []
+        paragraph: List[str] = []
+        table: List[str] = []
+
+        def flush_paragraph():
+            if paragraph:
+                joined = " ".join(paragraph)
+                blocks.append(Block("text", joined, self.counter.count(joined)))
+                paragraph.clear()
+
+        def flush_table():
+            if not table:
+                return
+            if len(table) >= self.min_table_lines:
+                flush_paragraph()
+                joined = "\n".join(table)
+                blocks.append(Block("table", joined, self.counter.count(joined)))
+            else:
+                paragraph.extend(table)  # A few short lines are just text
+            table.clear()
+
+        for raw in text.split("\n"):
+            line = raw.strip()
+            if not line:
+                flush_table()
+                flush_paragraph()
+            elif line.startswith(VISUAL_PREFIX):
+                flush_table()
+                flush_paragraph()
+                blocks.append(Block("visual", line, self.counter.count(line)))
+            elif table and self._is_table_line(line):
+                table.append(line)  # Inside a table, short lines are cells (even "RESET")
+            elif len(line) <= 80 and _HEADING_RE.match(line) and not line.endswith("."):
+                flush_table()
+                flush_paragraph()
+                blocks.append(Block("heading", line, self.counter.count(line)))
+            elif self._is_table_line(line):
+                table.append(line)
+            else:
+                flush_table()
+                paragraph.append(line)
+        flush_table()
+        flush_paragraph()
+        return blocks
+
+    def _split_oversized(self, block: Block, first_budget: Optional[int] = None) -> List[Block]:
+        """
+        Splits a block that exceeds the budget: by sentence (or line), then by words.
+        'first_budget' (optional) is a smaller budget for the first piece (the room left after a heading).
+        """
+        separator = "\n" if block.kind == "table" else " "
+        units = block.text.split("\n") if block.kind == "table" else _SENTENCE_RE.split(block.text)
+        pieces: List[Block] = []
+        current: List[str] = []
+        current_tokens = 0
+        budget = self.max_tokens if first_budget is None else max(1, first_budget)
+
+        def emit():
+            nonlocal current, current_tokens, budget
+            if current:
+                pieces.append(Block(block.kind, separator.join(current), current_tokens))
+            current, current_tokens, budget = [], 0, self.max_tokens
+
+        for unit in units:
+            unit_tokens = self.counter.count(unit)
+            if current and current_tokens + unit_tokens > budget:
+                emit()
+            words = unit.split(" ")
+            while unit_tokens > budget - current_tokens and len(words) > 1:
+                # Too long for what is left: cut by words, proportionally to the room
+                step = max(1, int(len(words) * (budget - current_tokens) / unit_tokens))
+                part = " ".join(words[:step])
+                current.append(part)
+                current_tokens += self.counter.count(part)
+                emit()
+                words = words[step:]
+                unit = " ".join(words)
+                unit_tokens = self.counter.count(unit)
+            current.append(unit)
+            current_tokens += unit_tokens
+        emit()
+        return pieces
+
+    def _overlap_tail(self, blocks: List[Block]) -> Optional[Block]:
+        """Trailing sentences of the previous chunk's last text block, up to the overlap budget."""
+        if self.overlap_tokens <= 0 or not blocks or blocks[-1].kind != "text":
+            return None
+        tail: List[str] = []
+        tokens = 0
+        for sentence in reversed(_SENTENCE_RE.split(blocks[-1].text)):
+            t = self.counter.count(sentence)
+            if tokens + t > self.overlap_tokens:
+                break
+            tail.insert(0, sentence)
+            tokens += t
+        return Block("text", " ".join(tail), tokens) if tail else None
+
+    # --- Packing ---
+
+    def split_text(self, text: str) -> List[str]:
+        chunks: List[List[Block]] = []
+        current: List[Block] = []
+        current_tokens = 0
+
+        def has_body(blocks: List[Block]) -> bool:
+            return any(b.kind != "heading" for b in blocks)
+
+        def close() -> bool:
+            """Emits the current chunk (never a heading-only one). True if it did."""
+            nonlocal current, current_tokens
+            if not has_body(current):
+                return False
+            chunks.append(current)
+            tail = self._overlap_tail(current)
+            current = [tail] if tail else []
+            current_tokens = tail.tokens if tail else 0
+            return True
+
+        for block in self._blocks(text):
+            room = self.max_tokens - current_tokens
+            if current and not has_body(current) and block.kind != "heading" and block.tokens > room > 0:
+                # Only headings so far: they stay, and the block starts in the room they leave
+                pieces = self._split_oversized(block, first_budget=room)
+            elif block.tokens > self.max_tokens:
+                pieces = self._split_oversized(block)
+            else:
+                pieces = [block]
+            for piece in pieces:
+                # A heading opens a new chunk rather than dangling at the end of one
+                starts_section = piece.kind == "heading" and has_body(current)
+                overflows = current_tokens + piece.tokens > self.max_tokens
+                if current and has_body(current) and (starts_section or overflows):
+                    if close() and (starts_section or current_tokens + piece.tokens > self.max_tokens):
+                        current, current_tokens = [], 0  # No overlap across sections / past the budget
+                current.append(piece)
+                current_tokens += piece.tokens
+        if has_body(current) or (current and not chunks):
+            chunks.append(current)
+
+        return ["\n".join(b.text for b in chunk) for chunk in chunks if chunk]
+
+    def split_documents(self, docs: List[Document]) -> List[Document]:
+        out = []
+        for doc in docs:
+            for i, text in enumerate(self.split_text(doc.page_content)):
+                out.append(Document(page_content=text, metadata={**doc.metadata, "chunk": i}))
+        return out
@@ -0,0 +1,46 @@
+import asyncio
+from typing import Optional
+
+class Overloaded(Exception):
+    """Raised when a request can't be admitted (queue full or queued too long)."""
+
+class ConcurrencyLimiter:
+    """
+    Caps how many requests run at once. Extra requests wait in a bounded
+    queue; once that queue is full (or a request waits longer than
+    'queue_timeout' seconds) they are shed with Overloaded, so the requests
+    already running keep their latency.
+    """
+    def __init__(self, max_active: int, max_waiting: int, queue_timeout: float):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_active)
+        if self.active >= self.max_active and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise Overloaded("Server is at capacity. Please retry shortly.")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded("Timed out waiting for a free slot. Please retry shortly.")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {"active": self.active, "waiting": self.waiting, "rejected": self.rejected,
+                "max_active": self.max_active, "max_waiting": self.max_waiting}
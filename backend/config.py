@@ -0,0 +1,238 @@
+import os
+from dotenv import load_dotenv
+
+# Central place for tunables. Everything is read from the environment (or .env)
+# so deployments can be tuned without touching code.
+load_dotenv()
+
+def _int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+def _float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+def _bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in {"1", "true", "yes", "on"}
+
+# --- Ingestion Jobs ---
+# How many uploads may run the ingestion pipeline at the same time.
+# Kept low on purpose so /chat keeps its CPU while bulk uploads are processed.
+MAX_CONCURRENT_JOBS = _int("MAX_CONCURRENT_JOBS", 1)
+# How many jobs may wait in the queue before /upload starts rejecting (HTTP 429).
+MAX_QUEUED_JOBS = _int("MAX_QUEUED_JOBS", 20)
+# How many finished jobs are remembered for /jobs/{id} lookups.
+JOB_HISTORY_SIZE = _int("JOB_HISTORY_SIZE", 200)
+# Job state shared by all worker processes (serve.py), so /jobs/{id} polls can land on any
+# worker. Empty = in-memory only (single worker).
+JOB_STATE_DIR = os.getenv("JOB_STATE_DIR", "./data/jobs")
+
+# --- PDF Extraction ---
+# Worker processes for page extraction. 1 = in-process (default), 0 = one per CPU core.
+EXTRACT_WORKERS = _int("EXTRACT_WORKERS", 1)
+# Documents shorter than 2x this many pages are always extracted in-process.
+EXTRACT_MIN_PAGES_PER_WORKER = _int("EXTRACT_MIN_PAGES_PER_WORKER", 8)
+# Pages are extracted and their images described this many at a time, so the image
+# bytes held in memory do not grow with the length of the document
+EXTRACT_MAX_PAGES_PER_RANGE = _int("EXTRACT_MAX_PAGES_PER_RANGE", 32)
+
+# --- Vision (image descriptions) ---
+# "gemini" (default) or "stub" (deterministic offline descriptions, no network)
+VISION_BACKEND = os.getenv("VISION_BACKEND", "gemini").lower()
+# Max concurrent vision requests, shared by all ingestion jobs
+VISION_MAX_IN_FLIGHT = _int("VISION_MAX_IN_FLIGHT", 4)
+VISION_MAX_RETRIES = _int("VISION_MAX_RETRIES", 3)
+VISION_BACKOFF_SECONDS = _float("VISION_BACKOFF_SECONDS", 1.0)
+# Images with a side shorter than this are skipped (bullets, icons, rules)
+VISION_MIN_SIDE = _int("VISION_MIN_SIDE", 32)
+# Images larger than this are downscaled before upload
+VISION_MAX_SIDE = _int("VISION_MAX_SIDE", 1568)
+VISION_CACHE_DIR = os.getenv("VISION_CACHE_DIR", "./data/vision_cache")
+
+# --- Uploads ---
+# Content-addressed upload storage (files are stored once per distinct content)
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./data/uploads")
+UPLOAD_MAX_MB = _int("UPLOAD_MAX_MB", 100)
+# Uploads are streamed to disk in chunks of this size
+UPLOAD_CHUNK_KB = _int("UPLOAD_CHUNK_KB", 1024)
+# Stored files are deleted after this many days without being re-uploaded,
+# or oldest-first once the store grows past UPLOAD_STORE_MAX_GB.
+# Files of documents that are still indexed are never deleted.
+UPLOAD_RETENTION_DAYS = _float("UPLOAD_RETENTION_DAYS", 30)
+UPLOAD_STORE_MAX_GB = _float("UPLOAD_STORE_MAX_GB", 10)
+
+# --- Document Serving ---
+# PDFs addressed by content hash never change: browsers may cache them this long
+DOCUMENT_CACHE_MAX_AGE_SECONDS = _int("DOCUMENT_CACHE_MAX_AGE_SECONDS", 31_536_000)
+# Low-resolution page previews for citations, rendered during ingestion
+THUMBNAILS_ENABLED = _bool("THUMBNAILS_ENABLED", True)
+THUMBNAIL_DIR = os.getenv("THUMBNAIL_DIR", os.path.join(UPLOAD_DIR, "thumbnails"))
+THUMBNAIL_WIDTH = _int("THUMBNAIL_WIDTH", 200)     # Pixels
+THUMBNAIL_QUALITY = _int("THUMBNAIL_QUALITY", 70)  # JPEG quality
+
+# --- DOCX Conversion (LibreOffice) ---
+OFFICE_BINARY = os.getenv("OFFICE_BINARY", "libreoffice")
+# "auto" (default): long-lived workers driven over UNO if the 'uno' bindings are installed,
+# otherwise a fresh process per file. Force with "pool" / "spawn".
+OFFICE_MODE = os.getenv("OFFICE_MODE", "auto").lower()
+# Concurrent conversions (each worker has its own LibreOffice profile)
+OFFICE_WORKERS = _int("OFFICE_WORKERS", 1)
+OFFICE_TIMEOUT_SECONDS = _float("OFFICE_TIMEOUT_SECONDS", 120)
+# Converted PDFs keyed by the SHA-256 of the DOCX
+CONVERSION_CACHE_DIR = os.getenv("CONVERSION_CACHE_DIR", "./data/conversion_cache")
+# Results are hard-linked into the upload store and cost no extra space while their stored
+# PDF exists. Once it is deleted (upload retention), they are evicted oldest-first past this size
+CONVERSION_CACHE_MAX_GB = _float("CONVERSION_CACHE_MAX_GB", 2)
+
+# --- Index ---
+CHROMA_DIR = os.getenv("CHROMA_DIR", "./data/chroma_db")
+# Records file hash + per-page content hashes of everything in the index
+INDEX_MANIFEST_PATH = os.getenv("INDEX_MANIFEST_PATH", "./data/index_manifest.json")
+# Vectors are partitioned per document (one Chroma collection each). Where queries are served from:
+#   "chroma" (default): the Chroma collections themselves
+#   "snapshot": immutable, memory-mapped exports of them (shared by all workers, swapped after each ingest)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+VECTOR_SNAPSHOT_DIR = os.getenv("VECTOR_SNAPSHOT_DIR", "./data/vector_snapshots")  # One sub-directory per document
+# "f16" (default) or "int8" (half the size, per-row scale; tiny recall loss)
+VECTOR_SNAPSHOT_QUANTIZATION = os.getenv("VECTOR_SNAPSHOT_QUANTIZATION", "f16").lower()
+# Threads searching partitions in parallel for unscoped (all-document) queries
+PARTITION_SEARCH_WORKERS = _int("PARTITION_SEARCH_WORKERS", 4)
+
+# --- Embeddings ---
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_CACHE_ENABLED = _bool("EMBEDDING_CACHE_ENABLED", True)
+# On-disk cache directory; a subdirectory per model keeps caches from going stale.
+# Safe to share between processes (serve.py workers, bulk_ingest.py): writes are locked
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./data/embedding_cache")
+# Max vectors kept on disk (float16, so 384-dim x 200k ~ 150 MB); oldest are reused first
+EMBEDDING_CACHE_MAX_ENTRIES = _int("EMBEDDING_CACHE_MAX_ENTRIES", 200_000)
+# In-process LRU for hot query embeddings
+EMBEDDING_QUERY_LRU_SIZE = _int("EMBEDDING_QUERY_LRU_SIZE", 2048)
+# Ingestion: chunks embedded (and written to Chroma) per batch. Larger = better CPU use, more memory.
+INGEST_BATCH_SIZE = _int("INGEST_BATCH_SIZE", 256)
+# Texts per model forward pass within a batch
+EMBED_ENCODE_BATCH_SIZE = _int("EMBED_ENCODE_BATCH_SIZE", 64)
+
+# --- Retrieval ---
+# Candidates fetched from the vector store, and how many survive reranking
+RETRIEVAL_K = _int("RETRIEVAL_K", 25)
+RERANK_TOP_N = _int("RERANK_TOP_N", 5)
+# Normalized query -> reranked top-N cache (invalidated whenever the index changes)
+RETRIEVAL_CACHE_ENABLED = _bool("RETRIEVAL_CACHE_ENABLED", True)
+RETRIEVAL_CACHE_SIZE = _int("RETRIEVAL_CACHE_SIZE", 1024)
+RETRIEVAL_CACHE_TTL_SECONDS = _float("RETRIEVAL_CACHE_TTL_SECONDS", 600)
+
+# --- Context Packing ---
+# Reranked passages are packed (best first) into at most CONTEXT_MAX_TOKENS prompt tokens:
+# near-duplicates (shingle containment >= CONTEXT_DEDUP_THRESHOLD) are dropped and passages
+# longer than CONTEXT_PASSAGE_MAX_TOKENS are trimmed to the sentences closest to the question
+CONTEXT_PACKING_ENABLED = _bool("CONTEXT_PACKING_ENABLED", True)
+CONTEXT_MAX_TOKENS = _int("CONTEXT_MAX_TOKENS", 1200)
+CONTEXT_PASSAGE_MAX_TOKENS = _int("CONTEXT_PASSAGE_MAX_TOKENS", 400)
+CONTEXT_DEDUP_THRESHOLD = _float("CONTEXT_DEDUP_THRESHOLD", 0.8)
+
+# --- Semantic Answer Cache (optional) ---
+# Replays the stored answer when a new question is this close (cosine) to an answered one
+ANSWER_CACHE_ENABLED = _bool("ANSWER_CACHE_ENABLED", False)
+ANSWER_CACHE_THRESHOLD = _float("ANSWER_CACHE_THRESHOLD", 0.95)
+ANSWER_CACHE_SIZE = _int("ANSWER_CACHE_SIZE", 100_000)
+
+# --- Reranker ---
+# "cross-encoder" (PyTorch, default), "onnx-minilm" or "onnx-tinybert" (bundled FlashRank models)
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "cross-encoder").lower()
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANKER_ONNX_DIRS = {
+    "minilm": os.getenv("RERANKER_ONNX_MINILM_DIR", "./data/flashrank/ms-marco-MiniLM-L-12-v2"),
+    "tinybert": os.getenv("RERANKER_ONNX_TINYBERT_DIR", "./data/flashrank_cache/ms-marco-TinyBERT-L-2-v2"),
+}
+RERANKER_MAX_LENGTH = _int("RERANKER_MAX_LENGTH", 512)
+# onnxruntime intra-op threads (0 = let onnxruntime decide)
+RERANKER_INTRA_OP_THREADS = _int("RERANKER_INTRA_OP_THREADS", 0)
+# "full" (default): the reranker scores all RETRIEVAL_K candidates.
+# "cascade": adaptive (see backend/cascade.py) - no reranking when the dense scores separate the
+# top-N by RERANK_CASCADE_SKIP_MARGIN of their range; otherwise the candidates within
+# RERANK_CASCADE_DENSE_WINDOW of the best one get a TinyBERT pass, and only the uncertain
+# top slice (within RERANK_CASCADE_FAST_MARGIN of the cut) goes to the reranker above
+# Needs the TinyBERT .onnx model in RERANKER_ONNX_DIRS["tinybert"] (not shipped; copy it from a
+# FlashRank cache). Without it the engine warns and falls back to "full".
+RERANK_MODE = os.getenv("RERANK_MODE", "full").lower()
+RERANK_CASCADE_MIN_CANDIDATES = _int("RERANK_CASCADE_MIN_CANDIDATES", 8)
+RERANK_CASCADE_DENSE_WINDOW = _float("RERANK_CASCADE_DENSE_WINDOW", 0.6)
+RERANK_CASCADE_SKIP_MARGIN = _float("RERANK_CASCADE_SKIP_MARGIN", 0.35)
+RERANK_CASCADE_FAST_MARGIN = _float("RERANK_CASCADE_FAST_MARGIN", 0.1)
+RERANK_CASCADE_PRECISE_MAX = _int("RERANK_CASCADE_PRECISE_MAX", 10)
+# Print the tier and candidate counts of every cascaded query (always exported with the rerank span)
+RERANK_CASCADE_LOG = _bool("RERANK_CASCADE_LOG", True)
+
+# --- Chunking ---
+# Pages are split into chunks of at most this many (reranker) tokens before indexing
+CHUNKING_ENABLED = _bool("CHUNKING_ENABLED", True)
+CHUNK_MAX_TOKENS = _int("CHUNK_MAX_TOKENS", 256)
+CHUNK_OVERLAP_TOKENS = _int("CHUNK_OVERLAP_TOKENS", 32)
+# WordPiece tokenizer used to count tokens (falls back to an estimate if missing)
+CHUNK_TOKENIZER_PATH = os.getenv("CHUNK_TOKENIZER_PATH", "./data/flashrank/ms-marco-MiniLM-L-12-v2/tokenizer.json")
+
+# --- Answer LLM ---
+# "gemini" (default) or "stub": a deterministic local model that streams at a fixed
+# rate (no network, no quota), for load tests of retrieval/rerank/streaming capacity
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+STUB_LLM_TOKENS_PER_SECOND = _float("STUB_LLM_TOKENS_PER_SECOND", 50)
+STUB_LLM_FIRST_TOKEN_MS = _float("STUB_LLM_FIRST_TOKEN_MS", 200)
+STUB_LLM_ANSWER_TOKENS = _int("STUB_LLM_ANSWER_TOKENS", 60)
+
+# --- Chat Serving ---
+# Threads for CPU-bound retrieval work (embedding, vector search, reranking) of /chat requests
+CPU_EXECUTOR_WORKERS = _int("CPU_EXECUTOR_WORKERS", min(4, os.cpu_count() or 1))
+# Concurrent /chat streams; beyond this requests wait in a queue of CHAT_MAX_QUEUED,
+# and are rejected with 503 when the queue is full or they wait too long
+CHAT_MAX_CONCURRENT = _int("CHAT_MAX_CONCURRENT", 32)
+CHAT_MAX_QUEUED = _int("CHAT_MAX_QUEUED", 64)
+CHAT_QUEUE_TIMEOUT_SECONDS = _float("CHAT_QUEUE_TIMEOUT_SECONDS", 10)
+
+# --- Conversations (/chat with a session_id) ---
+# In-memory sessions: LRU-bounded, dropped after SESSION_TTL_SECONDS idle
+SESSION_MAX = _int("SESSION_MAX", 1000)
+SESSION_TTL_SECONDS = _float("SESSION_TTL_SECONDS", 1800)
+# History in the prompt: the last SESSION_RECENT_TURNS turns (answers cut to SESSION_ANSWER_MAX_TOKENS),
+# older turns compacted to one line each (oldest dropped first past SESSION_HISTORY_MAX_TOKENS)
+SESSION_RECENT_TURNS = _int("SESSION_RECENT_TURNS", 3)
+SESSION_ANSWER_MAX_TOKENS = _int("SESSION_ANSWER_MAX_TOKENS", 80)
+SESSION_HISTORY_MAX_TOKENS = _int("SESSION_HISTORY_MAX_TOKENS", 400)
+# Follow-ups are reranked against the session's SESSION_RERANK_CANDIDATES best earlier candidates
+# (pool of SESSION_MAX_CANDIDATES); a new search runs only if the best score is below SESSION_REUSE_MIN_SCORE
+SESSION_MAX_CANDIDATES = _int("SESSION_MAX_CANDIDATES", 60)
+SESSION_RERANK_CANDIDATES = _int("SESSION_RERANK_CANDIDATES", 12)
+SESSION_REUSE_MIN_SCORE = _float("SESSION_REUSE_MIN_SCORE", 0.5)
+
+# /chat/batch: questions per request, concurrent batch requests, LLM calls in flight per
+# batch, and how many questions share one reranker forward pass
+CHAT_BATCH_MAX_QUESTIONS = _int("CHAT_BATCH_MAX_QUESTIONS", 200)
+CHAT_BATCH_MAX_CONCURRENT = _int("CHAT_BATCH_MAX_CONCURRENT", 2)
+CHAT_BATCH_GENERATION_CONCURRENCY = _int("CHAT_BATCH_GENERATION_CONCURRENCY", 8)
+CHAT_BATCH_RERANK_GROUP = _int("CHAT_BATCH_RERANK_GROUP", 16)
+
+# --- Cross-Request Micro-Batching ---
+# Rerank pairs / query embeddings from concurrent requests are gathered for up to
+# *_WINDOW_MS (or until *_MAX items are waiting) and run as one batch
+BATCHING_ENABLED = _bool("BATCHING_ENABLED", True)
+RERANK_BATCH_WINDOW_MS = _float("RERANK_BATCH_WINDOW_MS", 5)
+RERANK_BATCH_MAX_PAIRS = _int("RERANK_BATCH_MAX_PAIRS", 200)
+EMBED_BATCH_WINDOW_MS = _float("EMBED_BATCH_WINDOW_MS", 3)
+EMBED_BATCH_MAX = _int("EMBED_BATCH_MAX", 64)
+
+# --- Startup ---
+# "background" (default): bind immediately, load + warm up models in a thread (/ready flips when done)
+# "eager": load everything before the server starts accepting requests
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background").lower()
+# Run one throwaway inference per model at startup so the first query is fast
+WARMUP_ENABLED = _bool("WARMUP_ENABLED", True)
+
+# --- Telemetry ---
+# Per-stage latency histograms (served by /metrics in the Prometheus text format)
+TELEMETRY_ENABLED = _bool("TELEMETRY_ENABLED", True)
+# Optional JSON Lines file receiving every span, written in batches by a background thread
+TELEMETRY_EXPORT_PATH = os.getenv("TELEMETRY_EXPORT_PATH", "")
+TELEMETRY_EXPORT_INTERVAL_SECONDS = _float("TELEMETRY_EXPORT_INTERVAL_SECONDS", 2)
+# Sampling profiler: /chat requests slower than this are saved as folded stacks to PROFILE_DIR (0 = off)
+PROFILE_SLOW_REQUESTS_MS = _float("PROFILE_SLOW_REQUESTS_MS", 0)
+PROFILE_SAMPLE_INTERVAL_MS = _float("PROFILE_SAMPLE_INTERVAL_MS", 10)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./data/profiles")
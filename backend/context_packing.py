@@ -0,0 +1,176 @@
+import re
+import threading
+from typing import List, Optional, Set
+
+from langchain_core.documents import Document
+
+from backend.chunking import TokenCounter, VISUAL_PREFIX, _SENTENCE_RE
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:[._\-][a-z0-9]+)*")
+# Words that say nothing about what a sentence is about
+_STOPWORDS = {
+    "the", "and", "for", "are", "was", "what", "which", "how", "does", "this", "that", "with", "from",
+    "its", "into", "when", "where", "who", "why", "can", "will", "has", "have", "there", "their",
+    "about", "than", "then", "also", "all", "any", "each", "per", "not", "but", "use", "used",
+}
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+class PackedContext:
+    """The prompt context for one question, and what packing saved."""
+    __slots__ = ("text", "passages", "tokens", "tokens_before", "duplicates", "trimmed")
+
+    def __init__(self, text: str, passages: List[Document], tokens: int, tokens_before: int,
+                 duplicates: int, trimmed: int):
+        self.text = text
+        self.passages = passages        # Documents actually used (trimmed content)
+        self.tokens = tokens
+        self.tokens_before = tokens_before
+        self.duplicates = duplicates
+        self.trimmed = trimmed
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_before - self.tokens)
+
+    def to_dict(self) -> dict:
+        return {"tokens": self.tokens, "tokens_saved": self.tokens_saved,
+                "duplicates_dropped": self.duplicates, "passages_trimmed": self.trimmed}
+
+class ContextPacker:
+    """
+    Builds the prompt context from reranked passages under a token budget:
+      1. Passages are taken in rank order (best reranker score first).
+      2. Near-duplicates of an already packed passage are dropped (word
+         shingle containment: repeated register tables, repeated vision
+         descriptions, chunk overlaps).
+      3. A passage longer than its share of the budget is trimmed to the
+         sentences (or table rows) that share the most words with the
+         question, kept in their original order.
+    Every passage keeps its [Page X] label, so citations keep working.
+    """
+    def __init__(self, max_tokens: int = 1200, passage_max_tokens: int = 400, dedup_threshold: float = 0.8,
+                 shingle_size: int = 3, counter: Optional[TokenCounter] = None, min_passage_tokens: int = 24):
+        self.max_tokens = max_tokens
+        self.passage_max_tokens = passage_max_tokens
+        self.dedup_threshold = dedup_threshold
+        self.shingle_size = shingle_size
+        self.counter = counter or TokenCounter()
+        self.min_passage_tokens = min_passage_tokens
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "tokens": 0, "tokens_saved": 0, "duplicates_dropped": 0, "passages_trimmed": 0}
+
+    @staticmethod
+    def label(doc: Document) -> str:
+        return f"[Page {doc.metadata.get('page', '?')}]"
+
+    def _shingles(self, text: str) -> Set[tuple]:
+        words = _words(text)
+        n = self.shingle_size
+        if len(words) < n:
+            return {tuple(words)} if words else set()
+        return {tuple(words[i : i + n]) for i in range(len(words) - n + 1)}
+
+    def _is_duplicate(self, shingles: Set[tuple], kept: List[Set[tuple]]) -> bool:
+        # Containment rather than Jaccard: a page that repeats a table already sent is a duplicate
+        for other in kept:
+            smaller = min(len(shingles), len(other))
+            if smaller and len(shingles & other) / smaller >= self.dedup_threshold:
+                return True
+        return False
+
+    @staticmethod
+    def _units(text: str) -> List[str]:
+        """Sentences of running text; lines of tables and visual descriptions."""
+        units = []
+        for line in text.split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith(VISUAL_PREFIX) or len(line) <= 80:
+                units.append(line)
+            else:
+                units.extend(s for s in _SENTENCE_RE.split(line) if s)
+        return units
+
+    def _trim(self, text: str, query_terms: Set[str], budget: int) -> str:
+        """Keeps the units most relevant to the question that fit in 'budget' tokens, in reading order."""
+        units = self._units(text)
+        if not units:
+            return ""
+        tokens = [self.counter.count(u) for u in units]
+        relevance = [len(query_terms.intersection(_words(u))) for u in units]
+        # Best matches first; ties go to the earlier unit (headings and definitions come first).
+        # Units sharing no word with the question are only used when none does.
+        order = sorted(range(len(units)), key=lambda i: (-relevance[i], i))
+        if relevance[order[0]] > 0:
+            order = [i for i in order if relevance[i] > 0]
+        chosen, used = [], 0
+        for i in order:
+            if used + tokens[i] <= budget:
+                chosen.append(i)
+                used += tokens[i]
+        chosen.sort()
+
+        out = []
+        for prev, i in zip([None] + chosen, chosen):
+            if prev is not None and i != prev + 1:
+                out.append("…")  # Marks skipped sentences
+            out.append(units[i])
+        return "\n".join(out)
+
+    def pack(self, query: str, docs: List[Document]) -> PackedContext:
+        """'docs' in rank order (best first)."""
+        query_terms = {w for w in _words(query) if len(w) > 2 and w not in _STOPWORDS}
+        remaining = self.max_tokens
+        tokens_before = 0
+        kept_shingles: List[Set[tuple]] = []
+        parts: List[str] = []
+        passages: List[Document] = []
+        duplicates = trimmed = 0
+
+        for doc in docs:
+            label = self.label(doc)
+            content = doc.page_content.strip()
+            content_tokens = self.counter.count(content)
+            tokens_before += content_tokens + self.counter.count(label)
+
+            shingles = self._shingles(content)
+            if self._is_duplicate(shingles, kept_shingles):
+                duplicates += 1
+                continue
+
+            budget = min(self.passage_max_tokens, remaining - self.counter.count(label))
+            if budget < self.min_passage_tokens:
+                continue  # Budget spent: lower-ranked passages are left out
+            if content_tokens > budget:
+                content = self._trim(content, query_terms, budget)
+                if not content:
+                    continue
+                trimmed += 1
+
+            part = f"{label} {content}"
+            part_tokens = self.counter.count(part)
+            remaining -= part_tokens
+            parts.append(part)
+            kept_shingles.append(shingles)
+            passages.append(Document(id=doc.id, page_content=content, metadata=doc.metadata))
+
+        packed = PackedContext("\n\n".join(parts), passages, self.max_tokens - remaining,
+                               tokens_before, duplicates, trimmed)
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["tokens"] += packed.tokens
+            self._stats["tokens_saved"] += packed.tokens_saved
+            self._stats["duplicates_dropped"] += duplicates
+            self._stats["passages_trimmed"] += trimmed
+        return packed
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        requests = stats["requests"]
+        stats["avg_tokens"] = round(stats["tokens"] / requests, 1) if requests else 0.0
+        stats["avg_tokens_saved"] = round(stats["tokens_saved"] / requests, 1) if requests else 0.0
+        return stats
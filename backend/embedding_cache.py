@@ -0,0 +1,278 @@
+import os
+import json
+import fcntl
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+KEY_BYTES = 16  # blake2b digest size; 128 bits is plenty for text identity
+
+def text_key(text: str, kind: str) -> bytes:
+    # 'kind' keeps query and document embeddings apart (some models embed them differently)
+    return hashlib.blake2b(f"{kind}\x00{text}".encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+class DiskVectorStore:
+    """
+    Fixed-capacity key -> vector store backed by two memory-mapped files:
+      vectors.f16  (capacity x dim, float16)
+      keys.bin     (capacity x 16 bytes)
+    plus meta.json. Slots are reused in FIFO order once the store is full,
+    so disk usage is bounded by 'capacity'.
+    Several processes (serve.py workers, bulk_ingest.py) may share one store:
+    writes take an fcntl lock and allocate slots from the next_slot stored
+    on disk. A slot's key is cleared before its vector is replaced, and
+    readers check the key before and after copying the vector, so a key
+    never returns another text's vector.
+    """
+    def __init__(self, directory: str, capacity: int, model_name: str):
+        self.directory = directory
+        self.capacity = capacity
+        self.model_name = model_name
+        self.dim: Optional[int] = None
+        self.next_slot = 0  # As last seen on disk
+        self._index: Dict[bytes, int] = {}
+        self._vectors = None
+        self._keys = None
+        self._dirty = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, "meta.json")
+
+    @contextmanager
+    def _file_lock(self):
+        with open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_meta(self) -> Optional[dict]:
+        """meta.json if it belongs to this model and capacity, else None."""
+        try:
+            with open(self._meta_path, "r") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if meta.get("model_name") != self.model_name or meta.get("capacity") != self.capacity:
+            return None
+        return meta
+
+    def _write_meta(self):
+        tmp_path = f"{self._meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"model_name": self.model_name, "dim": self.dim,
+                       "capacity": self.capacity, "next_slot": self.next_slot}, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _open(self):
+        self._vectors = np.memmap(os.path.join(self.directory, "vectors.f16"), dtype=np.float16,
+                                  mode="r+", shape=(self.capacity, self.dim))
+        self._keys = np.memmap(os.path.join(self.directory, "keys.bin"), dtype=np.uint8,
+                               mode="r+", shape=(self.capacity, KEY_BYTES))
+
+    def _create(self, dim: int):
+        """Starts an empty store (under the file lock, when meta.json is missing or stale)."""
+        self.dim = dim
+        for name, row_bytes in (("vectors.f16", dim * 2), ("keys.bin", KEY_BYTES)):
+            with open(os.path.join(self.directory, name), "a+b") as f:
+                f.truncate(0)  # Zeroed: all-zero keys are empty slots
+                f.truncate(self.capacity * row_bytes)
+        self._open()
+        self._index = {}
+        self.next_slot = 0
+        self._write_meta()
+
+    def _load(self):
+        if not os.path.exists(self._meta_path):
+            return
+        meta = self._read_meta()
+        if meta is None:
+            print("⚠️ Embedding cache does not match the current model/capacity. Starting fresh.")
+            return
+        self.dim = meta["dim"]
+        self.next_slot = meta["next_slot"]
+        self._open()
+        # Rebuild the in-memory index from the key file (all-zero rows are empty slots)
+        used = np.flatnonzero(self._keys.any(axis=1))
+        self._index = {self._keys[slot].tobytes(): int(slot) for slot in used}
+        print(f"📦 Embedding cache loaded: {len(self._index)} vectors.")
+
+    def _catch_up(self, next_slot: int):
+        """Indexes the slots other processes wrote since we last saw next_slot."""
+        for i in range((next_slot - self.next_slot) % self.capacity):
+            slot = (self.next_slot + i) % self.capacity
+            key = self._keys[slot].tobytes()
+            if any(key):
+                self._index[key] = slot
+        self.next_slot = next_slot
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            out = []
+            for key in keys:
+                slot = self._index.get(key)
+                # The slot may be reused by another process at any time: the key
+                # must match before and after the vector is copied
+                if slot is None or self._keys[slot].tobytes() != key:
+                    out.append(None)
+                    continue
+                vector = np.array(self._vectors[slot], dtype=np.float32)
+                out.append(vector if self._keys[slot].tobytes() == key else None)
+            return out
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray):
+        with self._lock, self._file_lock():
+            meta = self._read_meta()
+            if meta is None:
+                self._create(int(vectors.shape[1]))
+            else:
+                if self._vectors is None:
+                    self.dim = meta["dim"]
+                    self._open()
+                self._catch_up(meta["next_slot"])
+            for key, vector in zip(keys, vectors):
+                if key in self._index:
+                    continue
+                slot = self.next_slot
+                # Evict whatever lived in this slot before (FIFO)
+                old_key = self._keys[slot].tobytes()
+                if self._index.get(old_key) == slot:
+                    del self._index[old_key]
+                self._keys[slot] = 0                                   # Key cleared, vector replaced,
+                self._vectors[slot] = vector                           # then the new key: a key never
+                self._keys[slot] = np.frombuffer(key, dtype=np.uint8)  # points at another vector
+                self._index[key] = slot
+                self.next_slot = (slot + 1) % self.capacity
+                self._dirty += 1
+            self._write_meta()  # Slots are allocated from disk: the next writer continues from here
+            if self._dirty >= 256:
+                self._flush()
+
+    def _flush(self):
+        if self._vectors is None:
+            return
+        self._vectors.flush()
+        self._keys.flush()
+        self._dirty = 0
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings model with:
+      - a persistent, bounded on-disk cache (text hash -> float16 vector)
+      - an in-process LRU for hot query embeddings
+    The on-disk cache lives in a directory named after the model, so a model
+    change can never serve stale vectors.
+    """
+    def __init__(self, inner: Embeddings, model_name: str, cache_dir: str,
+                 max_entries: int = 200_000, query_cache_size: int = 2048):
+        self.inner = inner
+        self.model_name = model_name
+        slug = model_name.replace("/", "__")
+        self.store = DiskVectorStore(os.path.join(cache_dir, slug), max_entries, model_name)
+        self.query_cache_size = query_cache_size
+        self._query_lru: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        self._lru_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"query_lru_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _count(self, key: str, n: int = 1):
+        if n:
+            with self._stats_lock:
+                self._stats[key] += n
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["query_lru_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+        stats["disk_entries"] = len(self.store)
+        return stats
+
+    def _embed_cached(self, texts: List[str], kind: str) -> List[List[float]]:
+        keys = [text_key(t, kind) for t in texts]
+        cached = self.store.get_many(keys)
+
+        # Embed each distinct missing text once
+        missing: Dict[bytes, str] = {}
+        for key, text, vector in zip(keys, texts, cached):
+            if vector is None:
+                missing.setdefault(key, text)
+        self._count("disk_hits", len(texts) - sum(1 for v in cached if v is None))
+        self._count("misses", len(missing))
+
+        fresh: Dict[bytes, np.ndarray] = {}
+        if missing:
+            miss_texts = list(missing.values())
+            if kind == "query":
+                embed_queries = getattr(self.inner, "embed_queries", None)
+                if embed_queries:
+                    vectors = embed_queries(miss_texts)
+                else:
+                    vectors = [self.inner.embed_query(t) for t in miss_texts]
+            else:
+                vectors = self.inner.embed_documents(miss_texts)
+            matrix = np.asarray(vectors, dtype=np.float32)
+            self.store.put_many(list(missing), matrix)
+            fresh = dict(zip(missing, matrix))
+
+        return [(v if v is not None else fresh[k]).tolist() for k, v in zip(keys, cached)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_cached(texts, "doc")
+
+    def embed_query(self, text: str) -> List[float]:
+        key = text_key(text, "query")
+        with self._lru_lock:
+            if key in self._query_lru:
+                self._query_lru.move_to_end(key)
+                self._count("query_lru_hits")
+                return self._query_lru[key]
+
+        vector = self._embed_cached([text], "query")[0]
+        with self._lru_lock:
+            self._query_lru[key] = vector
+            if len(self._query_lru) > self.query_cache_size:
+                self._query_lru.popitem(last=False)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Batch version of embed_query (LRU, then disk, then one model call for the rest)."""
+        keys = [text_key(t, "query") for t in texts]
+        out: List[Optional[List[float]]] = [None] * len(texts)
+        with self._lru_lock:
+            for i, key in enumerate(keys):
+                if key in self._query_lru:
+                    self._query_lru.move_to_end(key)
+                    out[i] = self._query_lru[key]
+        self._count("query_lru_hits", sum(v is not None for v in out))
+
+        missing = [i for i, v in enumerate(out) if v is None]
+        if missing:
+            vectors = self._embed_cached([texts[i] for i in missing], "query")
+            with self._lru_lock:
+                for i, vector in zip(missing, vectors):
+                    out[i] = vector
+                    self._query_lru[keys[i]] = vector
+                while len(self._query_lru) > self.query_cache_size:
+                    self._query_lru.popitem(last=False)
+        return out
+
+    def flush(self):
+        self.store.flush()
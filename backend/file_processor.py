@@ -1,13 +1,17 @@
 import os
+import time
 import magic  # For Magic Number validation
 import fitz   # PyMuPDF
-import io
-from PIL import Image
-from typing import List
+from typing import Callable, List, Optional
 from langchain_core.documents import Document
-import google.generativeai as genai
 from docx2pdf import convert
-import subprocess
+import threading
+
+from backend import config
+from backend.office import ConversionService
+from backend.pdf_extract import PageExtractor
+from backend.telemetry import telemetry
+from backend.vision import VisionStage, DescriptionCache, GeminiVisionClient, StubVisionClient
 
 class SecurityCheck:
     @staticmethod
@@ -50,38 +54,40 @@ class SecurityCheck:
             print(f"⚠️ Security Error: Could not verify file type. {e}")
             return False
 
+_conversion_service = None
+_conversion_lock = threading.Lock()
+
+def get_conversion_service():
+    """The process-wide ConversionService (LibreOffice workers are started on first use)."""
+    global _conversion_service
+    with _conversion_lock:
+        if _conversion_service is None:
+            _conversion_service = ConversionService(
+                binary=config.OFFICE_BINARY,
+                workers=config.OFFICE_WORKERS,
+                timeout=config.OFFICE_TIMEOUT_SECONDS,
+                cache_dir=config.CONVERSION_CACHE_DIR,
+                mode=config.OFFICE_MODE,
+            )
+        return _conversion_service
+
+def shutdown_conversion_service():
+    with _conversion_lock:
+        if _conversion_service is not None:
+            _conversion_service.shutdown()
+
 class FileConverter:
     @staticmethod
     def docx_to_pdf(docx_path: str) -> str:
         """
         Converts DOCX to PDF using LibreOffice (Headless).
-        Works on Linux/Docker without MS Word.
+        Works on Linux/Docker without MS Word. The PDF is written next to the DOCX.
         """
         try:
             print(f"🔄 Converting {docx_path} to PDF using LibreOffice...")
-            
-            # Get the directory where the file is stored
-            output_dir = os.path.dirname(docx_path)
-            
-            # Run LibreOffice in headless mode
-            # --headless: Runs without a GUI
-            # --convert-to pdf: Tells it to convert
-            # --outdir: Where to save the new PDF
-            subprocess.run([
-                "libreoffice", "--headless", "--convert-to", "pdf",
-                "--outdir", output_dir,
-                docx_path
-            ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            
-            # The output filename will be the same base name but with .pdf
-            base, _ = os.path.splitext(docx_path)
-            pdf_path = f"{base}.pdf"
-            
-            if os.path.exists(pdf_path):
-                print(f"✅ Conversion Successful: {pdf_path}")
-                return pdf_path
-            else:
-                raise FileNotFoundError("PDF file was not generated.")
+            pdf_path = get_conversion_service().convert(docx_path)
+            print(f"✅ Conversion Successful: {pdf_path}")
+            return pdf_path
                 
         except Exception as e:
             print(f"❌ Conversion Failed: {e}")
@@ -89,77 +95,113 @@ class FileConverter:
             return docx_path
 
 class MultimodalIngestor:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, extract_workers: Optional[int] = None, vision_client=None):
         self.api_key = api_key
-        # Configure Gemini for Vision
-        genai.configure(api_key=self.api_key)
-        self.vision_model = genai.GenerativeModel('gemini-2.0-flash')
 
-    def _get_image_description(self, pil_image) -> str:
-        """
-        Sends the image to Gemini 2.0 Flash to get a technical description.
-        """
-        try:
-            prompt = "Analyze this technical diagram or image. Describe the components, connections, labels, and specific values visible. Be concise but detailed for a search engine."
-            response = self.vision_model.generate_content([prompt, pil_image])
-            return response.text.strip()
-        except Exception as e:
-            print(f"⚠️ Vision API Error: {e}")
-            return "Image analysis failed."
+        # Vision client: Gemini by default, or an offline stub (VISION_BACKEND=stub / injected)
+        if vision_client is None:
+            if config.VISION_BACKEND == "stub":
+                vision_client = StubVisionClient()
+            else:
+                vision_client = GeminiVisionClient(api_key=self.api_key)
+
+        # Vision stage (dedupe + persistent cache + bounded concurrency)
+        self.vision = VisionStage(
+            client=vision_client,
+            cache=DescriptionCache(config.VISION_CACHE_DIR, namespace=vision_client.name),
+            max_in_flight=config.VISION_MAX_IN_FLIGHT,
+            max_retries=config.VISION_MAX_RETRIES,
+            backoff_seconds=config.VISION_BACKOFF_SECONDS,
+            min_side=config.VISION_MIN_SIDE,
+            max_side=config.VISION_MAX_SIDE,
+        )
 
-    def process_pdf(self, file_path: str) -> List[Document]:
+        # Page extraction (text + image bytes), optionally across a process pool
+        self.extractor = PageExtractor(
+            workers=config.EXTRACT_WORKERS if extract_workers is None else extract_workers,
+            min_pages_per_worker=config.EXTRACT_MIN_PAGES_PER_WORKER,
+            max_pages_per_range=config.EXTRACT_MAX_PAGES_PER_RANGE,
+        )
+
+    def process_pdf(self, file_path: str, progress: Optional[Callable[[int, int], None]] = None,
+                    source: Optional[str] = None) -> List[Document]:
         """
         Reads PDF, extracts text, and uses AI to describe diagrams.
+        'progress' (optional) is called as progress(pages_done, total_pages) after each page.
+        'source' (optional) is the document name stored in metadata (default: the file name).
         """
         docs = []
+        source = source or os.path.basename(file_path)
         
-        # Open the PDF
+        # Open the PDF (only to validate it and count pages; extraction opens its own handles)
         try:
-            doc = fitz.open(file_path)
+            with fitz.open(file_path) as doc:
+                total_pages = len(doc)
         except Exception as e:
             print(f"❌ Error opening PDF: {e}")
             return []
 
-        print(f"👁️ Scanning {len(doc)} pages for text and visual data...")
+        print(f"👁️ Scanning {total_pages} pages for text and visual data...")
 
-        for i, page in enumerate(doc):
-            page_num = i + 1
-            
-            # 1. Extract Text
-            text_content = page.get_text()
-            
-            # 2. Vision Logic: Extract & Analyze Images
-            image_list = page.get_images(full=True)
-            visual_context = ""
-            
-            if len(image_list) > 0:
-                print(f"   - Page {page_num}: Found {len(image_list)} image(s). Analyzing...")
-                
-                for img_index, img in enumerate(image_list):
-                    try:
-                        # Extract image bytes
-                        xref = img[0]
-                        base_image = doc.extract_image(xref)
-                        image_bytes = base_image["image"]
-                        
-                        # Convert to PIL Image
-                        pil_image = Image.open(io.BytesIO(image_bytes))
-                        
-                        # Get AI Description
-                        description = self._get_image_description(pil_image)
-                        visual_context += f"\n[Visual Diagram {img_index+1} Description]: {description}\n"
-                        
-                    except Exception as e:
-                        print(f"   - Failed to process image on page {page_num}: {e}")
-
-            # 3. Combine Text + Visual Descriptions
-            full_content = text_content + "\n" + visual_context
-            
-            # 4. Create Document Object
-            document = Document(
-                page_content=full_content,
-                metadata={"source": os.path.basename(file_path), "page": page_num}
-            )
-            docs.append(document)
+        # 1. Extract Text & Image Bytes a range of pages at a time (parallel across processes if configured)
+        # 2. Vision Logic: schedule each range's image descriptions (deduped, cached, concurrent) as soon
+        #    as it is extracted; its documents are built while the next range is being extracted
+        known = {}  # image hash -> description Future, shared by all ranges of this document
+        n_images = 0
+        extract_seconds = 0.0
+        waiting = None  # (pages, descriptions) of the previous range
+        ranges = self.extractor.iter_ranges(file_path, total_pages)
+        try:
+            while True:
+                start = time.perf_counter()
+                pages = next(ranges, None)
+                extract_seconds += time.perf_counter() - start
+                if pages is not None:
+                    descriptions = self.vision.describe_images(pages, known=known)
+                    for page in pages:
+                        n_images += len(page.images)
+                        # The bytes now live only in pending vision calls, until they are described
+                        page.images = [(xref, None) for xref, _ in page.images]
+                if waiting:
+                    for page in waiting[0]:
+                        docs.append(self._build_page_document(source, page, waiting[1]))
+                        if progress:
+                            progress(page.page, total_pages)
+                if pages is None:
+                    break
+                waiting = (pages, descriptions)
+        finally:
+            ranges.close()  # Stops extracting ahead if the job was cancelled
+            # No-op when finished; drops queued vision calls if the job was cancelled
+            self.vision.cancel(known.values())
+        telemetry.observe("page_extraction", extract_seconds, pages=total_pages)
+        if n_images:
+            print(f"   - Analyzed {n_images} image(s), {len(known)} unique.")
+
+        return docs
+
+    def _build_page_document(self, source: str, page, descriptions) -> Document:
+        """
+        Combines a page's text with the descriptions of its images.
+        """
+        page_num = page.page
+        visual_context = ""
+
+        for img_index, (xref, _) in enumerate(page.images):
+            try:
+                description = descriptions[xref].result()
+                if description is None:
+                    continue  # Too small to be a diagram (bullets, icons, rules)
+                visual_context += f"\n[Visual Diagram {img_index+1} Description]: {description}\n"
+
+            except Exception as e:
+                print(f"   - Failed to process image on page {page_num}: {e}")
+
+        # 3. Combine Text + Visual Descriptions
+        full_content = page.text + "\n" + visual_context
 
-        return docs
\ No newline at end of file
+        # 4. Create Document Object
+        return Document(
+            page_content=full_content,
+            metadata={"source": source, "page": page_num}
+        )
@@ -0,0 +1,289 @@
+import os
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict, Optional
+
+def _is_job_id(value: str) -> bool:
+    return len(value) == 32 and all(c in "0123456789abcdef" for c in value)
+
+class JobCancelled(Exception):
+    """Raised inside a pipeline when its job has been cancelled."""
+
+class QueueFull(Exception):
+    """Raised when the job queue is at capacity."""
+
+class Job:
+    """
+    State of one background ingestion run.
+    The pipeline thread writes to it, the API reads snapshots of it.
+    """
+    FINAL_STATES = {"done", "failed", "cancelled"}
+
+    def __init__(self, filename: str, original_name: str):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.original_name = original_name
+        self.status = "queued"      # queued | running | done | failed | cancelled
+        self.stage = "queued"       # queued | security | converting | extracting | indexing | thumbnails | done
+        self.pages_done = 0
+        self.total_pages = 0
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.result: Optional[dict] = None
+        self.version = 0            # Bumped on every change, used by the SSE stream
+        self._stage_started_at = self.created_at
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._future: Optional[Future] = None
+        self._on_change: Optional[Callable[["Job", bool], None]] = None  # Set by a shared JobManager
+        self._cancel_marker: Optional[str] = None
+
+    # --- Updates (called from the worker thread) ---
+
+    def set_stage(self, stage: str):
+        self.check_cancelled()
+        with self._lock:
+            self.stage = stage
+            self._stage_started_at = time.time()
+            self.pages_done = 0
+            self.version += 1
+        self._changed(force=True)
+
+    def set_progress(self, pages_done: int, total_pages: int):
+        self.check_cancelled()
+        with self._lock:
+            self.pages_done = pages_done
+            self.total_pages = total_pages
+            self.version += 1
+        self._changed(force=False)
+
+    def _changed(self, force: bool):
+        if self._on_change:
+            self._on_change(self, force)
+
+    def check_cancelled(self):
+        if self._on_change and not self._cancel_event.is_set() and os.path.exists(self._cancel_marker):
+            self._cancel_event.set()  # Cancelled through another worker
+        if self._cancel_event.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled.")
+
+    def _finish(self, status: str, result: Optional[dict] = None, error: Optional[str] = None):
+        with self._lock:
+            self.status = status
+            self.stage = "done" if status == "done" else self.stage
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            self.version += 1
+        self._changed(force=True)
+
+    # --- Reads (called from the API) ---
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in self.FINAL_STATES
+
+    def eta_seconds(self) -> Optional[float]:
+        """Estimates the remaining time of the current stage from its page rate."""
+        if self.status != "running" or self.pages_done == 0 or self.total_pages == 0:
+            return None
+        elapsed = time.time() - self._stage_started_at
+        remaining = self.total_pages - self.pages_done
+        return round(elapsed / self.pages_done * remaining, 1)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "stage": self.stage,
+                "pages_done": self.pages_done,
+                "total_pages": self.total_pages,
+                "eta_seconds": self.eta_seconds(),
+                "original_name": self.original_name,
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+class SharedJob:
+    """
+    Read-only view of a job run by another worker process (serve.py), read
+    from the state file its JobManager keeps up to date. Same read API as Job.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.id = os.path.splitext(os.path.basename(path))[0]
+
+    def _state(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            # Gone (history trimmed) or mid-replace: report it as lost rather than hang a poller
+            return {"job_id": self.id, "status": "failed", "error": "Job state unavailable.", "version": -1}
+
+    @property
+    def version(self) -> int:
+        return self._state()["version"]
+
+    @property
+    def is_finished(self) -> bool:
+        return self._state()["status"] in Job.FINAL_STATES
+
+    def to_dict(self) -> dict:
+        state = self._state()
+        state.pop("version", None)
+        return state
+
+class JobManager:
+    """
+    Runs ingestion pipelines on a small, bounded worker pool so /upload can
+    return immediately and /chat keeps the CPU during bulk ingestion.
+
+    With 'state_dir', every job's state is mirrored to <state_dir>/<id>.json,
+    so any worker process can answer polls (get() returns a SharedJob for
+    jobs run elsewhere) and cancel them (through a <id>.cancel marker the
+    running job checks at each stage and page boundary).
+    """
+    def __init__(self, max_workers: int = 1, max_queued: int = 20, history_size: int = 200,
+                 state_dir: Optional[str] = None, write_interval: float = 0.5, state_ttl: float = 86400.0):
+        self.max_queued = max_queued
+        self.history_size = history_size
+        self.state_dir = state_dir
+        self.write_interval = write_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._written_at: Dict[str, float] = {}
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+            self._prune_state(state_ttl)
+
+    # --- Shared state (multi-worker) ---
+
+    def _state_path(self, job_id: str, ext: str = ".json") -> str:
+        return os.path.join(self.state_dir, f"{job_id}{ext}")
+
+    def _persist(self, job: Job, force: bool):
+        # Progress is written at most every 'write_interval'; stage changes and the end always
+        now = time.monotonic()
+        if not force and now - self._written_at.get(job.id, 0.0) < self.write_interval:
+            return
+        self._written_at[job.id] = now
+        state = {**job.to_dict(), "version": job.version}
+        tmp_path = self._state_path(job.id, f".{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self._state_path(job.id))
+        except OSError as e:
+            print(f"⚠️ Job State Warning: {e}")
+
+    def _forget_state(self, job_id: str):
+        self._written_at.pop(job_id, None)
+        for ext in (".json", ".cancel"):
+            try:
+                os.remove(self._state_path(job_id, ext))
+            except FileNotFoundError:
+                pass
+
+    def _prune_state(self, ttl: float):
+        """Drops state files left by workers that are gone (older than 'ttl' seconds)."""
+        now = time.time()
+        for entry in os.scandir(self.state_dir):
+            try:
+                if now - entry.stat().st_mtime > ttl:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def submit(self, job: Job, pipeline: Callable[[Job], dict]) -> Job:
+        """Queues a job. Raises QueueFull when too many jobs are already waiting."""
+        with self._lock:
+            if self.pending_count() >= self.max_queued:
+                raise QueueFull("Too many ingestion jobs are queued. Try again later.")
+            self._jobs[job.id] = job
+            self._trim_history()
+        if self.state_dir:
+            job._cancel_marker = self._state_path(job.id, ".cancel")
+            job._on_change = self._persist
+            self._persist(job, force=True)
+        job._future = self._executor.submit(self._run, job, pipeline)
+        return job
+
+    def get(self, job_id: str):
+        """The Job, a SharedJob if another worker runs it, or None."""
+        job = self._jobs.get(job_id)
+        if job is None and self.state_dir and _is_job_id(job_id) and os.path.exists(self._state_path(job_id)):
+            return SharedJob(self._state_path(job_id))
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Requests cancellation. Queued jobs never start; running jobs stop at
+        the next stage or page boundary.
+        """
+        job = self.get(job_id)
+        if job is None or job.is_finished:
+            return job
+        if isinstance(job, SharedJob):
+            open(self._state_path(job_id, ".cancel"), "a").close()
+            return job
+        job._cancel_event.set()
+        if job._future is not None and job._future.cancel():
+            job._finish("cancelled", error="Cancelled before start.")
+        return job
+
+    def pending_count(self) -> int:
+        return sum(1 for j in self._jobs.values() if j.status == "queued")
+
+    def running_count(self) -> int:
+        return sum(1 for j in self._jobs.values() if j.status == "running")
+
+    def shutdown(self):
+        for job_id in list(self._jobs):
+            self.cancel(job_id)
+        self._executor.shutdown(wait=False)
+
+    def _run(self, job: Job, pipeline: Callable[[Job], dict]):
+        if job._cancel_event.is_set():
+            job._finish("cancelled", error="Cancelled before start.")
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        job.version += 1
+        job._changed(force=True)
+        print(f"⚙️  Job {job.id[:8]} started ({job.original_name})")
+        try:
+            result = pipeline(job)
+            job._finish("done", result=result)
+            print(f"✅ Job {job.id[:8]} finished in {job.finished_at - job.started_at:.1f}s")
+        except JobCancelled as e:
+            job._finish("cancelled", error=str(e))
+            print(f"🛑 Job {job.id[:8]} cancelled")
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            job._finish("failed", error=str(e))
+            print(f"❌ Job {job.id[:8]} failed: {e}")
+
+    def _trim_history(self):
+        # Forget the oldest finished jobs; never drop queued or running ones.
+        if len(self._jobs) <= self.history_size:
+            return
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.history_size:
+                break
+            if self._jobs[job_id].is_finished:
+                del self._jobs[job_id]
+                if self.state_dir:
+                    self._forget_state(job_id)
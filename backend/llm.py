@@ -0,0 +1,75 @@
+import re
+import time
+import asyncio
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+class StubChatModel(BaseChatModel):
+    """
+    Deterministic offline stand-in for Gemini (LLM_BACKEND=stub).
+    Streams an answer built from the start of the retrieved context at a fixed
+    rate, so load tests measure our own retrieval, rerank and streaming
+    capacity with no network and no API quota. Same prompt -> same answer.
+    """
+    tokens_per_second: float = 50.0
+    first_token_seconds: float = 0.2
+    answer_tokens: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "insightdoc-stub"
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = str(messages[-1].content)
+        context = prompt.split("CONTEXT:", 1)[-1].split("QUESTION:", 1)[0]
+        pages = re.findall(r"\[Page [^\]]+\]", context)
+        words = re.sub(r"\[Page [^\]]+\]", " ", context).split()[: self.answer_tokens]
+        if not words:
+            return ["Data ", "Not ", "Found."]
+        citation = pages[0] if pages else "[Page ?]"
+        return ["(stub) "] + [f"{w} " for w in words] + [citation]
+
+    def _delay(self, index: int) -> float:
+        return self.first_token_seconds if index == 0 else 1.0 / self.tokens_per_second
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep(sum(self._delay(i) for i in range(len(tokens))))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for i, token in enumerate(self._tokens(messages)):
+            time.sleep(self._delay(i))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        await asyncio.sleep(sum(self._delay(i) for i in range(len(tokens))))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        for i, token in enumerate(self._tokens(messages)):
+            await asyncio.sleep(self._delay(i))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+def create_llm(backend: str, google_api_key: Optional[str] = None, tokens_per_second: float = 50.0,
+               first_token_seconds: float = 0.2, answer_tokens: int = 60):
+    """
+    Builds the answer LLM.
+    backend: "gemini" (default) or "stub" (offline, deterministic; see StubChatModel).
+    """
+    if backend == "stub":
+        print(f"🧪 Using the offline stub LLM ({tokens_per_second:g} tokens/s).")
+        return StubChatModel(tokens_per_second=tokens_per_second, first_token_seconds=first_token_seconds,
+                             answer_tokens=answer_tokens)
+    if backend == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0, google_api_key=google_api_key)
+    raise ValueError(f"Unknown LLM backend '{backend}' (expected 'gemini' or 'stub').")
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import fcntl
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set
+
+def sha256_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Streams a file through SHA-256 (constant memory, any file size)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class IndexManifest:
+    """
+    Records what is in the vector store, so re-ingestion can be incremental.
+
+    Layout (JSON):
+    {
+      "version": 7,                      # bumped on every change to the index
+      "sources": {
+        "manual.pdf": {
+          "file_hash": "<sha256 of the file>",
+          "indexed_at": 1700000000.0,
+          "version": 7,                  # index version of its last change (its partition snapshot)
+          "pages": {"1": {"hash": "<sha256 of page text>", "ids": ["<vector id>", ...]}}
+        }
+      }
+    }
+
+    Several processes (serve.py workers, bulk_ingest.py) share the file:
+    - reads pick up other processes' saves (checked at most every 'reload_interval' seconds);
+    - save() is a locked read-merge-write: only the sources this process
+      changed are written over what is on disk, and its version bumps are
+      added on top of the disk's version.
+    """
+    def __init__(self, path: str, reload_interval: float = 0.5):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.RLock()
+        self._disk = {"version": 0, "sources": {}}
+        self._dirty: Dict[str, Optional[dict]] = {}  # Changed since the last save (None: removed)
+        self._bumps = 0                               # Version bumps since the last save
+        self._signature = None
+        self._checked_at = 0.0
+        self._data = self._disk
+        self._reload(force=True)
+
+    # --- Sharing between processes ---
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size, st.st_ino
+        except FileNotFoundError:
+            return None
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": 0, "sources": {}}
+
+    def _merged(self) -> dict:
+        """The disk state with this process's unsaved changes applied."""
+        sources = dict(self._disk["sources"])
+        for source, entry in self._dirty.items():
+            if entry is None:
+                sources.pop(source, None)
+            else:
+                sources[source] = entry
+        return {"version": self._disk["version"] + self._bumps, "sources": sources}
+
+    def _reload(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            signature = self._stat()
+            if force or signature != self._signature:
+                self._disk = self._read()
+                self._signature = signature
+                self._data = self._merged()
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # --- Reads ---
+
+    @property
+    def version(self) -> int:
+        self._reload()
+        return self._data["version"]
+
+    def sources(self) -> List[str]:
+        self._reload()
+        with self._lock:
+            return list(self._data["sources"])
+
+    def get_source(self, source: str) -> Optional[dict]:
+        self._reload()
+        with self._lock:
+            return self._data["sources"].get(source)
+
+    def file_hashes(self) -> Set[str]:
+        """Content hashes of every indexed file."""
+        self._reload()
+        with self._lock:
+            return {e["file_hash"] for e in self._data["sources"].values() if e.get("file_hash")}
+
+    def file_hash(self, source: str) -> Optional[str]:
+        entry = self.get_source(source)
+        return entry["file_hash"] if entry else None
+
+    def pages(self, source: str) -> Dict[str, dict]:
+        entry = self.get_source(source)
+        return dict(entry["pages"]) if entry else {}
+
+    # --- Changes (kept in memory until save()) ---
+
+    def set_source(self, source: str, file_hash: Optional[str], pages: Dict[str, dict], **extra):
+        with self._lock:
+            entry = {
+                "file_hash": file_hash,
+                "indexed_at": time.time(),
+                "pages": pages,
+                **extra,
+            }
+            self._data["sources"][source] = self._dirty[source] = entry
+
+    def update_source(self, source: str, **fields):
+        with self._lock:
+            entry = {**self._data["sources"][source], **fields}
+            self._data["sources"][source] = self._dirty[source] = entry
+
+    def remove_source(self, source: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._data["sources"].pop(source, None)
+            if entry is not None:
+                self._dirty[source] = None
+            return entry
+
+    def bump_version(self) -> int:
+        with self._lock:
+            self._bumps += 1
+            self._data["version"] += 1
+            return self._data["version"]
+
+    def save(self):
+        """Merges this process's changes into the file (under a file lock) and writes it atomically."""
+        with self._lock, self._file_lock():
+            if not self._dirty and not self._bumps:
+                return
+            self._disk = self._read()
+            merged = self._merged()
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(merged, f, indent=2)
+            os.replace(tmp_path, self.path)  # Atomic swap
+            self._disk, self._dirty, self._bumps = merged, {}, 0
+            self._signature = self._stat()
+            self._data = self._merged()
@@ -5,7 +5,10 @@ from typing import List, Optional
 
 class ChatRequest(BaseModel):
     message: str = Field(..., min_length=1, description="The user's query")
-    session_id: Optional[str] = Field(None, description="Unique ID for conversation history")
+    session_id: Optional[str] = Field(None, max_length=128, pattern=r"^[A-Za-z0-9_\-]+$",
+                                      description="Unique ID for conversation history")
+    documents: Optional[List[str]] = Field(None, min_length=1,
+                                           description="Limit retrieval to these documents (names from /upload or /documents)")
 
 class UploadResponse(BaseModel):
     filename: str
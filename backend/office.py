@@ -0,0 +1,286 @@
+import os
+import time
+import queue
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Optional
+
+from backend.manifest import sha256_file
+
+class ConversionError(Exception):
+    """Raised when LibreOffice fails to produce a PDF."""
+
+class ConversionTimeout(ConversionError):
+    """Raised when a conversion takes longer than the configured timeout."""
+
+def _profile_url(path: str) -> str:
+    # Each process gets its own user profile, so concurrent instances never share locks
+    return "file://" + os.path.abspath(path)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _kill(proc: subprocess.Popen):
+    """Kills a LibreOffice process and its children (soffice.bin runs under a wrapper)."""
+    if proc.poll() is None:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    proc.wait()
+
+def spawn_convert(binary: str, src: str, out_dir: str, profile_dir: str, timeout: float) -> str:
+    """One-shot conversion in a fresh process (the old behaviour, with a private profile and a timeout)."""
+    proc = subprocess.Popen(
+        [binary, "--headless", "--norestore", f"-env:UserInstallation={_profile_url(profile_dir)}",
+         "--convert-to", "pdf", "--outdir", out_dir, src],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+    )
+    try:
+        returncode = proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill(proc)
+        raise ConversionTimeout(f"Conversion of '{os.path.basename(src)}' timed out after {timeout:.0f}s.")
+    pdf_path = os.path.join(out_dir, os.path.splitext(os.path.basename(src))[0] + ".pdf")
+    if returncode != 0 or not os.path.exists(pdf_path):
+        raise ConversionError(f"LibreOffice exited with code {returncode} and produced no PDF.")
+    return pdf_path
+
+def prune_conversion_cache(cache_dir: str, max_bytes: int, min_age_seconds: float = 3600) -> int:
+    """
+    Bounds the conversion cache. Results are hard-linked into the upload store,
+    so an entry only costs its own space once nothing else links to it (its
+    stored PDF was deleted, or it had to be copied). Such entries are deleted,
+    least recently used first, while they add up to more than max_bytes.
+    Entries younger than min_age_seconds are kept (they may be mid-conversion).
+    Returns the number of entries removed.
+    """
+    if not cache_dir or not os.path.isdir(cache_dir):
+        return 0
+    now = time.time()
+    exclusive = []
+    for entry in os.scandir(cache_dir):
+        if not entry.name.endswith(".pdf"):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        if stat.st_nlink == 1:
+            exclusive.append((stat.st_mtime, stat.st_size, entry.path))
+    exclusive.sort()
+
+    total = sum(size for _, size, _ in exclusive)
+    removed = 0
+    for mtime, size, path in exclusive:
+        if total <= max_bytes or now - mtime < min_age_seconds:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+            total -= size
+        except FileNotFoundError:
+            pass
+    if removed:
+        print(f"🧹 Conversion cache: removed {removed} PDF(s) over the size limit.")
+    return removed
+
+class OfficeWorker:
+    """
+    One long-lived headless LibreOffice process, driven over UNO (needs the
+    'uno' Python bindings, e.g. the python3-uno package). Loading the office
+    suite once instead of per file removes seconds of cold start per conversion.
+    """
+    def __init__(self, binary: str, profile_dir: str, startup_timeout: float = 60.0):
+        self.binary = binary
+        self.profile_dir = profile_dir
+        self.startup_timeout = startup_timeout
+        self.proc: Optional[subprocess.Popen] = None
+        self.desktop = None
+        self.starts = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None and self.desktop is not None
+
+    def start(self):
+        import uno
+        self.starts += 1
+        port = _free_port()
+        self.proc = subprocess.Popen(
+            [self.binary, "--headless", "--invisible", "--nologo", "--nodefault", "--norestore",
+             f"-env:UserInstallation={_profile_url(self.profile_dir)}",
+             f"--accept=socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+        )
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            try:
+                ctx = resolver.resolve(f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if self.proc.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise ConversionError("LibreOffice worker failed to start.")
+                time.sleep(0.25)
+        self.desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+
+    def convert(self, src: str, dst: str):
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def prop(name, value):
+            p = PropertyValue()
+            p.Name, p.Value = name, value
+            return p
+
+        doc = self.desktop.loadComponentFromURL(uno.systemPathToFileUrl(os.path.abspath(src)), "_blank", 0,
+                                                (prop("Hidden", True), prop("ReadOnly", True)))
+        if doc is None:
+            raise ConversionError(f"LibreOffice could not open '{os.path.basename(src)}'.")
+        try:
+            doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(dst)), (prop("FilterName", "writer_pdf_Export"),))
+        finally:
+            doc.close(True)
+
+    def stop(self):
+        self.desktop = None
+        if self.proc:
+            _kill(self.proc)
+            self.proc = None
+
+class ConversionService:
+    """
+    DOCX -> PDF conversion with:
+      - a small pool of long-lived LibreOffice workers ("pool" mode, needs the
+        'uno' bindings), or a fresh process per file ("spawn" mode); "auto"
+        picks pool when 'uno' is importable. Every process has its own profile.
+      - a per-job timeout; a worker that times out or crashes is restarted
+      - a cache of results keyed by the SHA-256 of the input, so a repeat
+        conversion is a file copy (hard link when possible); bounded by
+        prune_conversion_cache()
+    """
+    def __init__(self, binary: str = "libreoffice", workers: int = 1, timeout: float = 120.0,
+                 cache_dir: Optional[str] = None, mode: str = "auto"):
+        self.binary = binary
+        self.timeout = timeout
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        if mode == "auto":
+            try:
+                import uno  # noqa: F401
+                mode = "pool"
+            except ImportError:
+                mode = "spawn"
+        self.mode = mode
+        self._profile_root = tempfile.mkdtemp(prefix="office_profiles_")
+
+        # Idle slots: each is an OfficeWorker (pool) or a profile directory (spawn)
+        self._slots: "queue.Queue" = queue.Queue()
+        for i in range(max(1, workers)):
+            profile = os.path.join(self._profile_root, f"worker-{i}")
+            self._slots.put(OfficeWorker(binary, profile) if mode == "pool" else profile)
+        # UNO calls can't be interrupted; running them on a side thread lets us time them out
+        self._runner = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="office")
+        self._lock = threading.Lock()
+        self._stats = {"conversions": 0, "cache_hits": 0, "timeouts": 0, "failures": 0, "restarts": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"mode": self.mode, **self._stats}
+
+    @staticmethod
+    def _link_or_copy(src: str, dst: str):
+        if os.path.exists(dst):
+            os.remove(dst)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copyfile(src, dst)
+
+    def convert(self, docx_path: str, pdf_path: Optional[str] = None) -> str:
+        """Converts a DOCX (default output: same path with .pdf). Returns the PDF path."""
+        pdf_path = pdf_path or os.path.splitext(docx_path)[0] + ".pdf"
+
+        cached = None
+        if self.cache_dir:
+            cached = os.path.join(self.cache_dir, f"{sha256_file(docx_path)}.pdf")
+            if os.path.exists(cached):
+                self._count("cache_hits")
+                try:
+                    os.utime(cached)  # Recently used: evicted last
+                    self._link_or_copy(cached, pdf_path)
+                    return pdf_path
+                except FileNotFoundError:
+                    pass  # Evicted meanwhile: convert again
+
+        with tempfile.TemporaryDirectory(prefix="convert_", dir=self.cache_dir) as work_dir:
+            result = self._convert_uncached(docx_path, work_dir)
+            if cached:
+                os.replace(result, cached)  # Atomic: a half-written PDF is never cached
+                self._link_or_copy(cached, pdf_path)
+            else:
+                shutil.move(result, pdf_path)
+        self._count("conversions")
+        return pdf_path
+
+    def _convert_uncached(self, src: str, work_dir: str) -> str:
+        slot = self._slots.get()
+        try:
+            if self.mode == "spawn":
+                try:
+                    return spawn_convert(self.binary, src, work_dir, slot, self.timeout)
+                except ConversionTimeout:
+                    self._count("timeouts")
+                    raise
+                except ConversionError:
+                    self._count("failures")
+                    raise
+
+            if not slot.alive:
+                if slot.starts:
+                    self._count("restarts")
+                    print("⚠️ LibreOffice worker is down. Restarting...")
+                slot.stop()
+                slot.start()
+            dst = os.path.join(work_dir, "out.pdf")
+            future = self._runner.submit(slot.convert, src, dst)
+            try:
+                future.result(timeout=self.timeout)
+            except FutureTimeout:
+                self._count("timeouts")
+                slot.stop()  # Kills the process, which also unblocks the stuck UNO call
+                raise ConversionTimeout(f"Conversion of '{os.path.basename(src)}' timed out after {self.timeout:.0f}s.")
+            except Exception as e:
+                self._count("failures")
+                if not slot.alive:
+                    slot.stop()  # Crashed: restarted on its next job
+                raise ConversionError(str(e)) from e
+            if not os.path.exists(dst):
+                self._count("failures")
+                raise ConversionError("LibreOffice produced no PDF.")
+            return dst
+        finally:
+            self._slots.put(slot)
+
+    def shutdown(self):
+        self._runner.shutdown(wait=False, cancel_futures=True)
+        while not self._slots.empty():
+            slot = self._slots.get_nowait()
+            if isinstance(slot, OfficeWorker):
+                slot.stop()
+        shutil.rmtree(self._profile_root, ignore_errors=True)
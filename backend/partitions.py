@@ -0,0 +1,199 @@
+import os
+import heapq
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from backend.manifest import IndexManifest
+from backend.vector_snapshot import CURRENT_FILE, FlatVectorIndex, export_chroma
+
+# langchain's default collection: the single shared index used before partitioning
+LEGACY_COLLECTION = "langchain"
+
+def partition_name(source: str) -> str:
+    """Collection (and snapshot directory) name of a document; valid for Chroma (3-63 chars of [a-z0-9-])."""
+    return f"doc-{hashlib.sha256(source.encode('utf-8')).hexdigest()[:24]}"
+
+class PartitionedIndex:
+    """
+    One vector partition per document ('source'): a Chroma collection, plus a
+    memory-mapped snapshot of it when backend="snapshot".
+    - Scoped queries search only the partitions of the documents in scope, so
+      their cost follows the size of those documents, not of the corpus.
+    - Unscoped queries fan out to every partition in parallel and merge the
+      per-partition top-k.
+    - Removing a document drops its partition.
+    Chroma stays the write path; scores are "higher is better" in both
+    backends (negated L2 distance for Chroma, cosine for snapshots).
+    """
+    def __init__(self, client, embeddings, manifest: IndexManifest, backend: str = "chroma",
+                 snapshot_root: Optional[str] = None, quantization: str = "f16", model_name: str = "",
+                 workers: int = 4):
+        self.client = client
+        self.embeddings = embeddings
+        self.manifest = manifest
+        self.backend = backend
+        self.snapshot_root = snapshot_root
+        self.quantization = quantization
+        self.model_name = model_name
+        self._stores: Dict[str, object] = {}
+        self._snapshots: Dict[str, FlatVectorIndex] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="partition-search")
+
+    # --- Partitions ---
+
+    def store(self, source: str):
+        """The document's Chroma collection (langchain wrapper), created on first use."""
+        with self._lock:
+            store = self._stores.get(source)
+            if store is None:
+                from langchain_community.vectorstores import Chroma
+                store = Chroma(client=self.client, collection_name=partition_name(source),
+                               embedding_function=self.embeddings)
+                self._stores[source] = store
+            return store
+
+    def _snapshot_dir(self, source: str) -> str:
+        return os.path.join(self.snapshot_root, partition_name(source))
+
+    def snapshot(self, source: str) -> FlatVectorIndex:
+        with self._lock:
+            index = self._snapshots.get(source)
+            if index is None:
+                index = self._snapshots[source] = FlatVectorIndex(self._snapshot_dir(source))
+            return index
+
+    def sources(self) -> List[str]:
+        return self.manifest.sources()
+
+    def size(self, source: str) -> int:
+        return sum(len(page["ids"]) for page in self.manifest.pages(source).values())
+
+    def publish(self, source: str, version: int):
+        """Exports the document's collection as a new snapshot (backend="snapshot") and swaps it in."""
+        export_chroma(self.store(source), self._snapshot_dir(source), version,
+                      quantization=self.quantization, model_name=self.model_name)
+        self.snapshot(source).reload()
+
+    def stale_snapshots(self) -> List[str]:
+        """Documents whose snapshot is missing or older than their last ingest."""
+        stale = []
+        for source in self.sources():
+            entry = self.manifest.get_source(source) or {}
+            if self.snapshot(source).version != entry.get("version"):
+                stale.append(source)
+        return stale
+
+    def drop(self, source: str):
+        """Deletes the document's collection and snapshots."""
+        with self._lock:
+            self._stores.pop(source, None)
+            self._snapshots.pop(source, None)
+        try:
+            self.client.delete_collection(partition_name(source))
+        except Exception:
+            pass  # Never created (e.g. a document with no text)
+        if self.snapshot_root:
+            shutil.rmtree(self._snapshot_dir(source), ignore_errors=True)
+
+    # --- Search ---
+
+    def _search_partition(self, source: str, vectors: Sequence[Sequence[float]], k: int) -> List[List[Tuple[Document, float]]]:
+        k = min(k, self.size(source))
+        if k <= 0:
+            return [[] for _ in vectors]
+        if self.backend == "snapshot":
+            return self.snapshot(source).search_many(vectors, k)
+        result = self.store(source)._collection.query(
+            query_embeddings=[list(map(float, v)) for v in vectors], n_results=k,
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            [(Document(id=i, page_content=text, metadata=metadata or {}), -float(distance))
+             for i, text, metadata, distance in zip(ids, texts, metadatas, distances)]
+            for ids, texts, metadatas, distances in zip(result["ids"], result["documents"],
+                                                         result["metadatas"], result["distances"])
+        ]
+
+    def search_many(self, vectors: Sequence[Sequence[float]], k: int,
+                    sources: Optional[Sequence[str]] = None) -> List[List[Tuple[Document, float]]]:
+        """
+        Top-k (Document, score) per query vector, best first, over the partitions
+        of 'sources' (None: all documents). Several partitions are searched in parallel.
+        """
+        indexed = set(self.sources())
+        targets = [s for s in (indexed if sources is None else dict.fromkeys(sources)) if s in indexed]
+        if not targets or not len(vectors):
+            return [[] for _ in vectors]
+        if len(targets) == 1:
+            per_partition = [self._search_partition(targets[0], vectors, k)]
+        else:
+            per_partition = list(self._executor.map(lambda s: self._search_partition(s, vectors, k), targets))
+        return [
+            heapq.nlargest(k, (hit for partition in per_partition for hit in partition[q]), key=lambda hit: hit[1])
+            for q in range(len(vectors))
+        ]
+
+    def search(self, vector: Sequence[float], k: int, sources: Optional[Sequence[str]] = None) -> List[Tuple[Document, float]]:
+        return self.search_many([vector], k, sources)[0]
+
+    def similarity_search_by_vector(self, embedding: Sequence[float], k: int = 4,
+                                    sources: Optional[Sequence[str]] = None) -> List[Document]:
+        """Same call shape as the Chroma wrapper, plus an optional document scope."""
+        return [doc for doc, _ in self.search(embedding, k, sources)]
+
+    # --- Migration ---
+
+    def migrate_legacy(self, page_size: int = 5000) -> int:
+        """
+        Moves vectors from the pre-partitioning shared collection into one
+        partition per document, then deletes it. Returns the number of vectors moved.
+        """
+        try:
+            legacy = self.client.get_collection(LEGACY_COLLECTION)
+        except Exception:
+            return 0
+        total = legacy.count()
+        if total:
+            print(f"🗂️  Moving {total} vectors from the shared collection into per-document partitions...")
+        moved = 0
+        unlisted: Dict[str, Dict[str, dict]] = {}  # Documents indexed before the manifest existed
+        for offset in range(0, total, page_size):
+            page = legacy.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+            by_source: Dict[str, List[int]] = {}
+            for i, metadata in enumerate(page["metadatas"]):
+                source = (metadata or {}).get("source", "unknown")
+                by_source.setdefault(source, []).append(i)
+                if self.manifest.get_source(source) is None:
+                    # Empty page hash: the next ingest of this document replaces these vectors
+                    pages = unlisted.setdefault(source, {})
+                    pages.setdefault(str((metadata or {}).get("page", 0)), {"hash": "", "ids": []})["ids"].append(page["ids"][i])
+            for source, rows in by_source.items():
+                self.store(source)._collection.upsert(
+                    ids=[page["ids"][i] for i in rows],
+                    embeddings=[page["embeddings"][i] for i in rows],
+                    documents=[page["documents"][i] for i in rows],
+                    metadatas=[page["metadatas"][i] for i in rows],
+                )
+                moved += len(rows)
+        for source, pages in unlisted.items():
+            self.manifest.set_source(source, None, pages)
+        self.client.delete_collection(LEGACY_COLLECTION)
+
+        # The whole-corpus snapshots are replaced by per-document ones
+        if self.snapshot_root and os.path.isdir(self.snapshot_root):
+            for name in os.listdir(self.snapshot_root):
+                path = os.path.join(self.snapshot_root, name)
+                if name == CURRENT_FILE:
+                    os.remove(path)
+                elif name.startswith("v") and os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+        return moved
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,109 @@
+import os
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import fitz   # PyMuPDF
+
+# NOTE: This module is imported by the extraction worker processes, so it must
+# stay light (PyMuPDF only). Anything heavy here would be re-imported by every
+# spawned worker.
+
+class PageContent:
+    """Raw content of one PDF page: its text and the bytes of every image on it."""
+    __slots__ = ("page", "text", "images")
+
+    def __init__(self, page: int, text: str, images: List[Tuple[int, bytes]]):
+        self.page = page          # 1-based page number
+        self.text = text
+        self.images = images      # [(xref, image_bytes), ...] in page order (bytes None once released)
+
+def extract_page_range(file_path: str, start: int, end: int) -> List[PageContent]:
+    """
+    Extracts pages [start, end) of a PDF.
+    Opens its own fitz handle, so it is safe to run in a separate process.
+    """
+    pages = []
+    extracted = {}  # xref -> bytes, repeated images are extracted once per range
+    with fitz.open(file_path) as doc:
+        for i in range(start, end):
+            page = doc[i]
+            images = []
+            for img in page.get_images(full=True):
+                xref = img[0]
+                try:
+                    if xref not in extracted:
+                        extracted[xref] = doc.extract_image(xref)["image"]
+                    images.append((xref, extracted[xref]))
+                except Exception as e:
+                    print(f"   - Failed to extract image on page {i + 1}: {e}")
+            pages.append(PageContent(i + 1, page.get_text(), images))
+    return pages
+
+class PageExtractor:
+    """
+    Extracts text and images from a PDF, optionally splitting the page range
+    across a process pool. PyMuPDF handles cannot be shared, so each worker
+    opens the file itself. Results always come back in page order.
+    iter_ranges() hands pages over a range (at most max_pages_per_range) at a
+    time, with only a few ranges extracted ahead, so memory stays bounded
+    however long (or image-heavy) the document is.
+    """
+    def __init__(self, workers: int = 1, min_pages_per_worker: int = 8, max_pages_per_range: int = 32):
+        # workers <= 0 means "one per CPU core"
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.min_pages_per_worker = max(1, min_pages_per_worker)
+        self.max_pages_per_range = max(1, max_pages_per_range)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Created lazily and reused: spawning workers is the expensive part.
+        # 'spawn' keeps forked copies of torch/gRPC threads out of the workers.
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def _split(self, total_pages: int) -> List[Tuple[int, int]]:
+        # A few ranges per worker so one slow (image-heavy) range doesn't stall the rest
+        n_ranges = min(self.workers * 4, max(1, total_pages // self.min_pages_per_worker))
+        step = min(-(-total_pages // n_ranges), self.max_pages_per_range)  # ceil division, capped
+        return [(s, min(s + step, total_pages)) for s in range(0, total_pages, step)]
+
+    def iter_ranges(self, file_path: str, total_pages: int) -> Iterator[List[PageContent]]:
+        """Yields the pages in consecutive ranges, in page order, as they are extracted."""
+        if total_pages == 0:
+            return
+        ranges = self._split(total_pages)
+        if self.workers == 1 or total_pages < self.min_pages_per_worker * 2:
+            for start, end in ranges:
+                yield extract_page_range(file_path, start, end)
+            return
+
+        pool = self._get_pool()
+        todo = iter(ranges)
+        # Two ranges per worker in flight; consumed in submission order to keep page order
+        pending = deque(pool.submit(extract_page_range, file_path, start, end)
+                        for start, end in itertools.islice(todo, self.workers * 2))
+        try:
+            while pending:
+                pages = pending.popleft().result()
+                for start, end in itertools.islice(todo, 1):
+                    pending.append(pool.submit(extract_page_range, file_path, start, end))
+                yield pages
+        finally:
+            for future in pending:
+                future.cancel()  # The consumer stopped early (e.g. a cancelled job)
+
+    def extract(self, file_path: str, total_pages: int) -> List[PageContent]:
+        """All pages at once (holds the whole document in memory; ingestion uses iter_ranges)."""
+        return [page for pages in self.iter_ranges(file_path, total_pages) for page in pages]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -1,20 +1,36 @@
 import os
-from typing import List, Generator
+import time
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from typing import AsyncGenerator, Callable, Dict, List, Generator, Optional, Tuple
 from dotenv import load_dotenv
 
 # AI & Vector DB
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_huggingface import HuggingFaceEmbeddings 
-from langchain_community.vectorstores import Chroma
+# NOTE: The heavy SDKs (google-genai, torch via langchain_huggingface, chromadb,
+# langfuse) are imported where they are used, so importing this module is cheap
+# and the server can bind before the models are loaded.
 from langchain_core.documents import Document
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
-# Observability (The "Eyes")
-from langfuse.langchain import CallbackHandler
-
 # Reranking
-from sentence_transformers import CrossEncoder
+from backend.rerankers import create_reranker
+
+from backend import config
+from backend.llm import create_llm
+from backend.manifest import IndexManifest, sha256_text
+from backend.embedding_cache import CachedEmbeddings
+from backend.chunking import Chunker, TokenCounter
+from backend.cascade import RerankCascade
+from backend.context_packing import ContextPacker, PackedContext
+from backend.sessions import Session
+from backend.retrieval_cache import RetrievalCache
+from backend.answer_cache import SemanticAnswerCache
+from backend.batching import MicroBatcher, BatchedQueryEmbeddings
+from backend.partitions import PartitionedIndex
+from backend.telemetry import telemetry
 
 # Load API Keys
 load_dotenv()
@@ -25,117 +41,857 @@ LANGFUSE_PUBLIC_KEY = os.getenv("LANGFUSE_PUBLIC_KEY")
 LANGFUSE_SECRET_KEY = os.getenv("LANGFUSE_SECRET_KEY")
 LANGFUSE_HOST = os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
 
+PROMPT_TEMPLATE = """
+        You are InsightDoc, an expert technical assistant. Use the context below to answer.
+        
+        RULES:
+        1. ALWAYS cite the page number like [Page X] at the end of the sentence.
+        2. If the context contains a visual description (e.g., "[Visual Diagram...]"), use that information to describe diagrams or charts. 
+
+[Image of Technical Diagram]
+
+        3. If the context does not contain the answer, say "Data Not Found."
+
+        CONTEXT:
+        {context}
+
+        QUESTION: 
+        {question}
+
+        ANSWER:
+        """
+
+# Same prompt with the (compacted) conversation so far, for session turns
+CONVERSATION_PROMPT_TEMPLATE = PROMPT_TEMPLATE.replace(
+    "        CONTEXT:",
+    "        CONVERSATION SO FAR (only to understand follow-up questions; cite the CONTEXT):\n"
+    "        {history}\n\n"
+    "        CONTEXT:",
+)
+
+# Set by serve.py in the parent process before forking workers (see preload_models)
+PRELOADED_MODELS: Optional[dict] = None
+
+def load_embedding_model():
+    from langchain_huggingface import HuggingFaceEmbeddings
+    print(f"📥 Loading Local Embedding Model ({config.EMBEDDING_MODEL})...")
+    return HuggingFaceEmbeddings(
+        model_name=config.EMBEDDING_MODEL,
+        encode_kwargs={"batch_size": config.EMBED_ENCODE_BATCH_SIZE},
+    )
+
+def load_reranker():
+    print(f"🚀 Initializing Reranker ({config.RERANKER_BACKEND})...")
+    return create_reranker(
+        config.RERANKER_BACKEND,
+        cross_encoder_model=config.RERANKER_MODEL,
+        onnx_dirs=config.RERANKER_ONNX_DIRS,
+        max_length=config.RERANKER_MAX_LENGTH,
+        intra_op_threads=config.RERANKER_INTRA_OP_THREADS,
+    )
+
+def preload_models() -> dict:
+    """
+    Loads model weights only: no inference, no threads, no DB handles.
+    Used by serve.py before forking workers, so every worker shares the
+    weights copy-on-write. ONNX sessions own thread pools that don't survive
+    fork(), so those are left for each worker to build.
+    """
+    models = {"embeddings": load_embedding_model()}
+    if config.RERANKER_BACKEND == "cross-encoder":
+        models["reranker"] = load_reranker()
+    return models
+
 class RAGEngine:
-    def __init__(self):
-        # 1. Initialize Gemini
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash", 
-            temperature=0,
-            google_api_key=GOOGLE_API_KEY
+    def __init__(self, preloaded: Optional[dict] = None):
+        """
+        'preloaded' (optional) holds models from preload_models() to reuse
+        instead of loading them again.
+        """
+        preloaded = preloaded or {}
+        import chromadb
+
+        # 1. Initialize Gemini (or the offline stub, LLM_BACKEND=stub)
+        self.llm = create_llm(
+            config.LLM_BACKEND,
+            google_api_key=GOOGLE_API_KEY,
+            tokens_per_second=config.STUB_LLM_TOKENS_PER_SECOND,
+            first_token_seconds=config.STUB_LLM_FIRST_TOKEN_MS / 1000,
+            answer_tokens=config.STUB_LLM_ANSWER_TOKENS,
         )
         
         # 2. Initialize Local Embeddings (CPU)
-        print("📥 Loading Local Embedding Model (all-MiniLM-L6-v2)...")
-        self.embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        self.base_embeddings = preloaded.get("embeddings") or load_embedding_model()
+        self.embeddings = self.base_embeddings
+
+        # Query embeddings from concurrent requests share one forward pass
+        self.embed_batcher = None
+        if config.BATCHING_ENABLED:
+            self.embeddings = BatchedQueryEmbeddings(
+                self.embeddings, max_batch=config.EMBED_BATCH_MAX, window_ms=config.EMBED_BATCH_WINDOW_MS
+            )
+            self.embed_batcher = self.embeddings.batcher
+
+        # Persistent text-hash -> vector cache, so re-ingests, evaluation replays and
+        # repeated questions skip the model entirely
+        if config.EMBEDDING_CACHE_ENABLED:
+            self.embeddings = CachedEmbeddings(
+                self.embeddings,
+                model_name=config.EMBEDDING_MODEL,
+                cache_dir=config.EMBEDDING_CACHE_DIR,
+                max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+                query_cache_size=config.EMBEDDING_QUERY_LRU_SIZE,
+            )
+
+        # 3. Initialize Vector DB (Chroma): one collection per document, see PartitionedIndex
+        self.chroma_client = chromadb.PersistentClient(path=config.CHROMA_DIR)
+
+        # Chunking stage between extraction and indexing
+        self.chunker = None
+        if config.CHUNKING_ENABLED:
+            self.chunker = Chunker(
+                max_tokens=config.CHUNK_MAX_TOKENS,
+                overlap_tokens=config.CHUNK_OVERLAP_TOKENS,
+                counter=TokenCounter(config.CHUNK_TOKENIZER_PATH),
+            )
 
-        # 3. Initialize Vector DB (Chroma)
-        self.vector_db = Chroma(
-            persist_directory="./data/chroma_db",
-            embedding_function=self.embeddings
+        # Reranked passages -> deduplicated, token-budgeted prompt context
+        self.context_packer = None
+        if config.CONTEXT_PACKING_ENABLED:
+            self.context_packer = ContextPacker(
+                max_tokens=config.CONTEXT_MAX_TOKENS,
+                passage_max_tokens=config.CONTEXT_PASSAGE_MAX_TOKENS,
+                dedup_threshold=config.CONTEXT_DEDUP_THRESHOLD,
+                counter=self.chunker.counter if self.chunker else TokenCounter(config.CHUNK_TOKENIZER_PATH),
+            )
+
+        # What is indexed (file hash + per-page content hash -> vector ids)
+        self.manifest = IndexManifest(config.INDEX_MANIFEST_PATH)
+
+        # Vectors are partitioned per document. Queries are served from Chroma, or from
+        # memory-mapped snapshots exported from it (Chroma stays the write path; a new
+        # snapshot of a document is published after each ingest that changes it)
+        self.partitions = PartitionedIndex(
+            self.chroma_client, self.embeddings, self.manifest,
+            backend=config.VECTOR_BACKEND,
+            snapshot_root=config.VECTOR_SNAPSHOT_DIR,
+            quantization=config.VECTOR_SNAPSHOT_QUANTIZATION,
+            model_name=config.EMBEDDING_MODEL,
+            workers=config.PARTITION_SEARCH_WORKERS,
         )
+        self.partitions.migrate_legacy()
+        for source in self.manifest.sources():
+            if "version" not in self.manifest.get_source(source):
+                # Indexed before partitioning: current as of this index version
+                self.manifest.update_source(source, version=self.index_version)
+        self.manifest.save()
+        if config.VECTOR_BACKEND == "snapshot":
+            self.publish_snapshot()
+
+        # Normalized query -> reranked top-N, invalidated by the index version
+        self.retrieval_cache = None
+        if config.RETRIEVAL_CACHE_ENABLED:
+            self.retrieval_cache = RetrievalCache(
+                max_entries=config.RETRIEVAL_CACHE_SIZE,
+                ttl_seconds=config.RETRIEVAL_CACHE_TTL_SECONDS,
+            )
+
+        # Optional: replay answers of near-duplicate questions (same index version)
+        self.answer_cache = None
+        if config.ANSWER_CACHE_ENABLED:
+            self.answer_cache = SemanticAnswerCache(
+                capacity=config.ANSWER_CACHE_SIZE,
+                threshold=config.ANSWER_CACHE_THRESHOLD,
+            )
 
         # 4. Initialize Reranker (Cross-Encoder)
-        print("🚀 Initializing Cross-Encoder (Reranker)...")
-        self.reranker = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2')
+        self.reranker = preloaded.get("reranker") or load_reranker()
+
+        # Rerank pairs from concurrent requests are scored in one batched forward pass
+        self.rerank_batcher = None
+        if config.BATCHING_ENABLED:
+            self.rerank_batcher = MicroBatcher(
+                self.reranker.predict, name="rerank",
+                max_batch=config.RERANK_BATCH_MAX_PAIRS, window_ms=config.RERANK_BATCH_WINDOW_MS,
+            )
+
+        # Adaptive reranking: dense early exit, a TinyBERT first pass, this reranker only for the uncertain top slice
+        self.cascade = None
+        fast = None
+        if config.RERANK_MODE == "cascade":
+            try:
+                fast = create_reranker(
+                    "onnx-tinybert",
+                    cross_encoder_model=config.RERANKER_MODEL,
+                    onnx_dirs=config.RERANKER_ONNX_DIRS,
+                    max_length=config.RERANKER_MAX_LENGTH,
+                    intra_op_threads=config.RERANKER_INTRA_OP_THREADS,
+                )
+            except Exception as e:
+                # The TinyBERT weights are not shipped (see RERANKER_ONNX_DIRS): rerank everything instead
+                print(f"⚠️ Cascade reranking unavailable ({e}). Falling back to RERANK_MODE=full.")
+        if fast is not None:
+            self.cascade = RerankCascade(
+                fast.predict, self._score_pairs,
+                top_n=config.RERANK_TOP_N,
+                min_candidates=config.RERANK_CASCADE_MIN_CANDIDATES,
+                dense_window=config.RERANK_CASCADE_DENSE_WINDOW,
+                skip_margin=config.RERANK_CASCADE_SKIP_MARGIN,
+                fast_margin=config.RERANK_CASCADE_FAST_MARGIN,
+                precise_max=config.RERANK_CASCADE_PRECISE_MAX,
+            )
+            print(f"🎚️ Cascade reranking: {fast.name} -> {self.reranker.name}")
+
+        # Dedicated pool for CPU-bound retrieval work (embedding, search, rerank) of async requests
+        self.cpu_executor = ThreadPoolExecutor(max_workers=config.CPU_EXECUTOR_WORKERS, thread_name_prefix="rag-cpu")
 
         # 5. Initialize Langfuse Handler (The "Eyes")
         # We only init if keys are present to prevent crashes
         self.enable_observability = bool(LANGFUSE_PUBLIC_KEY and LANGFUSE_SECRET_KEY)
+        self.langfuse_handler = None
         if self.enable_observability:
+            from langfuse.langchain import CallbackHandler
+            # One handler for all requests (it batches and flushes traces in the background)
+            self.langfuse_handler = CallbackHandler()
             print("👀 Langfuse Observability Enabled.")
         else:
             print("⚠️ Langfuse keys not found. Observability disabled.")
 
-    def ingest_document(self, docs: List[Document]):
+    def shutdown(self):
+        """Flushes the embedding cache and stops the CPU pool."""
+        if isinstance(self.embeddings, CachedEmbeddings):
+            self.embeddings.flush()
+        self.cpu_executor.shutdown(wait=False, cancel_futures=True)
+        self.partitions.shutdown()
+
+    def warm_up(self) -> Dict[str, float]:
         """
-        Takes processed documents and saves them to ChromaDB.
+        Runs one throwaway inference through each model (bypassing the caches)
+        so the first real query doesn't pay lazy-init, allocation or JIT costs.
+        Returns the time (seconds) of each step.
         """
-        batch_size = 10 
-        total_docs = len(docs)
-        
-        print(f"🧠 Starting Local Ingestion for {total_docs} pages...")
+        timings = {}
+        probe = "warm-up probe: interrupt response time in clock cycles"
 
-        for i in range(0, total_docs, batch_size):
-            batch = docs[i : i + batch_size]
-            print(f"   - Embedding batch {i//batch_size + 1} (Local CPU)...")
-            self.vector_db.add_documents(batch)
-                
-        print("✅ Ingestion Complete.")
+        start = time.perf_counter()
+        vector = self.base_embeddings.embed_query(probe)
+        timings["embedding"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.reranker.predict([[probe, probe]] * 2)
+        timings["reranker"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.partitions.similarity_search_by_vector(vector, k=1)  # Loads every partition
+        timings["vector_search"] = time.perf_counter() - start
+        return timings
+
+    @property
+    def index_version(self) -> int:
+        """Changes whenever the content of the vector store changes."""
+        return self.manifest.version
+
+    def cache_stats(self) -> dict:
+        """Hit/miss counters of the engine's caches."""
+        stats = {}
+        if isinstance(self.embeddings, CachedEmbeddings):
+            stats["embedding_cache"] = self.embeddings.stats()
+        if self.retrieval_cache:
+            stats["retrieval_cache"] = self.retrieval_cache.stats()
+        if self.answer_cache:
+            stats["answer_cache"] = self.answer_cache.stats()
+        if self.embed_batcher:
+            stats["embed_batcher"] = self.embed_batcher.stats()
+        if self.rerank_batcher:
+            stats["rerank_batcher"] = self.rerank_batcher.stats()
+        if self.context_packer:
+            stats["context_packing"] = self.context_packer.stats()
+        if self.cascade:
+            stats["rerank_cascade"] = self.cascade.stats()
+        return stats
+
+    def publish_snapshot(self, sources: Optional[List[str]] = None):
+        """
+        Exports document partitions as new snapshots (for VECTOR_BACKEND=snapshot) and swaps them in.
+        Default: every document whose snapshot is missing or stale.
+        """
+        for source in (self.partitions.stale_snapshots() if sources is None else sources):
+            print(f"📸 Exporting vector snapshot of '{source}'...")
+            self.partitions.publish(source, self.manifest.get_source(source)["version"])
+
+    def remove_document(self, source: str) -> bool:
+        """Drops a document's partition and manifest entry. False if it isn't indexed."""
+        if self.manifest.remove_source(source) is None:
+            return False
+        self.partitions.drop(source)
+        new_version = self.manifest.bump_version()
+        if self.retrieval_cache:
+            self.retrieval_cache.invalidate(new_version)
+        self.manifest.save()
+        print(f"🗑️ Removed '{source}' from the index.")
+        return True
+
+    def is_indexed(self, source: str, file_hash: str) -> bool:
+        """True if this exact file is already indexed under 'source'."""
+        return self.manifest.file_hash(source) == file_hash
+
+    def ingest_document(self, docs: List[Document], progress: Optional[Callable[[int, int], None]] = None,
+                        file_hash: Optional[str] = None, publish: bool = True):
+        """
+        Takes processed documents, chunks them and saves them to ChromaDB, incrementally:
+        only new or changed pages are embedded, and vectors of pages that
+        changed or disappeared since the last ingest of the same source are deleted.
+        'progress' (optional) is called as progress(pages_done, total_pages) after each batch.
+        'publish=False' skips the snapshot export (VECTOR_BACKEND=snapshot), for bulk
+        loads that publish once at the end.
+        Returns throughput stats (pages, vectors, seconds, pages/sec, vectors/sec).
+        """
+        # Page Documents -> token-budgeted chunks (same 'page'/'source' metadata)
+        if self.chunker:
+            docs = self.chunker.split_documents(docs)
+
+        by_source: Dict[str, Dict[str, List[Document]]] = defaultdict(lambda: defaultdict(list))
+        for doc in docs:
+            by_source[doc.metadata.get("source", "unknown")][str(doc.metadata.get("page", 0))].append(doc)
+
+        start = time.perf_counter()
+        changed: List[str] = []
+        n_vectors = 0
+        for source, pages in by_source.items():
+            source_changed, source_vectors = self._ingest_source(source, pages, file_hash, progress)
+            if source_changed:
+                changed.append(source)
+            n_vectors += source_vectors
+
+        if changed:
+            new_version = self.manifest.bump_version()
+            for source in changed:
+                self.manifest.update_source(source, version=new_version)
+            if self.partitions.backend == "snapshot" and publish:
+                self.publish_snapshot(changed)
+            if self.retrieval_cache:
+                self.retrieval_cache.invalidate(new_version)
+        self.manifest.save()
+        if isinstance(self.embeddings, CachedEmbeddings):
+            self.embeddings.flush()
+
+        seconds = time.perf_counter() - start
+        n_pages = sum(len(pages) for pages in by_source.values())
+        stats = {
+            "pages": n_pages,
+            "vectors": n_vectors,
+            "seconds": round(seconds, 2),
+            "pages_per_sec": round(n_pages / seconds, 1) if seconds else 0.0,
+            "vectors_per_sec": round(n_vectors / seconds, 1) if seconds else 0.0,
+        }
+        print(f"✅ Ingestion Complete: {n_pages} pages, {n_vectors} new vectors in {seconds:.1f}s "
+              f"({stats['pages_per_sec']} pages/s, {stats['vectors_per_sec']} vectors/s).")
+        return stats
+
+    def _ingest_source(self, source: str, pages: Dict[str, List[Document]], file_hash: Optional[str],
+                       progress: Optional[Callable[[int, int], None]]) -> Tuple[bool, int]:
+        entry = self.manifest.get_source(source)
+        old_pages = self.manifest.pages(source)
+        store = self.partitions.store(source)
+        if entry is None:
+            # Leftovers of an interrupted first ingest can't be diffed; replace them.
+            stale_ids = list(store.get(include=[])["ids"])
+        else:
+            stale_ids = []
+
+        new_pages: Dict[str, dict] = {}
+        to_embed: List[Document] = []
+        to_embed_ids: List[str] = []
+
+        for page, page_docs in pages.items():
+            page_hash = sha256_text("\x00".join(d.page_content for d in page_docs))
+            old = old_pages.get(page)
+            if old and old["hash"] == page_hash:
+                new_pages[page] = old  # Unchanged: keep existing vectors
+                continue
+            ids = [f"{source}::p{page}::{page_hash[:16]}::{n}" for n in range(len(page_docs))]
+            new_pages[page] = {"hash": page_hash, "ids": ids}
+            to_embed.extend(page_docs)
+            to_embed_ids.extend(ids)
+            if old:
+                stale_ids.extend(old["ids"])
+
+        # Pages that no longer exist in the new version
+        for page, old in old_pages.items():
+            if page not in pages:
+                stale_ids.extend(old["ids"])
+
+        n_changed = sum(1 for page in pages if new_pages[page] is not old_pages.get(page))
+        print(f"🧠 Starting Local Ingestion for '{source}': {n_changed} new/changed page(s), "
+              f"{len(pages) - n_changed} unchanged, {len(stale_ids)} stale vector(s) to remove...")
 
-    def stream_answer(self, query: str) -> Generator[str, None, None]:
-        # --- PHASE 1: BROAD RETRIEVAL ---
         try:
-            retriever = self.vector_db.as_retriever(search_kwargs={"k": 25})
-            broad_docs = retriever.invoke(query)
-        except Exception as e:
-            yield f"⚠️ Retrieval Error: {str(e)}"
+            self._bulk_add(to_embed, to_embed_ids, progress, store._collection)
+        except BaseException:
+            # Cancelled or failed midway: the manifest still lists the old version, so the new
+            # vectors already written must go, or both versions of the changed pages are searchable
+            if to_embed_ids:
+                try:
+                    store.delete(ids=to_embed_ids)
+                except Exception as e:
+                    print(f"⚠️ Cleanup Warning: could not remove partial vectors of '{source}': {e}")
+            raise
+
+        # Delete only after the new vectors are in, so a page is never missing mid-update
+        if stale_ids:
+            store.delete(ids=stale_ids)
+
+        # Version of the last change: ingest_document sets a new one if this ingest changed anything
+        self.manifest.set_source(source, file_hash, new_pages, version=entry.get("version") if entry else None)
+        return bool(to_embed or stale_ids), len(to_embed)
+
+    def _bulk_add(self, docs: List[Document], ids: List[str],
+                  progress: Optional[Callable[[int, int], None]], collection):
+        """
+        Embeds and stores documents into the Chroma 'collection' in large batches (config.INGEST_BATCH_SIZE).
+        Texts are sorted by length so each batch pads to a similar size, and
+        batch N is written to Chroma on a background thread while batch N+1
+        is being embedded.
+        """
+        total = len(docs)
+        if not total:
             return
+        order = sorted(range(total), key=lambda i: len(docs[i].page_content))
+        batch_size = config.INGEST_BATCH_SIZE
+
+        def write(batch: List[int], vectors: List[List[float]]):
+            with telemetry.span("vector_write", chunks=len(batch)):
+                collection.upsert(
+                    ids=[ids[i] for i in batch],
+                    embeddings=vectors,
+                    documents=[docs[i].page_content for i in batch],
+                    metadatas=[docs[i].metadata for i in batch],
+                )
+
+        done = 0
+        pending = None
+        # Leaving the 'with' block waits for the in-flight write, even on error/cancel
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma-writer") as writer:
+            for start in range(0, total, batch_size):
+                batch = order[start : start + batch_size]
+                print(f"   - Embedding batch {start // batch_size + 1} ({len(batch)} chunks, Local CPU)...")
+                with telemetry.span("embed_documents", chunks=len(batch)):
+                    vectors = self.embeddings.embed_documents([docs[i].page_content for i in batch])
+                if pending:
+                    pending.result()  # Previous write must land before the next one is queued
+                    if progress:
+                        progress(done, total)
+                pending = writer.submit(write, batch, vectors)
+                done += len(batch)
+            pending.result()
+        if progress:
+            progress(total, total)
+
+    def _score_pairs(self, pairs: List[List[str]]):
+        """Reranker scores, through the cross-request batcher when enabled."""
+        if self.rerank_batcher:
+            return self.rerank_batcher.run(pairs)
+        return self.reranker.predict(pairs)
+
+    def _rank(self, query: str, docs: List[Document]) -> List[Tuple[Document, float]]:
+        """Reranker scores for all of 'docs', best first. Raises if the reranker fails."""
+        pairs = [[query, doc.page_content] for doc in docs]
+        with telemetry.span("rerank"):
+            scores = self._score_pairs(pairs)
+        return sorted(zip(docs, map(float, scores)), key=lambda x: x[1], reverse=True)
+
+    def _cascade_rank(self, query: str, dense_hits: List[Tuple[Document, float]]) -> List[Tuple[Document, Optional[float]]]:
+        """Cascade reranking (RERANK_MODE=cascade); the tier and candidate counts go out with the rerank span."""
+        ranked, trace = self.cascade.rank(query, dense_hits)
+        seconds = trace.pop("seconds")
+        telemetry.observe("rerank", seconds, **trace)
+        if config.RERANK_CASCADE_LOG:
+            print(f"🎚️ Rerank tier={trace['tier']}: {len(dense_hits)} dense, {trace['candidates']} reranked, "
+                  f"{trace['precise']} precise ({seconds * 1000:.0f} ms)")
+        return ranked
+
+    @staticmethod
+    def _cache_key(query: str, sources: Optional[List[str]]) -> str:
+        """Retrieval cache key: the same question scoped to other documents has other answers."""
+        if not sources:
+            return query
+        return f"{query}\x00{chr(0).join(sorted(set(sources)))}"
+
+    def retrieve(self, query: str, sources: Optional[List[str]] = None) -> List[Document]:
+        """
+        Broad retrieval + reranking. Returns the top reranked documents.
+        'sources' (optional) limits the search to those documents' partitions.
+        Served from the retrieval cache when the same question was asked
+        against the same index version. Raises on retrieval errors.
+        """
+        return [doc for doc, _ in self.retrieve_ranked(query, sources)[0]]
+
+    def retrieve_ranked(self, query: str, sources: Optional[List[str]] = None
+                        ) -> Tuple[List[Tuple[Document, Optional[float]]], List[Tuple[Document, Optional[float]]]]:
+        """
+        retrieve() with scores: returns (top reranked (Document, score) pairs,
+        all scored candidates). Scores are None if reranking failed.
+        """
+        cache_key = self._cache_key(query, sources)
+        cached = self.retrieval_cache.get(cache_key, self.index_version) if self.retrieval_cache else None
+        if cached is not None:
+            hits = [(doc, score) for _, score, doc in cached]
+            return hits, hits
+
+        # Read the version before searching, so an ingest racing this query can't
+        # get its (newer) version attached to older results
+        index_version = self.index_version
+
+        # --- PHASE 1: BROAD RETRIEVAL ---
+        with telemetry.span("embed_query"):
+            query_vector = self.embeddings.embed_query(query)
+        with telemetry.span("vector_search"):
+            dense_hits = self.partitions.search(query_vector, config.RETRIEVAL_K, sources)
+        broad_docs = [doc for doc, _ in dense_hits]
         
         # --- PHASE 2: RERANKING ---
         try:
-            pairs = [[query, doc.page_content] for doc in broad_docs]
-            scores = self.reranker.predict(pairs)
-            
-            ranked_docs = []
-            for i, doc in enumerate(broad_docs):
-                ranked_docs.append({"doc": doc, "score": scores[i]})
-            
-            ranked_docs.sort(key=lambda x: x["score"], reverse=True)
-            top_results = [item["doc"] for item in ranked_docs[:5]]
-            
+            if self.cascade:
+                ranked = self._cascade_rank(query, dense_hits)
+            else:
+                ranked = self._rank(query, broad_docs)
         except Exception as e:
+            # Not cached: the next ask should get a real ranking
             print(f"⚠️ Reranking Warning: {e}")
-            top_results = broad_docs[:5]
+            unranked = [(doc, None) for doc in broad_docs]
+            return unranked[:config.RERANK_TOP_N], unranked
+        top_ranked = ranked[:config.RERANK_TOP_N]
 
-        # Prepare Context
-        context_text = "\n\n".join(
-            [f"[Page {d.metadata.get('page', '?')}] {d.page_content}" for d in top_results]
-        )
+        if self.retrieval_cache:
+            self.retrieval_cache.put(cache_key, index_version, [(doc.id, score, doc) for doc, score in top_ranked])
+        return top_ranked, ranked
 
-        # --- PHASE 3: GENERATION (Gemini) ---
-        template = """
-        You are InsightDoc, an expert technical assistant. Use the context below to answer.
-        
-        RULES:
-        1. ALWAYS cite the page number like [Page X] at the end of the sentence.
-        2. If the context contains a visual description (e.g., "[Visual Diagram...]"), use that information to describe diagrams or charts. 
+    def retrieve_in_session(self, session: Session, query: str,
+                            sources: Optional[List[str]] = None) -> Tuple[List[Tuple[Document, Optional[float]]], bool]:
+        """
+        Retrieval for a conversation turn. A follow-up question is first reranked
+        against the session's best earlier candidates (no embedding, no vector
+        search, fewer pairs). Only if none of them is relevant enough
+        (SESSION_REUSE_MIN_SCORE) does it run a full retrieval, whose scored
+        candidates join the session's pool. Returns (top hits, reused).
+        With a 'sources' scope only candidates from those documents are reused.
+        """
+        index_version = self.index_version
+        candidates = session.candidate_docs(index_version, limit=config.SESSION_RERANK_CANDIDATES, sources=sources)
+        if candidates:
+            try:
+                ranked = self._rank(query, candidates)
+                session.add_candidates(ranked, index_version)
+                if ranked[0][1] >= config.SESSION_REUSE_MIN_SCORE:
+                    return ranked[:config.RERANK_TOP_N], True
+            except Exception as e:
+                print(f"⚠️ Session Rerank Warning: {e}")
 
-[Image of Technical Diagram]
+        hits, ranked = self.retrieve_ranked(query, sources)
+        session.add_candidates(ranked, index_version)
+        return hits, False
 
-        3. If the context does not contain the answer, say "Data Not Found."
+    # --- Batch Retrieval (many questions at once: /chat/batch, evaluation) ---
 
-        CONTEXT:
-        {context}
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        embed_queries = getattr(self.embeddings, "embed_queries", None)
+        if embed_queries:
+            return embed_queries(queries)
+        return [self.embeddings.embed_query(q) for q in queries]
 
-        QUESTION: 
-        {question}
+    def _search_many(self, vectors: List[List[float]], k: int, sources: Optional[List[str]] = None) -> List[List[Document]]:
+        """Broad retrieval for several query vectors in one call per partition."""
+        return [[doc for doc, _ in hits] for hits in self.partitions.search_many(vectors, k, sources)]
 
-        ANSWER:
+    def retrieve_batch(self, queries: List[str], vectors: Optional[List[List[float]]] = None,
+                       sources: Optional[List[str]] = None) -> List[List[Tuple[Document, Optional[float]]]]:
+        """
+        retrieve() for many questions: one embedding batch, one vector store
+        call per partition, and one reranker pass per group of CHAT_BATCH_RERANK_GROUP questions.
+        Returns the top reranked (Document, score) pairs per question (score is
+        None if reranking failed). 'vectors' (optional) are precomputed query embeddings;
+        'sources' (optional) limits the search to those documents.
+        """
+        index_version = self.index_version
+        results: List[Optional[List[Tuple[Document, Optional[float]]]]] = [None] * len(queries)
+        misses = []
+        for i, query in enumerate(queries):
+            key = self._cache_key(query, sources)
+            cached = self.retrieval_cache.get(key, index_version) if self.retrieval_cache else None
+            if cached is not None:
+                results[i] = [(doc, score) for _, score, doc in cached]
+            else:
+                misses.append(i)
+        if not misses:
+            return results
+
+        # --- PHASE 1: BROAD RETRIEVAL (all questions together) ---
+        if vectors is None:
+            with telemetry.span("embed_query", queries=len(misses)):
+                miss_vectors = self._embed_queries([queries[i] for i in misses])
+        else:
+            miss_vectors = [vectors[i] for i in misses]
+        with telemetry.span("vector_search", queries=len(misses)):
+            candidates = self._search_many(miss_vectors, config.RETRIEVAL_K, sources)
+
+        # --- PHASE 2: RERANKING (one forward pass per group of questions) ---
+        group_size = max(1, config.CHAT_BATCH_RERANK_GROUP)
+        for start in range(0, len(misses), group_size):
+            group = range(start, min(start + group_size, len(misses)))
+            pairs = [[queries[misses[j]], doc.page_content] for j in group for doc in candidates[j]]
+            try:
+                with telemetry.span("rerank", queries=len(group)):
+                    scores = self._score_pairs(pairs) if pairs else []
+            except Exception as e:
+                # Not cached: the next ask should get a real ranking
+                print(f"⚠️ Reranking Warning: {e}")
+                for j in group:
+                    results[misses[j]] = [(doc, None) for doc in candidates[j][:config.RERANK_TOP_N]]
+                continue
+
+            offset = 0
+            for j in group:
+                docs = candidates[j]
+                doc_scores = [float(score) for score in scores[offset : offset + len(docs)]]
+                offset += len(docs)
+                ranked = sorted(zip(docs, doc_scores), key=lambda x: x[1], reverse=True)[:config.RERANK_TOP_N]
+                results[misses[j]] = ranked
+                if self.retrieval_cache:
+                    self.retrieval_cache.put(self._cache_key(queries[misses[j]], sources), index_version,
+                                             [(doc.id, score, doc) for doc, score in ranked])
+        return results
+
+    async def answer_batch(self, questions: List[str], concurrency: int = 8,
+                           sources: Optional[List[str]] = None) -> List[dict]:
+        """
+        Answers many questions (not streamed). Retrieval and reranking run
+        batched on the CPU executor; generation runs with at most 'concurrency'
+        LLM calls in flight. Each result carries its retrieved pages and scores.
+        'sources' (optional) limits retrieval to those documents.
+        """
+        loop = asyncio.get_running_loop()
+        index_version = self.index_version
+
+        with telemetry.span("embed_query", queries=len(questions)):
+            vectors = await loop.run_in_executor(self.cpu_executor, self._embed_queries, questions)
+        # The answer cache is corpus-wide: scoped questions skip it
+        use_answer_cache = self.answer_cache is not None and not sources
+        cached_answers = [None] * len(questions)
+        if use_answer_cache:
+            cached_answers = [self.answer_cache.lookup(v, index_version) for v in vectors]
+        retrieved = await loop.run_in_executor(self.cpu_executor, self.retrieve_batch, questions, vectors, sources)
+
+        chain, run_config = self._build_chain()
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def answer_one(i: int) -> dict:
+            start = time.perf_counter()
+            hits = retrieved[i]
+            result = {
+                "question": questions[i],
+                "answer": None,
+                "cached": cached_answers[i] is not None,
+                "error": None,
+                "context": None,  # Packing stats: tokens sent, tokens saved, duplicates dropped
+                "sources": [
+                    {"id": doc.id, "source": doc.metadata.get("source"), "page": doc.metadata.get("page"),
+                     "score": None if score is None else round(score, 4)}
+                    for doc, score in hits
+                ],
+            }
+            if cached_answers[i] is not None:
+                result["answer"] = cached_answers[i]
+            else:
+                async with semaphore:
+                    try:
+                        # Packing tokenizes every passage: CPU work, kept off the event loop
+                        context_text, packed = await loop.run_in_executor(
+                            self.cpu_executor, self._assemble_context, questions[i], [doc for doc, _ in hits]
+                        )
+                        if packed:
+                            result["context"] = packed.to_dict()
+                        with telemetry.span("generation", mode="batch"):
+                            result["answer"] = await chain.ainvoke({"context": context_text, "question": questions[i]},
+                                                                   config=run_config)
+                        if use_answer_cache:
+                            self._store_answer(questions[i], vectors[i], result["answer"], index_version)
+                    except Exception as e:
+                        result["error"] = f"Generator Error: {e}"
+            result["latency_seconds"] = round(time.perf_counter() - start, 3)
+            return result
+
+        return await asyncio.gather(*(answer_one(i) for i in range(len(questions))))
+
+    # --- Answer Pipeline Stages (shared by the sync and async paths) ---
+
+    def _check_answer_cache(self, query: str):
+        """Returns (index_version, query_vector, cached_answer or None)."""
+        index_version = self.index_version
+        if not self.answer_cache:
+            return index_version, None, None
+        try:
+            query_vector = self.embeddings.embed_query(query)
+            return index_version, query_vector, self.answer_cache.lookup(query_vector, index_version)
+        except Exception as e:
+            print(f"⚠️ Answer Cache Warning: {e}")
+            return index_version, None, None
+
+    def _store_answer(self, query: str, query_vector, answer: str, index_version: int):
+        # Only complete, error-free answers are cached
+        if self.answer_cache and query_vector is not None:
+            self.answer_cache.store(query, query_vector, answer, index_version)
+
+    @staticmethod
+    def _build_context(top_results: List[Document]) -> str:
+        return "\n\n".join(
+            [f"[Page {d.metadata.get('page', '?')}] {d.page_content}" for d in top_results]
+        )
+
+    def _assemble_context(self, query: str, top_results: List[Document]) -> Tuple[str, Optional[PackedContext]]:
         """
-        prompt = PromptTemplate.from_template(template)
+        Prompt context for the reranked results (packed to CONTEXT_MAX_TOKENS when
+        enabled). The per-request token counts go out with the prompt_assembly span.
+        """
+        start = time.perf_counter()
+        if not self.context_packer:
+            context_text = self._build_context(top_results)
+            telemetry.observe("prompt_assembly", time.perf_counter() - start)
+            return context_text, None
+        packed = self.context_packer.pack(query, top_results)
+        telemetry.observe("prompt_assembly", time.perf_counter() - start, **packed.to_dict())
+        return packed.text, packed
+
+    def _build_chain(self, with_history: bool = False):
+        """Returns (chain, run_config) for the generation phase."""
+        prompt = PromptTemplate.from_template(CONVERSATION_PROMPT_TEMPLATE if with_history else PROMPT_TEMPLATE)
         
         chain = prompt | self.llm | StrOutputParser()
         
         # Configure Callbacks (Langfuse)
         run_config = {}
-        if self.enable_observability:
-            langfuse_handler = CallbackHandler()            
-            
-            run_config["callbacks"] = [langfuse_handler]
-        
+        if self.langfuse_handler:
+            run_config["callbacks"] = [self.langfuse_handler]
+        return chain, run_config
+
+    def _retrieve_turn(self, query: str, session: Optional[Session], sources: Optional[List[str]]):
+        """Returns (top (Document, score) hits, reused session candidates?)."""
+        if session is None:
+            return self.retrieve_ranked(query, sources)[0], False
+        return self.retrieve_in_session(session, query, sources)
+
+    def _generation_inputs(self, query: str, context_text: str, session: Optional[Session]):
+        """Returns (chain, run_config, inputs), with the conversation so far for session turns."""
+        history = session.history() if session else ""
+        chain, run_config = self._build_chain(with_history=bool(history))
+        inputs = {"context": context_text, "question": query}
+        if history:
+            inputs["history"] = history
+        return chain, run_config, inputs
+
+    def _finish_turn(self, query: str, answer: str, query_vector, index_version: int,
+                     session: Optional[Session], hits, reused: bool):
+        if session is None:
+            self._store_answer(query, query_vector, answer, index_version)
+        else:
+            session.add_turn(query, answer, [(doc.id, score) for doc, score in hits], reused)
+
+    def stream_answer(self, query: str, session: Optional[Session] = None,
+                      sources: Optional[List[str]] = None) -> Generator[str, None, None]:
+        """
+        Streams the answer to 'query'. With a 'session', earlier turns shape the
+        prompt and retrieval reuses the session's candidates (see retrieve_in_session).
+        'sources' (optional) limits retrieval to those documents.
+        The semantic answer cache is skipped for both, since the answer then
+        depends on the conversation or the scope.
+        """
+        request_start = time.perf_counter()
+
+        # --- PHASE 0: SEMANTIC ANSWER CACHE ---
+        index_version, query_vector, cached_answer = self.index_version, None, None
+        if session is None and not sources:
+            index_version, query_vector, cached_answer = self._check_answer_cache(query)
+        if cached_answer is not None:
+            yield from self.answer_cache.replay(cached_answer)
+            return
+
+        # --- PHASE 1 + 2: RETRIEVAL & RERANKING ---
+        try:
+            hits, reused = self._retrieve_turn(query, session, sources)
+        except Exception as e:
+            yield f"⚠️ Retrieval Error: {str(e)}"
+            return
+
+        # Prepare Context
+        context_text, _ = self._assemble_context(query, [doc for doc, _ in hits])
+        chain, run_config, inputs = self._generation_inputs(query, context_text, session)
+
+        # --- PHASE 3: GENERATION (Gemini) ---
+        answer_chunks = []
+        generation_start = time.perf_counter()
         try:
             # We pass 'run_config' to enable tracing
-            for chunk in chain.stream({"context": context_text, "question": query}, config=run_config):
+            for chunk in chain.stream(inputs, config=run_config):
+                if not answer_chunks:
+                    telemetry.observe("ttft", time.perf_counter() - request_start)
+                answer_chunks.append(chunk)
                 yield chunk
         except Exception as e:
-            yield f"⚠️ Generator Error: {str(e)}"
\ No newline at end of file
+            yield f"⚠️ Generator Error: {str(e)}"
+            return
+        telemetry.observe("generation", time.perf_counter() - generation_start)
+
+        self._finish_turn(query, "".join(answer_chunks), query_vector, index_version, session, hits, reused)
+
+    async def astream_answer(self, query: str, session: Optional[Session] = None,
+                             sources: Optional[List[str]] = None) -> AsyncGenerator[str, None]:
+        """
+        Async-native version of stream_answer.
+        CPU work (embedding, vector search, reranking, context packing) runs on
+        the engine's CPU executor so the event loop stays free; generation uses the LLM's
+        async streaming API. Closing the generator (client disconnect) stops
+        generation immediately.
+        """
+        loop = asyncio.get_running_loop()
+        request_start = time.perf_counter()
+
+        # --- PHASE 0: SEMANTIC ANSWER CACHE ---
+        index_version, query_vector, cached_answer = self.index_version, None, None
+        if session is None and not sources:
+            index_version, query_vector, cached_answer = await loop.run_in_executor(
+                self.cpu_executor, self._check_answer_cache, query
+            )
+        if cached_answer is not None:
+            for chunk in self.answer_cache.replay(cached_answer):
+                yield chunk
+            return
+
+        # --- PHASE 1 + 2: RETRIEVAL & RERANKING ---
+        try:
+            hits, reused = await loop.run_in_executor(self.cpu_executor, self._retrieve_turn, query, session, sources)
+        except Exception as e:
+            yield f"⚠️ Retrieval Error: {str(e)}"
+            return
+
+        # Context packing tokenizes every passage: CPU work too
+        context_text, _ = await loop.run_in_executor(
+            self.cpu_executor, self._assemble_context, query, [doc for doc, _ in hits]
+        )
+        chain, run_config, inputs = self._generation_inputs(query, context_text, session)
+
+        # --- PHASE 3: GENERATION (Gemini, async) ---
+        answer_chunks = []
+        generation_start = time.perf_counter()
+        try:
+            async with aclosing(chain.astream(inputs, config=run_config)) as stream:
+                async for chunk in stream:
+                    if not answer_chunks:
+                        # Time to first token, as seen by the client (includes retrieval and queueing on the CPU pool)
+                        telemetry.observe("ttft", time.perf_counter() - request_start)
+                    answer_chunks.append(chunk)
+                    yield chunk
+        except Exception as e:
+            yield f"⚠️ Generator Error: {str(e)}"
+            return
+        telemetry.observe("generation", time.perf_counter() - generation_start)
+
+        self._finish_turn(query, "".join(answer_chunks), query_vector, index_version, session, hits, reused)
@@ -0,0 +1,97 @@
+import os
+import glob
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# A reranker is anything with a 'name' and predict(pairs) -> np.ndarray of scores,
+# where pairs is [[query, passage], ...]. Higher score = more relevant.
+# All backends here return sigmoid probabilities, so scores are comparable across them.
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+class CrossEncoderReranker:
+    """PyTorch cross-encoder via sentence-transformers (the original backend)."""
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+        # Imported here so the ONNX backends never pull in torch
+        import torch
+        from sentence_transformers import CrossEncoder
+        self.name = model_name
+        self.model = CrossEncoder(model_name)
+        self._activation = torch.nn.Sigmoid()
+
+    def predict(self, pairs: Sequence[Sequence[str]]) -> np.ndarray:
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        return np.asarray(self.model.predict(pairs, activation_fn=self._activation), dtype=np.float32)
+
+class OnnxReranker:
+    """
+    Cross-encoder running on onnxruntime, loaded from a local model directory
+    (tokenizer.json + *.onnx, e.g. the bundled FlashRank models).
+    Never touches the network and doesn't need torch.
+    """
+    def __init__(self, model_dir: str, onnx_file: Optional[str] = None, max_length: int = 512,
+                 intra_op_threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        if onnx_file is None:
+            candidates = sorted(glob.glob(os.path.join(model_dir, "*.onnx")))
+            if not candidates:
+                raise FileNotFoundError(
+                    f"No .onnx model found in '{model_dir}'. Copy the FlashRank model files there "
+                    f"(models are never downloaded at runtime)."
+                )
+            onnx_file = candidates[0]
+        else:
+            onnx_file = os.path.join(model_dir, onnx_file)
+
+        self.name = os.path.basename(onnx_file)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        # One request at a time per session; parallelism comes from intra-op threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(onnx_file, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def predict(self, pairs: Sequence[Sequence[str]]) -> np.ndarray:
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        encodings = self.tokenizer.encode_batch([(q, p) for q, p in pairs])
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        feeds = {k: v for k, v in feeds.items() if k in self._input_names}
+        logits = self.session.run(None, feeds)[0]
+        # Single-logit relevance head; for 2-class heads the last column is "relevant"
+        logits = logits[:, -1] if logits.ndim == 2 else logits
+        return _sigmoid(logits.astype(np.float32))
+
+def create_reranker(backend: str, cross_encoder_model: str, onnx_dirs: dict, max_length: int = 512,
+                    intra_op_threads: int = 0):
+    """
+    Builds the configured reranker.
+    backend: "cross-encoder" or "onnx-<name>" where <name> is a key of 'onnx_dirs'.
+    """
+    if backend == "cross-encoder":
+        return CrossEncoderReranker(cross_encoder_model)
+    if backend.startswith("onnx-"):
+        key = backend[len("onnx-"):]
+        if key not in onnx_dirs:
+            raise ValueError(f"Unknown ONNX reranker '{key}'. Options: {', '.join(onnx_dirs)}")
+        return OnnxReranker(onnx_dirs[key], max_length=max_length, intra_op_threads=intra_op_threads)
+    raise ValueError(f"Unknown reranker backend '{backend}'.")
+
+def available_backends(onnx_dirs: dict) -> List[str]:
+    return ["cross-encoder"] + [f"onnx-{key}" for key in onnx_dirs]
@@ -0,0 +1,69 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# (doc_id, rerank_score, document)
+RankedHit = Tuple[Optional[str], float, Document]
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation don't change what gets retrieved."""
+    return re.sub(r"\s+", " ", query).strip().rstrip("?!.").strip().lower()
+
+class RetrievalCache:
+    """
+    Normalized query -> reranked top-N hits, with LRU + TTL eviction.
+    Entries are tagged with the index version they were computed against;
+    a newer index version makes them invisible (and they get purged).
+    """
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[int, float, List[RankedHit]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "invalidated": 0}
+
+    def get(self, query: str, index_version: int) -> Optional[List[RankedHit]]:
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            version, expires_at, hits = entry
+            if version != index_version or expires_at < time.monotonic():
+                del self._entries[key]
+                self._stats["expired" if version == index_version else "invalidated"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return hits
+
+    def put(self, query: str, index_version: int, hits: List[RankedHit]):
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = (index_version, time.monotonic() + self.ttl_seconds, hits)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evicted"] += 1
+
+    def invalidate(self, index_version: int):
+        """Drops every entry computed against an older index version."""
+        with self._lock:
+            stale = [k for k, (v, _, _) in self._entries.items() if v != index_version]
+            for key in stale:
+                del self._entries[key]
+            self._stats["invalidated"] += len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
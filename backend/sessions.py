@@ -0,0 +1,200 @@
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from backend.chunking import TokenCounter, _SENTENCE_RE
+
+def _first_sentences(text: str, counter: TokenCounter, max_tokens: int) -> Tuple[str, int]:
+    """Leading sentences of 'text' that fit in 'max_tokens' (at least one, cut by words if needed)."""
+    out, used = [], 0
+    for sentence in _SENTENCE_RE.split(" ".join(text.split())):
+        tokens = counter.count(sentence)
+        if out and used + tokens > max_tokens:
+            break
+        if not out and tokens > max_tokens:
+            words = sentence.split(" ")
+            sentence = " ".join(words[: max(1, int(len(words) * max_tokens / tokens))]) + " …"
+            tokens = counter.count(sentence)
+        out.append(sentence)
+        used += tokens
+    return " ".join(out), used
+
+class Turn:
+    __slots__ = ("question", "answer", "hits", "reused", "at")
+
+    def __init__(self, question: str, answer: str, hits: List[Tuple[Optional[str], Optional[float]]], reused: bool):
+        self.question = question
+        self.answer = answer
+        self.hits = hits      # (doc id, reranker score) of the passages used for this turn
+        self.reused = reused  # True if they came from the session's candidates (no vector search)
+        self.at = time.time()
+
+    def to_dict(self) -> dict:
+        return {"question": self.question, "answer": self.answer, "reused_candidates": self.reused, "at": self.at,
+                "hits": [{"id": i, "score": None if s is None else round(s, 4)} for i, s in self.hits]}
+
+class Session:
+    """
+    One conversation: its recent turns, a compacted summary of older ones, and
+    the pool of retrieval candidates seen so far (for the index version they
+    came from), so follow-up questions can be reranked without a new search.
+    """
+    def __init__(self, session_id: str, counter: TokenCounter, recent_turns: int, history_max_tokens: int,
+                 answer_max_tokens: int, max_candidates: int):
+        self.id = session_id
+        self.counter = counter
+        self.history_max_tokens = history_max_tokens
+        self.answer_max_tokens = answer_max_tokens
+        self.max_candidates = max_candidates
+        self.created_at = time.time()
+        self.turns = 0
+        self.lock = threading.Lock()
+
+        # History: the last 'recent_turns' turns verbatim (answers shortened), older ones as one line each
+        self.recent: Deque[Turn] = deque()
+        self.recent_turns = recent_turns
+        self._recent_text: Deque[Tuple[str, int]] = deque()
+        self._summary: Deque[Tuple[str, int]] = deque()
+
+        # Retrieval state: doc id -> (Document, latest reranker score), most recently scored last
+        self.index_version: Optional[int] = None
+        self.candidates: "OrderedDict[str, Tuple[Document, Optional[float]]]" = OrderedDict()
+
+    # --- Retrieval state ---
+
+    def _check_version(self, index_version: int):
+        if self.index_version != index_version:
+            # The index changed under the conversation: the old candidates may be stale
+            self.index_version = index_version
+            self.candidates.clear()
+
+    def candidate_docs(self, index_version: int, limit: int, sources: Optional[List[str]] = None) -> List[Document]:
+        """The 'limit' candidates with the best reranker scores from earlier turns (from 'sources' only, if given)."""
+        with self.lock:
+            self._check_version(index_version)
+            scored = [c for c in self.candidates.values() if not sources or c[0].metadata.get("source") in sources]
+            scored.sort(key=lambda x: -1.0 if x[1] is None else x[1], reverse=True)
+            return [doc for doc, _ in scored[:limit]]
+
+    def add_candidates(self, ranked: List[Tuple[Document, Optional[float]]], index_version: int):
+        """Adds (or re-scores) candidates; the latest score wins, since the conversation moves on."""
+        with self.lock:
+            self._check_version(index_version)
+            for doc, score in ranked:
+                key = doc.id or f"{doc.metadata.get('source')}::{doc.metadata.get('page')}::{hash(doc.page_content)}"
+                self.candidates[key] = (doc, score)
+                self.candidates.move_to_end(key)
+            while len(self.candidates) > self.max_candidates:
+                self.candidates.popitem(last=False)
+
+    # --- History ---
+
+    def _compact(self, turn: Turn) -> Tuple[str, int]:
+        """One line per old turn: the question and the first sentence of the answer."""
+        answer, _ = _first_sentences(turn.answer, self.counter, 40)
+        line = f"- Asked: {turn.question} -> {answer}"
+        return line, self.counter.count(line)
+
+    def add_turn(self, question: str, answer: str, hits, reused: bool):
+        """Appends a turn; compacts only the turn that leaves the recent window (O(1) per turn)."""
+        turn = Turn(question, answer, hits, reused)
+        short_answer, answer_tokens = _first_sentences(answer, self.counter, self.answer_max_tokens)
+        text = f"User: {question}\nInsightDoc: {short_answer}"
+        with self.lock:
+            self.turns += 1
+            self.recent.append(turn)
+            self._recent_text.append((text, self.counter.count(question) + answer_tokens + 4))
+            if len(self.recent) > self.recent_turns:
+                self._summary.append(self._compact(self.recent.popleft()))
+                self._recent_text.popleft()
+            # Oldest summary lines go first once the history exceeds its budget
+            while self._summary and self._history_tokens() > self.history_max_tokens:
+                self._summary.popleft()
+
+    def _history_tokens(self) -> int:
+        return sum(t for _, t in self._summary) + sum(t for _, t in self._recent_text)
+
+    def history(self) -> str:
+        """Conversation so far, for the prompt ('' on the first turn)."""
+        with self.lock:
+            parts = []
+            if self._summary:
+                parts.append("Earlier:\n" + "\n".join(line for line, _ in self._summary))
+            parts.extend(text for text, _ in self._recent_text)
+            return "\n\n".join(parts)
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "session_id": self.id,
+                "created_at": self.created_at,
+                "turns": self.turns,
+                "history_tokens": self._history_tokens(),
+                "candidates": len(self.candidates),
+                "index_version": self.index_version,
+                "recent_turns": [t.to_dict() for t in self.recent],
+            }
+
+class SessionStore:
+    """
+    Bounded in-memory conversations with LRU eviction and an idle TTL.
+    Sessions live in the serving process: with several workers (serve.py)
+    the load balancer must route a session to the same worker.
+    """
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 1800.0, recent_turns: int = 3,
+                 history_max_tokens: int = 400, answer_max_tokens: int = 80, max_candidates: int = 60,
+                 counter: Optional[TokenCounter] = None):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.session_args = dict(counter=counter or TokenCounter(), recent_turns=recent_turns,
+                                 history_max_tokens=history_max_tokens, answer_max_tokens=answer_max_tokens,
+                                 max_candidates=max_candidates)
+        self._sessions: "OrderedDict[str, Tuple[float, Session]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "expired": 0, "evicted": 0}
+
+    def _get(self, session_id: str) -> Optional[Session]:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        last_used, session = entry
+        if last_used + self.ttl_seconds < time.monotonic():
+            del self._sessions[session_id]
+            self._stats["expired"] += 1
+            return None
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            return self._get(session_id)
+
+    def get_or_create(self, session_id: str) -> Session:
+        with self._lock:
+            # Least recently used first: drop the idle-expired ones from the front
+            while self._sessions:
+                oldest_id, (last_used, _) = next(iter(self._sessions.items()))
+                if last_used + self.ttl_seconds >= time.monotonic():
+                    break
+                del self._sessions[oldest_id]
+                self._stats["expired"] += 1
+            session = self._get(session_id)
+            if session is None:
+                session = Session(session_id, **self.session_args)
+                self._stats["created"] += 1
+            self._sessions[session_id] = (time.monotonic(), session)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._stats["evicted"] += 1
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"active": len(self._sessions), "max_sessions": self.max_sessions, **self._stats}
@@ -0,0 +1,67 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+class StartupReport:
+    """
+    Tracks server warm-up: which stage is running, how long each stage took
+    (imports, model loading, warm-up inference), and whether the server is ready.
+    Served by /ready so startup regressions are visible on every deploy.
+    """
+    def __init__(self):
+        self.process_started_at = time.time()
+        self.status = "starting"        # starting | warming | ready | failed
+        self.current_stage: Optional[str] = None
+        self.stages: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.ready_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    @contextmanager
+    def stage(self, name: str):
+        with self._lock:
+            self.status = "warming"
+            self.current_stage = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.stages[name] = round(time.perf_counter() - start, 3)
+                self.current_stage = None
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = round(seconds, 3)
+
+    def mark_ready(self):
+        with self._lock:
+            self.status = "ready"
+            self.ready_at = time.time()
+        print(f"🟢 Ready in {self.ready_at - self.process_started_at:.1f}s (pid {os.getpid()})")
+        for name, seconds in self.stages.items():
+            print(f"   - {name:<32} {seconds:>7.3f}s")
+
+    def mark_failed(self, error: Exception):
+        with self._lock:
+            self.status = "failed"
+            self.error = str(error)
+        print(f"🔴 Startup failed: {error}")
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "status": self.status,
+                "pid": os.getpid(),
+                "current_stage": self.current_stage,
+                "stages": dict(self.stages),
+                "seconds_to_ready": round(self.ready_at - self.process_started_at, 3) if self.ready_at else None,
+                "uptime_seconds": round(time.time() - self.process_started_at, 1),
+                "error": self.error,
+            }
@@ -0,0 +1,291 @@
+import os
+import re
+import sys
+import json
+import time
+import queue
+import bisect
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from backend import config
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+class Histogram:
+    """Fixed-bucket latency histogram (Prometheus semantics: bucket 'le' counts are cumulative)."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None if empty or beyond the last bucket)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+class SpanExporter:
+    """
+    Ships finished spans off the hot path: record() only appends to a bounded
+    buffer; a daemon thread hands them to 'sink' in batches every 'interval'
+    seconds. When the sink can't keep up the oldest spans are dropped (and
+    counted), so export never blocks or slows a request.
+    """
+    def __init__(self, sink: Callable[[List[dict]], None], interval: float = 2.0,
+                 batch_size: int = 1000, max_buffered: int = 50000):
+        self.sink = sink
+        self.interval = interval
+        self.batch_size = batch_size
+        self._buffer = deque(maxlen=max_buffered)
+        self._stop = threading.Event()
+        self._stats = {"exported": 0, "dropped": 0, "sink_errors": 0}
+        self._thread = threading.Thread(target=self._run, name="telemetry-export", daemon=True)
+        self._thread.start()
+
+    def record(self, span: dict):
+        if len(self._buffer) == self._buffer.maxlen:
+            self._stats["dropped"] += 1
+        self._buffer.append(span)
+
+    def _drain(self):
+        while self._buffer:
+            batch = []
+            while self._buffer and len(batch) < self.batch_size:
+                batch.append(self._buffer.popleft())
+            try:
+                self.sink(batch)
+                self._stats["exported"] += len(batch)
+            except Exception as e:
+                self._stats["sink_errors"] += 1
+                print(f"⚠️ Telemetry Export Warning: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._drain()
+        self._drain()
+
+    def stats(self) -> dict:
+        return {**self._stats, "buffered": len(self._buffer)}
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+def jsonl_sink(path: str) -> Callable[[List[dict]], None]:
+    """Appends each batch of spans to a JSON Lines file."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def write(batch: List[dict]):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(span) + "\n" for span in batch))
+    return write
+
+class SlowRequestProfiler:
+    """
+    Sampling profiler for slow requests. A daemon thread records the stack of
+    every thread each 'interval' seconds into a ring buffer covering the last
+    'window' seconds. When a profiled span runs longer than 'threshold', the
+    samples taken during it are written to 'out_dir' in folded-stack format
+    (one 'thread;frame;frame count' line per stack; feed it to flamegraph.pl
+    or speedscope). Dumps are written by the sampler thread, not the request.
+    """
+    def __init__(self, threshold: float, out_dir: str, interval: float = 0.01,
+                 window: float = 120.0, max_dumps: int = 100):
+        self.threshold = threshold
+        self.out_dir = out_dir
+        self.interval = interval
+        self.max_dumps = max_dumps
+        os.makedirs(out_dir, exist_ok=True)
+        self._samples = deque(maxlen=int(window / interval) * 8)  # ~'window' seconds of 8 threads
+        self._dumps: "queue.Queue" = queue.Queue()
+        self._stop = threading.Event()
+        self.dumped = 0
+        self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _folded(frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def _sample(self):
+        now = time.perf_counter()
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident != me:
+                self._samples.append((now, names.get(ident, str(ident)), self._folded(frame)))
+
+    def _write_dump(self, name: str, start: float, end: float):
+        counts: Dict[str, int] = {}
+        for t, thread_name, stack in list(self._samples):
+            if start <= t <= end:
+                key = f"{thread_name};{stack}"
+                counts[key] = counts.get(key, 0) + 1
+        path = os.path.join(self.out_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{end - start:.2f}s.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {n}\n" for stack, n in sorted(counts.items()))
+        print(f"🐢 Slow '{name}' ({end - start:.2f}s): profile saved to {path}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+            while not self._dumps.empty():
+                try:
+                    self._write_dump(*self._dumps.get_nowait())
+                except Exception as e:
+                    print(f"⚠️ Profiler Warning: {e}")
+
+    def finished(self, name: str, start: float, end: float):
+        """Called when a profiled span ends; schedules a dump if it was slow."""
+        if end - start >= self.threshold and self.dumped < self.max_dumps:
+            self.dumped += 1
+            self._dumps.put((name, start, end))
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+def _metric_name(*parts: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", "_".join(p for p in parts if p))
+
+class Telemetry:
+    """
+    In-process latency histograms for the hot-path stages (upload, conversion,
+    extraction, vision, embedding, vector search, rerank, prompt assembly,
+    time-to-first-token, generation), rendered in the Prometheus text format
+    by /metrics together with gauges from registered collectors (cache hit
+    rates, queue depths).
+
+    Recording a span costs a lock and a few additions; span export (optional)
+    and slow-request profiling (optional) run on background threads.
+    Each server process keeps its own numbers (with serve.py: one set per worker).
+    """
+    def __init__(self, enabled: bool = True, buckets=DEFAULT_BUCKETS, prefix: str = "insightdoc"):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.prefix = prefix
+        self.exporter: Optional[SpanExporter] = None
+        self.profiler: Optional[SlowRequestProfiler] = None
+        self._histograms: Dict[str, Histogram] = {}
+        self._collectors: Dict[str, Callable[[], dict]] = {}
+        self._lock = threading.Lock()
+
+    def start(self, export_path: Optional[str] = None, export_interval: float = 2.0,
+              profile_threshold: float = 0.0, profile_dir: str = "./data/profiles",
+              profile_interval: float = 0.01):
+        """Starts the background exporter / profiler (per process: call after fork)."""
+        if not self.enabled:
+            return
+        if export_path and self.exporter is None:
+            self.exporter = SpanExporter(jsonl_sink(export_path), interval=export_interval)
+        if profile_threshold > 0 and self.profiler is None:
+            self.profiler = SlowRequestProfiler(profile_threshold, profile_dir, interval=profile_interval)
+            print(f"🐢 Profiling requests slower than {profile_threshold:.2f}s into '{profile_dir}'.")
+
+    def shutdown(self):
+        if self.exporter:
+            self.exporter.close()
+        if self.profiler:
+            self.profiler.close()
+
+    def observe(self, stage: str, seconds: float, **attrs):
+        """Records one finished span."""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+        if self.exporter:
+            self.exporter.record({"stage": stage, "seconds": round(seconds, 6), "ts": time.time(), **attrs})
+
+    @contextmanager
+    def span(self, stage: str, profile: bool = False, **attrs):
+        """
+        Times the block as 'stage' (also when it raises).
+        profile=True: hand the span to the slow-request profiler, if enabled.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.observe(stage, end - start, **attrs)
+            if profile and self.profiler:
+                self.profiler.finished(stage, start, end)
+
+    def add_collector(self, name: str, collect: Callable[[], dict]):
+        """Registers a function whose (nested) numeric dict is exported as gauges named <prefix>_<name>_<key>."""
+        self._collectors[name] = collect
+
+    def summary(self) -> dict:
+        """Per-stage count, mean and approximate p50/p95 (seconds), for /stats."""
+        with self._lock:
+            return {
+                stage: {"count": h.count, "mean": round(h.sum / h.count, 6) if h.count else None,
+                        "p50": h.quantile(0.5), "p95": h.quantile(0.95)}
+                for stage, h in sorted(self._histograms.items())
+            }
+
+    def _gauges(self, name: str, values, out: List[str]):
+        if isinstance(values, dict):
+            for key, value in values.items():
+                self._gauges(_metric_name(name, str(key)), value, out)
+        elif isinstance(values, (bool, int, float)):
+            out.append(f"{name} {float(values)}")
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        metric = f"{self.prefix}_stage_seconds"
+        lines = [f"# HELP {metric} Latency of hot-path stages.", f"# TYPE {metric} histogram"]
+        with self._lock:
+            for stage, h in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, n in zip(h.buckets, h.counts):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {h.sum:.6f}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {h.count}')
+
+        for name, collect in list(self._collectors.items()):
+            try:
+                values = collect()
+            except Exception as e:
+                lines.append(f"# collector '{name}' failed: {e}")
+                continue
+            gauges: List[str] = []
+            self._gauges(_metric_name(self.prefix, name), values, gauges)
+            for line in gauges:
+                lines.append(f"# TYPE {line.split(' ', 1)[0]} gauge")
+                lines.append(line)
+
+        if self.exporter:
+            for key, value in self.exporter.stats().items():
+                lines.append(f"# TYPE {self.prefix}_telemetry_{key} gauge")
+                lines.append(f"{self.prefix}_telemetry_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+# Process-wide registry: every module records its spans here
+telemetry = Telemetry(enabled=config.TELEMETRY_ENABLED)
@@ -0,0 +1,113 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+from typing import Callable, Optional
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+def is_document_id(value: str) -> bool:
+    """Stored documents are addressed by the SHA-256 of their content."""
+    return bool(_HASH_RE.match(value))
+
+class ThumbnailStore:
+    """
+    Low-resolution page previews, rendered with PyMuPDF:
+      <root>/<sha256>/<page>.jpg   (1-based page numbers, like the [Page X] citations)
+    Documents are rendered once, at ingestion, into a temporary directory that
+    is moved in whole, so a half-rendered set is never served. The live
+    directory is never deleted: if it already exists (pages rendered on
+    demand), each page is replaced atomically instead. Documents stored
+    before thumbnails existed get single pages rendered on first request.
+    """
+    def __init__(self, root: str, width: int = 200, quality: int = 70):
+        self.root = root
+        self.width = width
+        self.quality = quality
+        self._lock = threading.Lock()
+        self._stats = {"documents_rendered": 0, "pages_rendered": 0, "rendered_on_demand": 0}
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, file_hash: str) -> str:
+        return os.path.join(self.root, file_hash)
+
+    def path(self, file_hash: str, page: int) -> Optional[str]:
+        path = os.path.join(self._dir(file_hash), f"{page}.jpg")
+        return path if os.path.exists(path) else None
+
+    def has(self, file_hash: str) -> bool:
+        return os.path.isdir(self._dir(file_hash))
+
+    def _render_page(self, page) -> bytes:
+        import fitz  # PyMuPDF
+        scale = self.width / page.rect.width if page.rect.width else 1.0
+        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        return pix.tobytes("jpg", jpg_quality=self.quality)
+
+    def render(self, pdf_path: str, file_hash: str,
+               progress: Optional[Callable[[int, int], None]] = None) -> int:
+        """Renders every page of a stored PDF. Returns the number of pages."""
+        import fitz  # PyMuPDF
+        tmp_dir = tempfile.mkdtemp(dir=self.root, prefix=".render-")
+        try:
+            with fitz.open(pdf_path) as doc:
+                total = len(doc)
+                for i, page in enumerate(doc):
+                    with open(os.path.join(tmp_dir, f"{i + 1}.jpg"), "wb") as f:
+                        f.write(self._render_page(page))
+                    if progress and (i + 1) % 25 == 0:
+                        progress(i + 1, total)
+            self._publish(tmp_dir, self._dir(file_hash))
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        with self._lock:
+            self._stats["documents_rendered"] += 1
+            self._stats["pages_rendered"] += total
+        print(f"🖼️  Rendered {total} page thumbnail(s) for {file_hash[:12]}.")
+        return total
+
+    @staticmethod
+    def _publish(tmp_dir: str, live_dir: str):
+        try:
+            os.rename(tmp_dir, live_dir)  # Atomic; fails if the directory exists
+            return
+        except OSError:
+            if not os.path.isdir(live_dir):
+                raise
+        # Pages are the same for the same content hash: replacing them one by one
+        # never serves a wrong or partial image, and concurrent render_page() calls are safe
+        for name in os.listdir(tmp_dir):
+            os.replace(os.path.join(tmp_dir, name), os.path.join(live_dir, name))
+        os.rmdir(tmp_dir)
+
+    def render_page(self, pdf_path: str, file_hash: str, page: int) -> Optional[str]:
+        """Renders one missing thumbnail (documents stored before thumbnails existed). None if no such page."""
+        import fitz  # PyMuPDF
+        with fitz.open(pdf_path) as doc:
+            if not 1 <= page <= len(doc):
+                return None
+            data = self._render_page(doc[page - 1])
+        os.makedirs(self._dir(file_hash), exist_ok=True)
+        path = os.path.join(self._dir(file_hash), f"{page}.jpg")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._stats["rendered_on_demand"] += 1
+        return path
+
+    def prune(self, keep: Callable[[str], bool]) -> int:
+        """Deletes the thumbnails of documents for which keep(file_hash) is False. Returns how many."""
+        removed = 0
+        for name in os.listdir(self.root):
+            if is_document_id(name) and not keep(name):
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+                removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,218 @@
+import os
+import time
+import hashlib
+import tempfile
+from typing import Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size limit."""
+
+class UploadSizeLimit:
+    """
+    ASGI middleware that caps request bodies on 'paths' before anything parses them.
+    A Content-Length over max_bytes gets a 413 without reading the body; otherwise
+    the body is counted as it arrives and the request is cut off (413) as soon as
+    it passes max_bytes, so an oversized multipart upload is never spooled in full.
+    """
+    def __init__(self, app, max_bytes: int, paths=("/upload",)):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = set(paths)
+
+    async def _reject(self, send):
+        body = b'{"detail":"File exceeds the upload limit of %d MB."}' % (self.max_bytes // (1024 * 1024))
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"connection", b"close"),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        too_large = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    too_large = True
+                    raise UploadTooLarge("Request body exceeds the upload limit.")
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if not too_large:  # The app's error response (e.g. a body parsing 400) is replaced by the 413
+                started = started or message["type"] == "http.response.start"
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not too_large:
+                raise
+        if too_large and not started:
+            await self._reject(send)
+
+class StoredUpload:
+    def __init__(self, file_hash: str, path: str, size: int, existed: bool):
+        self.file_hash = file_hash
+        self.path = path
+        self.size = size
+        self.existed = existed  # Same bytes were already in the store
+
+class UploadStore:
+    """
+    Content-addressed storage for uploads:
+      <root>/incoming/   partial uploads while they stream in
+      <root>/files/      <sha256>.pdf / <sha256>.docx, one copy per distinct content
+    Uploads are hashed while they stream, so a duplicate is known before any
+    conversion or ingestion work starts. Disk usage is bounded by a retention
+    age and a total size cap (oldest files go first).
+    """
+    def __init__(self, root: str, max_upload_bytes: int, retention_seconds: float,
+                 max_total_bytes: int, chunk_size: int = 1024 * 1024, min_age_seconds: float = 3600):
+        self.root = root
+        self.incoming_dir = os.path.join(root, "incoming")
+        self.files_dir = os.path.join(root, "files")
+        self.max_upload_bytes = max_upload_bytes
+        self.retention_seconds = retention_seconds
+        self.max_total_bytes = max_total_bytes
+        self.chunk_size = chunk_size
+        # Files younger than this are never evicted (they may still be queued for ingestion)
+        self.min_age_seconds = min_age_seconds
+        os.makedirs(self.incoming_dir, exist_ok=True)
+        os.makedirs(self.files_dir, exist_ok=True)
+
+    def path_for(self, file_hash: str, ext: str) -> str:
+        return os.path.join(self.files_dir, f"{file_hash}{ext}")
+
+    def pdf_path(self, file_hash: str) -> Optional[str]:
+        path = self.path_for(file_hash, ".pdf")
+        return path if os.path.exists(path) else None
+
+    @staticmethod
+    def hash_of(path: str) -> str:
+        """The content hash of a stored file (its name)."""
+        return os.path.splitext(os.path.basename(path))[0]
+
+    async def save(self, upload, ext: str) -> StoredUpload:
+        """
+        Streams an UploadFile into the store in fixed-size chunks, hashing as it goes.
+        Raises UploadTooLarge (and keeps nothing) past max_upload_bytes.
+        """
+        h = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.incoming_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = await upload.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_upload_bytes:
+                        raise UploadTooLarge(
+                            f"File exceeds the upload limit of {self.max_upload_bytes // (1024 * 1024)} MB."
+                        )
+                    h.update(chunk)
+                    await run_in_threadpool(f.write, chunk)
+
+            return self._commit(tmp_path, h.hexdigest(), ext, size)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def store_file(self, source_path: str, ext: Optional[str] = None) -> StoredUpload:
+        """Copies a local file into the store (hashing as it goes), like save() does for uploads."""
+        ext = ext or os.path.splitext(source_path)[1].lower()
+        h = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.incoming_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out, open(source_path, "rb") as f:
+                for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                    size += len(chunk)
+                    h.update(chunk)
+                    out.write(chunk)
+            return self._commit(tmp_path, h.hexdigest(), ext, size)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _commit(self, tmp_path: str, file_hash: str, ext: str, size: int) -> StoredUpload:
+        path = self.path_for(file_hash, ext)
+        existed = os.path.exists(path)
+        if existed:
+            os.remove(tmp_path)
+            os.utime(path)  # Recently used: restart its retention clock
+        else:
+            os.replace(tmp_path, path)
+        return StoredUpload(file_hash, path, size, existed)
+
+    def enforce_retention(self, in_use: Optional[Callable[[str], bool]] = None) -> int:
+        """
+        Deletes expired files, then the oldest ones while over the size cap. Returns files removed.
+        Files for which in_use(file_hash) is True (indexed documents, which citations
+        point to) are never deleted.
+        """
+        now = time.time()
+        removed = 0
+        kept_in_use = 0
+
+        # Partial uploads left behind by a crash
+        for name in os.listdir(self.incoming_dir):
+            path = os.path.join(self.incoming_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.min_age_seconds:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+        entries = []
+        for entry in os.scandir(self.files_dir):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            age = now - mtime
+            if age < self.min_age_seconds:
+                break  # Sorted by age: everything after this is younger
+            if age > self.retention_seconds or total > self.max_total_bytes:
+                if in_use and in_use(self.hash_of(path)):
+                    kept_in_use += 1
+                    continue
+                try:
+                    os.remove(path)
+                    removed += 1
+                    total -= size
+                except FileNotFoundError:
+                    pass
+        if removed:
+            print(f"🧹 Upload store: removed {removed} file(s) past retention/size limits.")
+        if total > self.max_total_bytes and kept_in_use:
+            print(f"⚠️ Upload store is over its size cap, but {kept_in_use} file(s) are still indexed. "
+                  f"Remove documents (DELETE /documents/{{name}}) or raise UPLOAD_STORE_MAX_GB.")
+        return removed
+
+    def stats(self) -> dict:
+        sizes = [e.stat().st_size for e in os.scandir(self.files_dir)]
+        return {"files": len(sizes), "bytes": sum(sizes), "max_total_bytes": self.max_total_bytes}
@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import shutil
+import threading
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+CURRENT_FILE = "CURRENT"
+QUANTIZATIONS = ("f16", "int8")
+
+class SnapshotWriter:
+    """
+    Writes an immutable vector snapshot into a fresh directory:
+      meta.json     version, count, dim, quantization, model name
+      vectors.f16   (count x dim, float16)            -- quantization "f16"
+      vectors.i8    (count x dim, int8) + scales.f32  -- quantization "int8" (per-row scale)
+      records.bin   one JSON record per row: {"id", "text", "metadata"}
+      offsets.i64   (count + 1) byte offsets into records.bin
+    Vectors are L2-normalized, so search is a plain dot product.
+    publish() renames the directory into place and then swaps the CURRENT
+    pointer atomically; readers never see a half-written snapshot.
+    """
+    def __init__(self, root: str, quantization: str = "f16", model_name: str = ""):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown snapshot quantization '{quantization}' (expected one of {QUANTIZATIONS})")
+        self.root = root
+        self.quantization = quantization
+        self.model_name = model_name
+        self.count = 0
+        self.dim: Optional[int] = None
+        os.makedirs(root, exist_ok=True)
+        self.tmp_dir = os.path.join(root, f".tmp-{os.getpid()}-{time.time_ns()}")
+        os.makedirs(self.tmp_dir)
+        vector_file = "vectors.f16" if quantization == "f16" else "vectors.i8"
+        self._vectors = open(os.path.join(self.tmp_dir, vector_file), "wb")
+        self._scales = open(os.path.join(self.tmp_dir, "scales.f32"), "wb") if quantization == "int8" else None
+        self._records = open(os.path.join(self.tmp_dir, "records.bin"), "wb")
+        self._offsets = [0]
+
+    def add(self, ids: Sequence[str], vectors, texts: Sequence[str], metadatas: Sequence[Optional[dict]]):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.size == 0:
+            return
+        if self.dim is None:
+            self.dim = int(matrix.shape[1])
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.maximum(norms, 1e-12)
+
+        if self.quantization == "f16":
+            self._vectors.write(matrix.astype(np.float16).tobytes())
+        else:
+            scales = np.maximum(np.abs(matrix).max(axis=1), 1e-12) / 127.0
+            quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+            self._vectors.write(quantized.tobytes())
+            self._scales.write(scales.astype(np.float32).tobytes())
+
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            record = json.dumps({"id": doc_id, "text": text, "metadata": metadata or {}}).encode("utf-8")
+            self._records.write(record)
+            self._offsets.append(self._offsets[-1] + len(record))
+        self.count += len(matrix)
+
+    def publish(self, version: int, keep: int = 2) -> str:
+        """Finalizes the snapshot, makes it CURRENT and prunes old ones. Returns its directory."""
+        for f in (self._vectors, self._scales, self._records):
+            if f:
+                f.close()
+        np.asarray(self._offsets, dtype=np.int64).tofile(os.path.join(self.tmp_dir, "offsets.i64"))
+        with open(os.path.join(self.tmp_dir, "meta.json"), "w") as f:
+            json.dump({"version": version, "count": self.count, "dim": self.dim or 0,
+                       "quantization": self.quantization, "model_name": self.model_name,
+                       "created_at": time.time()}, f)
+
+        name = f"v{version:08d}-{time.time_ns()}"
+        os.rename(self.tmp_dir, os.path.join(self.root, name))
+        pointer_tmp = os.path.join(self.root, f"{CURRENT_FILE}.tmp")
+        with open(pointer_tmp, "w") as f:
+            f.write(name)
+        os.replace(pointer_tmp, os.path.join(self.root, CURRENT_FILE))
+
+        # Old snapshots can go: workers still mapping them keep their (unlinked) pages
+        snapshots = sorted(d for d in os.listdir(self.root) if d.startswith("v"))
+        for old in snapshots[:-keep]:
+            shutil.rmtree(os.path.join(self.root, old), ignore_errors=True)
+        print(f"📸 Published vector snapshot {name} ({self.count} vectors, {self.quantization}).")
+        return os.path.join(self.root, name)
+
+    def abort(self):
+        for f in (self._vectors, self._scales, self._records):
+            if f:
+                f.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+def export_chroma(vector_db, root: str, version: int, quantization: str = "f16",
+                  model_name: str = "", page_size: int = 5000) -> str:
+    """Copies a Chroma collection (ids, embeddings, texts, metadata) into a new snapshot."""
+    writer = SnapshotWriter(root, quantization=quantization, model_name=model_name)
+    try:
+        offset = 0
+        while True:
+            page = vector_db.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            writer.add(page["ids"], page["embeddings"], page["documents"], page["metadatas"])
+            offset += len(page["ids"])
+        return writer.publish(version)
+    except Exception:
+        writer.abort()
+        raise
+
+class _Snapshot:
+    """One memory-mapped snapshot (read-only)."""
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        self.version = self.meta["version"]
+        self.count = self.meta["count"]
+        self.dim = self.meta["dim"]
+        self.quantization = self.meta["quantization"]
+        self.vectors = self.scales = None
+        if self.count:
+            if self.quantization == "f16":
+                self.vectors = np.memmap(os.path.join(path, "vectors.f16"), dtype=np.float16,
+                                         mode="r", shape=(self.count, self.dim))
+            else:
+                self.vectors = np.memmap(os.path.join(path, "vectors.i8"), dtype=np.int8,
+                                         mode="r", shape=(self.count, self.dim))
+                self.scales = np.memmap(os.path.join(path, "scales.f32"), dtype=np.float32,
+                                        mode="r", shape=(self.count,))
+        self.offsets = np.fromfile(os.path.join(path, "offsets.i64"), dtype=np.int64)
+        self._records = open(os.path.join(path, "records.bin"), "rb")
+
+    def scores(self, query: np.ndarray, block_rows: int) -> Iterable[Tuple[int, np.ndarray]]:
+        """
+        Yields (start_row, scores) per block; float16/int8 rows are widened block by block.
+        'query' is (dim,) or (dim, n_queries); scores are (rows,) or (rows, n_queries).
+        """
+        buffer = np.empty((min(block_rows, self.count), self.dim), dtype=np.float32)
+        for start in range(0, self.count, block_rows):
+            rows = self.vectors[start : start + block_rows]
+            block = buffer[: len(rows)]
+            np.copyto(block, rows)  # Small reused buffer: stays in cache, no per-block allocation
+            scores = block @ query
+            if self.scales is not None:
+                scale = self.scales[start : start + block_rows]
+                scores *= scale[:, None] if scores.ndim == 2 else scale
+            yield start, scores
+
+    def record(self, row: int) -> dict:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        # pread: no shared file position, so concurrent searches don't need a lock
+        return json.loads(os.pread(self._records.fileno(), end - start, start))
+
+class FlatVectorIndex:
+    """
+    Read side of the snapshot store: memory-maps the CURRENT snapshot and runs
+    exact top-k (cosine) with vectorized NumPy. Every worker process maps the
+    same files, so the OS page cache holds one copy of the vectors and opening
+    an index costs almost nothing. Picks up newly published snapshots on its
+    own (checked at most every 'reload_interval' seconds).
+    """
+    def __init__(self, root: str, block_rows: int = 4096, reload_interval: float = 0.5):
+        self.root = root
+        self.block_rows = block_rows
+        self.reload_interval = reload_interval
+        self._snapshot: Optional[_Snapshot] = None
+        self._pointer = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    @property
+    def version(self) -> Optional[int]:
+        snapshot = self._snapshot
+        return snapshot.version if snapshot else None
+
+    def __len__(self) -> int:
+        snapshot = self._snapshot
+        return snapshot.count if snapshot else 0
+
+    def reload(self) -> bool:
+        """Swaps in the CURRENT snapshot if it changed. Returns True on swap."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                with open(os.path.join(self.root, CURRENT_FILE), "r") as f:
+                    pointer = f.read().strip()
+            except FileNotFoundError:
+                return False
+            if pointer == self._pointer:
+                return False
+            try:
+                snapshot = _Snapshot(os.path.join(self.root, pointer))
+            except FileNotFoundError:
+                return False  # Pruned under us; a newer pointer is already in place
+            self._snapshot, self._pointer = snapshot, pointer
+            # The old snapshot's mappings are released once in-flight searches drop it
+            return True
+
+    def _current(self) -> Optional[_Snapshot]:
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload()
+        return self._snapshot
+
+    def search(self, vector: Sequence[float], k: int) -> List[Tuple[Document, float]]:
+        """Top-k (Document, cosine similarity), best first."""
+        return self.search_many([vector], k)[0]
+
+    def search_many(self, vectors: Sequence[Sequence[float]], k: int) -> List[List[Tuple[Document, float]]]:
+        """Top-k for several queries in one pass over the vectors (one matrix product per block)."""
+        snapshot = self._current()
+        if snapshot is None or snapshot.count == 0 or k <= 0 or not len(vectors):
+            return [[] for _ in vectors]
+        queries = np.asarray(vectors, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        # Keep the best k of each block (per query), then rank the survivors
+        best_rows, best_scores = [], []
+        for start, scores in snapshot.scores(queries.T, self.block_rows):
+            if len(scores) > k:
+                top = np.argpartition(scores, -k, axis=0)[-k:]
+            else:
+                top = np.broadcast_to(np.arange(len(scores))[:, None], scores.shape)
+            best_rows.append(top + start)
+            best_scores.append(np.take_along_axis(scores, top, axis=0))
+        rows = np.concatenate(best_rows)
+        scores = np.concatenate(best_scores)
+
+        results = []
+        for q in range(len(queries)):
+            hits = []
+            for i in np.argsort(-scores[:, q])[:k]:
+                record = snapshot.record(int(rows[i, q]))
+                doc = Document(id=record["id"], page_content=record["text"], metadata=record["metadata"])
+                hits.append((doc, float(scores[i, q])))
+            results.append(hits)
+        return results
+
+    def similarity_search_by_vector(self, embedding: Sequence[float], k: int = 4) -> List[Document]:
+        """Same call shape as the Chroma wrapper, so RAGEngine can use either."""
+        return [doc for doc, _ in self.search(embedding, k)]
@@ -0,0 +1,189 @@
+import os
+import io
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Iterable, Optional
+
+from PIL import Image
+
+from backend.pdf_extract import PageContent
+from backend.telemetry import telemetry
+
+VISION_PROMPT = "Analyze this technical diagram or image. Describe the components, connections, labels, and specific values visible. Be concise but detailed for a search engine."
+FAILED_DESCRIPTION = "Image analysis failed."
+
+# --- Vision Clients ---
+# Anything with a 'name' and a describe(pil_image) -> str method works here.
+
+class GeminiVisionClient:
+    """Sends images to Gemini to get a technical description."""
+    def __init__(self, api_key: str, model_name: str = "gemini-2.0-flash"):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def describe(self, pil_image) -> str:
+        response = self.model.generate_content([VISION_PROMPT, pil_image])
+        return response.text.strip()
+
+class StubVisionClient:
+    """
+    Offline stand-in for Gemini. Returns a deterministic description built
+    from the image itself, so the vision stage can run without network access.
+    """
+    name = "stub"
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay  # Simulated API latency (seconds)
+
+    def describe(self, pil_image) -> str:
+        if self.delay:
+            time.sleep(self.delay)
+        digest = hashlib.sha256(pil_image.tobytes()).hexdigest()[:12]
+        return f"Image {pil_image.width}x{pil_image.height} ({pil_image.mode}), fingerprint {digest}."
+
+# --- Persistent Cache ---
+
+class DescriptionCache:
+    """
+    On-disk image-hash -> description store (one small text file per image).
+    Namespaced by vision model so switching models never serves stale text.
+    """
+    def __init__(self, cache_dir: str, namespace: str):
+        self.root = os.path.join(cache_dir, namespace.replace("/", "_"))
+
+    def _path(self, image_hash: str) -> str:
+        return os.path.join(self.root, image_hash[:2], f"{image_hash}.txt")
+
+    def get(self, image_hash: str) -> Optional[str]:
+        try:
+            with open(self._path(image_hash), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, image_hash: str, description: str):
+        path = self._path(image_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(description)
+        os.replace(tmp_path, path)  # Atomic: readers never see a half-written file
+
+# --- Vision Stage ---
+
+class VisionStage:
+    """
+    Describes every image of a document with as few vision calls as possible:
+      1. Dedupe by xref, then by content hash (logos, headers, icons).
+      2. Serve known images from the persistent cache.
+      3. Skip tiny images, downscale huge ones.
+      4. Run the remaining calls concurrently (bounded) with retry/backoff.
+    """
+    def __init__(self, client, cache: Optional[DescriptionCache] = None, max_in_flight: int = 4,
+                 max_retries: int = 3, backoff_seconds: float = 1.0, min_side: int = 32, max_side: int = 1568):
+        self.client = client
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.min_side = min_side
+        self.max_side = max_side
+        # Shared by all documents, so the in-flight limit holds across concurrent jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="vision")
+        self._stats_lock = threading.Lock()
+        self._stats = {"images": 0, "deduplicated": 0, "cache_hits": 0, "skipped": 0,
+                       "api_calls": 0, "retries": 0, "failures": 0}
+
+    def _count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def describe_images(self, pages: Iterable[PageContent],
+                        known: Optional[Dict[str, Future]] = None) -> Dict[int, "Future[Optional[str]]"]:
+        """
+        Schedules descriptions for all images in 'pages'.
+        Returns xref -> Future resolving to the description, or None for skipped images.
+        'known' (image hash -> Future) carries deduplication across calls for the same document.
+        """
+        by_xref: Dict[int, Future] = {}
+        by_hash: Dict[str, Future] = known if known is not None else {}
+
+        for page in pages:
+            for xref, image_bytes in page.images:
+                self._count("images")
+                if xref in by_xref:
+                    self._count("deduplicated")
+                    continue
+
+                image_hash = hashlib.sha256(image_bytes).hexdigest()
+                if image_hash in by_hash:
+                    self._count("deduplicated")
+                    by_xref[xref] = by_hash[image_hash]
+                    continue
+
+                cached = self.cache.get(image_hash) if self.cache else None
+                if cached is not None:
+                    self._count("cache_hits")
+                    future = Future()
+                    future.set_result(cached)
+                else:
+                    future = self._executor.submit(self._describe, image_hash, image_bytes)
+
+                by_xref[xref] = by_hash[image_hash] = future
+
+        return by_xref
+
+    @staticmethod
+    def cancel(futures: Iterable[Future]):
+        """Drops calls that haven't started yet (e.g. when the ingestion job is cancelled)."""
+        for future in futures:
+            future.cancel()
+
+    def _prepare(self, image_bytes: bytes):
+        """Decodes the image; returns None for images too small to be worth describing."""
+        pil_image = Image.open(io.BytesIO(image_bytes))
+        if min(pil_image.size) < self.min_side:
+            return None
+        if max(pil_image.size) > self.max_side:
+            # Huge scans cost upload time and tokens without adding detail
+            pil_image.thumbnail((self.max_side, self.max_side))
+        return pil_image
+
+    def _describe(self, image_hash: str, image_bytes: bytes) -> Optional[str]:
+        try:
+            pil_image = self._prepare(image_bytes)
+        except Exception as e:
+            print(f"⚠️ Could not decode image {image_hash[:8]}: {e}")
+            self._count("failures")
+            return FAILED_DESCRIPTION
+        if pil_image is None:
+            self._count("skipped")
+            return None
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._count("api_calls")
+                with telemetry.span("vision_call", model=self.client.name):
+                    description = self.client.describe(pil_image)
+                if self.cache:
+                    self.cache.put(image_hash, description)
+                return description
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"⚠️ Vision API Error: {e}")
+                    self._count("failures")
+                    return FAILED_DESCRIPTION
+                self._count("retries")
+                # Exponential backoff with jitter (rate limits are the usual failure)
+                time.sleep(self.backoff_seconds * (2 ** attempt) * (0.5 + random.random()))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
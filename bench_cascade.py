@@ -0,0 +1,137 @@
+# bench_cascade.py
+# Checks cascade reranking (RERANK_MODE=cascade) against full reranking on the gold set:
+# hit rate (gold source page in the top-N), rerank latency (p50/p95), cross-encoder pairs
+# and which tier answered each question. Both modes rerank the same dense candidates.
+# Needs the gold set's document to be indexed (upload it or use bulk_ingest.py first).
+# Usage: python bench_cascade.py [--rounds 5] [--tolerance 0.0] [--out simulation/cascade_report.json]
+# Exits with status 1 if the cascade's hit rate falls below full reranking's minus the tolerance.
+# Needs the TinyBERT .onnx model in RERANKER_ONNX_TINYBERT_DIR (not shipped with the repo; exits with status 2 without it).
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.append(os.getcwd())
+os.environ.setdefault("LLM_BACKEND", "stub")  # Retrieval only: no LLM calls
+
+from backend import config
+from backend.cascade import TIERS, RerankCascade
+from backend.rerankers import create_reranker
+
+GOLD_DATA = "simulation/gold_standard.json"
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))] if values else 0.0
+
+def is_hit(ranked, page) -> bool:
+    return any(str(doc.metadata.get("page")) == str(page) for doc, _ in ranked[:config.RERANK_TOP_N])
+
+def main():
+    parser = argparse.ArgumentParser(description="Cascade vs. full reranking on the gold set")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed repetitions per question")
+    parser.add_argument("--tolerance", type=float, default=0.0, help="Allowed hit-rate drop (0-1)")
+    parser.add_argument("--out", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    from backend.rag_engine import RAGEngine
+
+    with open(GOLD_DATA, "r", encoding="utf-8") as f:
+        gold = json.load(f)
+    engine = RAGEngine()
+    if not engine.manifest.sources():
+        print("❌ The index is empty: ingest the gold set's document first.")
+        sys.exit(2)
+
+    try:
+        fast = create_reranker("onnx-tinybert", cross_encoder_model=config.RERANKER_MODEL,
+                               onnx_dirs=config.RERANKER_ONNX_DIRS, max_length=config.RERANKER_MAX_LENGTH,
+                               intra_op_threads=config.RERANKER_INTRA_OP_THREADS)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        engine.shutdown()
+        sys.exit(2)
+    precise = engine.reranker.predict  # Unbatched: times the model, not the batching window
+    cascade = RerankCascade(
+        fast.predict, precise,
+        top_n=config.RERANK_TOP_N,
+        min_candidates=config.RERANK_CASCADE_MIN_CANDIDATES,
+        dense_window=config.RERANK_CASCADE_DENSE_WINDOW,
+        skip_margin=config.RERANK_CASCADE_SKIP_MARGIN,
+        fast_margin=config.RERANK_CASCADE_FAST_MARGIN,
+        precise_max=config.RERANK_CASCADE_PRECISE_MAX,
+    )
+    print(f"⏱️  Cascade check: {len(gold)} gold questions, k={config.RETRIEVAL_K}, top-{config.RERANK_TOP_N}, "
+          f"{args.rounds} rounds | fast: {fast.name} | precise: {engine.reranker.name}\n")
+
+    full = {"hits": 0, "latencies": [], "pairs": 0}
+    cascaded = {"hits": 0, "latencies": [], "pairs": 0, "tiers": {tier: 0 for tier in TIERS}, "reranked": 0}
+    dense_hits = 0
+    cases = []
+    for item in gold:
+        question, page = item["question"], item["source_page"]
+        hits = engine.partitions.search(engine.base_embeddings.embed_query(question), config.RETRIEVAL_K)
+        docs = [doc for doc, _ in hits]
+        precise([[question, docs[0].page_content]] if docs else [])  # Warm-up
+
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            scores = precise([[question, doc.page_content] for doc in docs])
+            full["latencies"].append(time.perf_counter() - start)
+            full_ranked = sorted(zip(docs, map(float, scores)), key=lambda x: x[1], reverse=True)
+
+            cascade_ranked, trace = cascade.rank(question, hits)
+            cascaded["latencies"].append(trace["seconds"])
+
+        full["hits"] += is_hit(full_ranked, page)
+        full["pairs"] += len(docs)
+        cascaded["hits"] += is_hit(cascade_ranked, page)
+        cascaded["pairs"] += trace["precise"]
+        cascaded["reranked"] += trace["candidates"]
+        cascaded["tiers"][trace["tier"]] += 1
+        dense_hits += is_hit(hits, page)
+        cases.append({"question": question[:60], "page": page, "tier": trace["tier"],
+                      "reranked": trace["candidates"], "precise": trace["precise"],
+                      "full_hit": is_hit(full_ranked, page), "cascade_hit": is_hit(cascade_ranked, page)})
+
+    n = len(gold)
+    print(f"{'Question':<62} | {'Tier':<8} | {'Reranked':<8} | {'Precise':<7} | {'Full':<4} | {'Cascade'}")
+    print("-" * 110)
+    for c in cases:
+        print(f"{c['question']:<62} | {c['tier']:<8} | {c['reranked']:<8} | {c['precise']:<7} | "
+              f"{'✅' if c['full_hit'] else '❌':<4} | {'✅' if c['cascade_hit'] else '❌'}")
+
+    report = {
+        "questions": n,
+        "dense_hit_rate": round(dense_hits / n, 3),
+        "full": {"hit_rate": round(full["hits"] / n, 3), "p50_ms": round(percentile(full["latencies"], 0.5) * 1000, 1),
+                 "p95_ms": round(percentile(full["latencies"], 0.95) * 1000, 1), "precise_pairs": full["pairs"]},
+        "cascade": {"hit_rate": round(cascaded["hits"] / n, 3),
+                    "p50_ms": round(percentile(cascaded["latencies"], 0.5) * 1000, 1),
+                    "p95_ms": round(percentile(cascaded["latencies"], 0.95) * 1000, 1),
+                    "precise_pairs": cascaded["pairs"], "avg_reranked": round(cascaded["reranked"] / n, 1),
+                    "tiers": cascaded["tiers"]},
+    }
+    print(f"\n{'Mode':<8} | {'Hit@' + str(config.RERANK_TOP_N):<6} | {'p50 (ms)':<9} | {'p95 (ms)':<9} | {'Precise pairs'}")
+    print("-" * 60)
+    print(f"{'dense':<8} | {report['dense_hit_rate']:<6} | {'-':<9} | {'-':<9} | 0")
+    for mode in ("full", "cascade"):
+        r = report[mode]
+        print(f"{mode:<8} | {r['hit_rate']:<6} | {r['p50_ms']:<9} | {r['p95_ms']:<9} | {r['precise_pairs']}")
+    print(f"\nTiers: {report['cascade']['tiers']} | avg reranked: {report['cascade']['avg_reranked']}/{config.RETRIEVAL_K}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Report saved to {args.out}")
+
+    engine.shutdown()
+    accuracy_holds = report["cascade"]["hit_rate"] >= report["full"]["hit_rate"] - args.tolerance
+    faster = report["cascade"]["p95_ms"] < report["full"]["p95_ms"]
+    print(f"{'✅' if accuracy_holds else '❌'} Accuracy {'holds' if accuracy_holds else 'dropped'} | "
+          f"{'✅' if faster else '⚠️'} p95 rerank latency {'dropped' if faster else 'did not drop'}")
+    sys.exit(0 if accuracy_holds else 1)
+
+if __name__ == "__main__":
+    main()
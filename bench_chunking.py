@@ -0,0 +1,79 @@
+# bench_chunking.py
+# Compares whole-page passages with token-budgeted chunks:
+#   - tokens per passage (what the reranker has to read, and what gets truncated)
+#   - prompt tokens for the top-N context sent to Gemini
+#   - rerank latency for a K-candidate batch (if the configured reranker can be loaded)
+# Usage: python bench_chunking.py [path/to/manual.pdf]
+import os
+import sys
+import time
+import tempfile
+import statistics
+
+import fitz   # PyMuPDF
+
+sys.path.append(os.getcwd())
+
+from langchain_core.documents import Document
+from backend import config
+from backend.chunking import Chunker, TokenCounter
+from backend.pdf_extract import extract_page_range
+from bench_extraction import make_synthetic_pdf
+
+QUERY = "What is the minimum interrupt execution response time in clock cycles?"
+
+def load_pages(pdf_path: str):
+    with fitz.open(pdf_path) as doc:
+        total = len(doc)
+    return [Document(page_content=p.text, metadata={"source": os.path.basename(pdf_path), "page": p.page})
+            for p in extract_page_range(pdf_path, 0, total)]
+
+def rerank_ms(reranker, passages, rounds: int = 5) -> float:
+    pairs = [[QUERY, p] for p in passages]
+    reranker.predict(pairs)  # warm-up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        reranker.predict(pairs)
+    return (time.perf_counter() - start) / rounds * 1000
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        pdf_path = sys.argv[1]
+    else:
+        pdf_path = os.path.join(tempfile.gettempdir(), "bench_chunking.pdf")
+        print(f"📄 Generating synthetic PDF at {pdf_path}...")
+        make_synthetic_pdf(pdf_path, pages=50)
+
+    counter = TokenCounter(config.CHUNK_TOKENIZER_PATH)
+    chunker = Chunker(config.CHUNK_MAX_TOKENS, config.CHUNK_OVERLAP_TOKENS, counter)
+
+    pages = load_pages(pdf_path)
+    chunks = chunker.split_documents(pages)
+
+    k, top_n = config.RETRIEVAL_K, config.RERANK_TOP_N
+    page_tokens = [counter.count(d.page_content) for d in pages]
+    chunk_tokens = [counter.count(d.page_content) for d in chunks]
+    # Sample the longest passages: that's what dominates rerank time and prompt size
+    page_sample = sorted(pages, key=lambda d: len(d.page_content), reverse=True)[:k]
+    chunk_sample = sorted(chunks, key=lambda d: len(d.page_content), reverse=True)[:k]
+
+    print(f"\n📊 {len(pages)} pages -> {len(chunks)} chunks "
+          f"(budget {config.CHUNK_MAX_TOKENS} tokens, overlap {config.CHUNK_OVERLAP_TOKENS})\n")
+    print(f"{'':<28} | {'Pages':<10} | {'Chunks':<10}")
+    print("-" * 56)
+    print(f"{'Mean tokens / passage':<28} | {statistics.mean(page_tokens):<10.0f} | {statistics.mean(chunk_tokens):<10.0f}")
+    print(f"{'Max tokens / passage':<28} | {max(page_tokens):<10} | {max(chunk_tokens):<10}")
+    over = lambda ts: sum(t > config.RERANKER_MAX_LENGTH for t in ts) / len(ts) * 100
+    print(f"{'Truncated by reranker (%)':<28} | {over(page_tokens):<10.1f} | {over(chunk_tokens):<10.1f}")
+    prompt = lambda ds: sum(counter.count(d.page_content) for d in ds[:top_n])
+    print(f"{f'Prompt tokens (top {top_n})':<28} | {prompt(page_sample):<10} | {prompt(chunk_sample):<10}")
+
+    try:
+        from backend.rerankers import create_reranker
+        reranker = create_reranker(config.RERANKER_BACKEND, config.RERANKER_MODEL, config.RERANKER_ONNX_DIRS,
+                                   config.RERANKER_MAX_LENGTH, config.RERANKER_INTRA_OP_THREADS)
+        page_ms = rerank_ms(reranker, [d.page_content for d in page_sample])
+        chunk_ms = rerank_ms(reranker, [d.page_content for d in chunk_sample])
+        print(f"{f'Rerank ms ({k} candidates)':<28} | {page_ms:<10.1f} | {chunk_ms:<10.1f}")
+    except Exception as e:
+        print(f"\n⚠️ Rerank timing skipped ({config.RERANKER_BACKEND}): {e}")
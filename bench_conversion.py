@@ -0,0 +1,85 @@
+# bench_conversion.py
+# DOCX -> PDF latency per file:
+#   - spawn:  a new LibreOffice process per file (the old FileConverter behaviour)
+#   - pool:   long-lived LibreOffice workers over UNO (needs the 'uno' bindings)
+#   - cached: repeat conversion of the same bytes (conversion cache hit)
+# Usage: python bench_conversion.py [n_files]   (default: 10 generated DOCX files)
+import os
+import sys
+import time
+import zipfile
+import tempfile
+import statistics
+
+sys.path.append(os.getcwd())
+
+from backend import config
+from backend.office import ConversionService
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>"""
+RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+def make_docx(path: str, seed: int, paragraphs: int = 60):
+    """Minimal valid DOCX (no python-docx needed); 'seed' makes each file's bytes unique."""
+    body = "".join(
+        f"<w:p><w:r><w:t>Document {seed}, paragraph {i}: the interrupt execution response for all "
+        f"enabled interrupts is four clock cycles minimum.</w:t></w:r></w:p>"
+        for i in range(paragraphs)
+    )
+    document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f"<w:body>{body}</w:body></w:document>")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", CONTENT_TYPES)
+        z.writestr("_rels/.rels", RELS)
+        z.writestr("word/document.xml", document)
+
+def bench(mode: str, files, cache_dir=None) -> list:
+    service = ConversionService(binary=config.OFFICE_BINARY, workers=1, timeout=config.OFFICE_TIMEOUT_SECONDS,
+                                cache_dir=cache_dir, mode=mode)
+    latencies = []
+    try:
+        for path in files:
+            start = time.perf_counter()
+            service.convert(path)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        service.shutdown()
+    return latencies
+
+def report(name: str, latencies: list):
+    first, rest = latencies[0], latencies[1:] or latencies
+    print(f"{name:<8} | {first:<14.2f} | {statistics.median(rest):<14.3f} | {sum(latencies):.1f}")
+
+if __name__ == "__main__":
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    with tempfile.TemporaryDirectory(prefix="bench_conversion_") as workdir:
+        files = []
+        for i in range(n_files):
+            path = os.path.join(workdir, f"doc_{i}.docx")
+            make_docx(path, seed=i)
+            files.append(path)
+
+        print(f"⏱️  Converting {n_files} DOCX files with '{config.OFFICE_BINARY}'\n")
+        print(f"{'Mode':<8} | {'First file (s)':<14} | {'Median next (s)':<14} | Total (s)")
+        print("-" * 60)
+        for mode in ("spawn", "pool"):
+            try:
+                report(mode, bench(mode, files))
+            except Exception as e:
+                print(f"{mode:<8} | ❌ {type(e).__name__}: {e}")
+
+        cache_dir = os.path.join(workdir, "cache")
+        try:
+            bench("auto", files[:1], cache_dir=cache_dir)           # fill the cache
+            report("cached", bench("auto", files[:1] * n_files, cache_dir=cache_dir))
+        except Exception as e:
+            print(f"{'cached':<8} | ❌ {type(e).__name__}: {e}")
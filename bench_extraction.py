@@ -0,0 +1,57 @@
+# bench_extraction.py
+# Measures page-extraction throughput (pages/sec) for different worker counts.
+# Usage: python bench_extraction.py [path/to/manual.pdf]
+# Without a path, a synthetic text-heavy PDF is generated.
+import os
+import sys
+import time
+import tempfile
+
+import fitz   # PyMuPDF
+
+sys.path.append(os.getcwd())
+
+from backend.pdf_extract import PageExtractor
+
+def make_synthetic_pdf(path: str, pages: int = 400):
+    doc = fitz.open()
+    line = "REGISTER 0x{:02X}: bit {} controls the interrupt enable for peripheral {}. "
+    for p in range(pages):
+        page = doc.new_page()
+        text = "\n".join(line.format(p % 256, b, p) * 2 for b in range(40))
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=6)
+    doc.save(path)
+    doc.close()
+
+def bench(file_path: str, workers: int, rounds: int = 3) -> float:
+    extractor = PageExtractor(workers=workers)
+    with fitz.open(file_path) as doc:
+        total = len(doc)
+    extractor.extract(file_path, total)  # warm-up (spawns the pool)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        pages = extractor.extract(file_path, total)
+        assert [p.page for p in pages] == list(range(1, total + 1))
+    elapsed = time.perf_counter() - start
+    extractor.shutdown()
+    return total * rounds / elapsed
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        pdf_path = sys.argv[1]
+    else:
+        pdf_path = os.path.join(tempfile.gettempdir(), "bench_extraction.pdf")
+        print(f"📄 Generating synthetic PDF at {pdf_path}...")
+        make_synthetic_pdf(pdf_path)
+
+    cores = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, 8, cores} - {c for c in (2, 4, 8) if c > cores})
+
+    print(f"⏱️  Benchmarking extraction on {cores} core(s)...\n")
+    print(f"{'Workers':<10} | {'Pages/sec':<12} | {'Speedup'}")
+    print("-" * 40)
+    baseline = None
+    for w in counts:
+        rate = bench(pdf_path, w)
+        baseline = baseline or rate
+        print(f"{w:<10} | {rate:<12.1f} | {rate / baseline:.2f}x")
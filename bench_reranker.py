@@ -0,0 +1,75 @@
+# bench_reranker.py
+# Compares reranker backends: latency per 25-pair batch, cold start and memory (RSS).
+# Each backend runs in its own subprocess so memory numbers don't bleed into each other.
+# Usage: python bench_reranker.py [backend ...]   (default: all configured backends)
+import os
+import sys
+import json
+import time
+import subprocess
+
+sys.path.append(os.getcwd())
+
+from backend import config
+from backend.rerankers import available_backends
+
+QUERY = "What is the minimum interrupt execution response time in clock cycles?"
+PASSAGE = ("The interrupt execution response for all the enabled AVR interrupts is four clock cycles minimum. "
+           "After four clock cycles the program vector address for the actual interrupt handling routine is executed. "
+           "During this four clock cycle period, the Program Counter is pushed onto the Stack. ") * 8
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def run_one(backend: str, rounds: int = 30) -> dict:
+    from backend.rerankers import create_reranker
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    reranker = create_reranker(
+        backend,
+        cross_encoder_model=config.RERANKER_MODEL,
+        onnx_dirs=config.RERANKER_ONNX_DIRS,
+        max_length=config.RERANKER_MAX_LENGTH,
+        intra_op_threads=config.RERANKER_INTRA_OP_THREADS,
+    )
+    pairs = [[QUERY, f"[{i}] {PASSAGE}"] for i in range(25)]
+    reranker.predict(pairs)  # warm-up (first call allocates)
+    cold_start = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(rounds):
+        t = time.perf_counter()
+        reranker.predict(pairs)
+        latencies.append((time.perf_counter() - t) * 1000)
+    latencies.sort()
+    return {
+        "backend": backend,
+        "cold_start_s": round(cold_start, 2),
+        "p50_ms": round(latencies[len(latencies) // 2], 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 1),
+        "rss_mb": round(rss_mb(), 1),
+        "rss_delta_mb": round(rss_mb() - rss_before, 1),
+    }
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        print(json.dumps(run_one(sys.argv[2])))
+        sys.exit(0)
+
+    backends = sys.argv[1:] or available_backends(config.RERANKER_ONNX_DIRS)
+    print(f"⏱️  Reranker benchmark (25 pairs/batch, intra-op threads={config.RERANKER_INTRA_OP_THREADS or 'auto'})\n")
+    print(f"{'Backend':<16} | {'Cold start':<10} | {'p50 (ms)':<9} | {'p95 (ms)':<9} | {'RSS (MB)':<9} | {'Model RSS (MB)'}")
+    print("-" * 80)
+    for backend in backends:
+        proc = subprocess.run([sys.executable, __file__, "--child", backend], capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{backend:<16} | ❌ {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{r['backend']:<16} | {r['cold_start_s']:<10} | {r['p50_ms']:<9} | {r['p95_ms']:<9} | "
+              f"{r['rss_mb']:<9} | {r['rss_delta_mb']}")
@@ -0,0 +1,97 @@
+# bench_startup.py
+# Startup regression report:
+#   - slowest imports when loading main.py (python -X importtime)
+#   - seconds until uvicorn answers /healthz (bound) and /ready (models warm)
+#   - the per-stage breakdown reported by /ready
+# Usage: python bench_startup.py [--save baseline.json] [--compare baseline.json]
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+import httpx
+
+PORT = 8765
+TOP_IMPORTS = 15
+
+def import_times(module: str = "main") -> list:
+    """(cumulative seconds, module) for the slowest imports, from -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=os.getcwd())
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        rows.append((int(cumulative_us) / 1e6, name[1:].rstrip()))
+    if result.returncode != 0:
+        print(f"⚠️ 'import {module}' failed:\n{result.stderr.splitlines()[-1] if result.stderr else ''}")
+    # Top-level entries only (no leading spaces) give the real cost of each dependency
+    top_level = [(s, n) for s, n in rows if not n.startswith(" ")]
+    return sorted(top_level, reverse=True)[:TOP_IMPORTS]
+
+def server_startup(timeout: float = 300.0) -> dict:
+    """Starts uvicorn and times /healthz and /ready."""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{PORT}"
+    results = {"healthz_seconds": None, "ready_seconds": None, "report": None}
+    try:
+        while time.perf_counter() - start < timeout and proc.poll() is None:
+            try:
+                if results["healthz_seconds"] is None:
+                    if httpx.get(f"{url}/healthz", timeout=1).status_code == 200:
+                        results["healthz_seconds"] = round(time.perf_counter() - start, 3)
+                response = httpx.get(f"{url}/ready", timeout=1)
+                report = response.json()
+                if response.status_code == 200 or report.get("status") == "failed":
+                    results["ready_seconds"] = round(time.perf_counter() - start, 3) if response.status_code == 200 else None
+                    results["report"] = report
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Compare against a previously saved JSON file")
+    args = parser.parse_args()
+
+    print("⏱️ Measuring import times...")
+    imports = import_times()
+    print(f"\n{'Cumulative (s)':<16} | Module")
+    print("-" * 50)
+    for seconds, name in imports:
+        print(f"{seconds:<16.3f} | {name}")
+
+    print("\n⏱️ Starting server...")
+    startup = server_startup()
+    print(f"\n{'Bound (/healthz)':<20}: {startup['healthz_seconds']}s")
+    print(f"{'Ready (/ready)':<20}: {startup['ready_seconds']}s")
+    if startup["report"]:
+        for name, seconds in startup["report"].get("stages", {}).items():
+            print(f"   - {name:<32} {seconds:>7.3f}s")
+        if startup["report"].get("error"):
+            print(f"🔴 Startup error: {startup['report']['error']}")
+
+    results = {"imports": imports, **startup}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\n📊 Compared to {args.compare}:")
+        for key in ("healthz_seconds", "ready_seconds"):
+            old, new = baseline.get(key), results.get(key)
+            if old and new:
+                print(f"   {key:<18} {old:>8.3f}s -> {new:>8.3f}s ({(new - old) / old * 100:+.1f}%)")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Saved to {args.save}")
@@ -0,0 +1,126 @@
+# bench_vector_store.py
+# Compares the memory-mapped snapshot index (f16 / int8) with Chroma:
+#   - open time (what a freshly forked/restarted worker pays)
+#   - top-k search latency (p50 / p95)
+#   - RSS added by opening + searching
+#   - recall@k against exact float32 search
+# Synthetic clustered 384-d vectors (all-MiniLM-L6-v2 size). Each backend runs in its own
+# subprocess so memory numbers don't bleed into each other. Chroma is skipped if not installed.
+# Usage: python bench_vector_store.py [size ...]   (default: 10000 100000 1000000)
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from backend.vector_snapshot import SnapshotWriter, FlatVectorIndex
+
+DIM = 384
+K = 25
+N_QUERIES = 50
+BUILD_BATCH = 20_000
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def make_vectors(n: int, seed: int = 0) -> np.ndarray:
+    """Clustered vectors (closer to real embeddings than uniform noise)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((256, DIM)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.6 * rng.standard_normal((n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def build(size: int, workdir: str):
+    vectors = make_vectors(size)
+    queries = make_vectors(N_QUERIES, seed=1)
+    np.save(os.path.join(workdir, "queries.npy"), queries)
+
+    # Ground truth: exact float32 top-k
+    truth = np.stack([np.argsort(-(vectors @ q))[:K] for q in queries])
+    np.save(os.path.join(workdir, "truth.npy"), truth)
+
+    for quantization in ("f16", "int8"):
+        writer = SnapshotWriter(os.path.join(workdir, quantization), quantization=quantization)
+        for start in range(0, size, BUILD_BATCH):
+            batch = vectors[start : start + BUILD_BATCH]
+            ids = [str(i) for i in range(start, start + len(batch))]
+            writer.add(ids, batch, [f"chunk {i}" for i in ids], [{"source": "bench.pdf"}] * len(batch))
+        writer.publish(version=1)
+
+    try:
+        import chromadb
+    except ImportError:
+        return
+    client = chromadb.PersistentClient(path=os.path.join(workdir, "chroma"))
+    collection = client.create_collection("bench")
+    for start in range(0, size, 5000):
+        batch = vectors[start : start + 5000]
+        ids = [str(i) for i in range(start, start + len(batch))]
+        collection.add(ids=ids, embeddings=batch.tolist(), documents=[f"chunk {i}" for i in ids],
+                       metadatas=[{"source": "bench.pdf"}] * len(batch))
+
+def run_one(backend: str, workdir: str) -> dict:
+    queries = np.load(os.path.join(workdir, "queries.npy"))
+    truth = np.load(os.path.join(workdir, "truth.npy"))
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    if backend == "chroma":
+        import chromadb
+        collection = chromadb.PersistentClient(path=os.path.join(workdir, "chroma")).get_collection("bench")
+        search = lambda q: [int(i) for i in collection.query(query_embeddings=[q.tolist()], n_results=K)["ids"][0]]
+    else:
+        index = FlatVectorIndex(os.path.join(workdir, backend))
+        search = lambda q: [int(doc.id) for doc, _ in index.search(q, K)]
+    open_ms = (time.perf_counter() - start) * 1000
+
+    latencies, hits = [], 0
+    for q, expected in zip(queries, truth):
+        t = time.perf_counter()
+        found = search(q)
+        latencies.append((time.perf_counter() - t) * 1000)
+        hits += len(set(found) & set(expected.tolist()))
+    latencies.sort()
+    return {
+        "backend": backend,
+        "open_ms": round(open_ms, 1),
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        "rss_delta_mb": round(rss_mb() - rss_before, 1),
+        "recall": round(hits / truth.size, 4),
+    }
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3 and sys.argv[1] == "--child":
+        print(json.dumps(run_one(sys.argv[2], sys.argv[3])))
+        sys.exit(0)
+
+    sizes = [int(s) for s in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix="bench_vectors_") as workdir:
+            print(f"\n📦 Building {size:,} vectors...")
+            build(size, workdir)
+            print(f"⏱️  top-{K} search, {N_QUERIES} queries\n")
+            print(f"{'Backend':<8} | {'Open (ms)':<10} | {'p50 (ms)':<9} | {'p95 (ms)':<9} | {'RSS (MB)':<9} | {'Recall@' + str(K)}")
+            print("-" * 70)
+            backends = ["f16", "int8"] + (["chroma"] if os.path.isdir(os.path.join(workdir, "chroma")) else [])
+            for backend in backends:
+                proc = subprocess.run([sys.executable, __file__, "--child", backend, workdir],
+                                      capture_output=True, text=True)
+                if proc.returncode != 0:
+                    print(f"{backend:<8} | ❌ {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'}")
+                    continue
+                r = json.loads(proc.stdout.strip().splitlines()[-1])
+                print(f"{r['backend']:<8} | {r['open_ms']:<10} | {r['p50_ms']:<9} | {r['p95_ms']:<9} | "
+                      f"{r['rss_delta_mb']:<9} | {r['recall']}")
+            if "chroma" not in backends:
+                print("⚠️ chromadb not installed: Chroma skipped.")
@@ -0,0 +1,105 @@
+# bulk_ingest.py
+# Indexes every PDF in a directory (recursively), without going through /upload.
+# Each file is copied into the upload store first, like /upload does, so bulk-loaded
+# documents can be opened (/files, /documents/{id}/pdf) from their citations, and
+# their page thumbnails are rendered (THUMBNAILS_ENABLED) as they are for /upload.
+# Meant for backfills: files already indexed byte-for-byte are skipped, so an
+# interrupted run can simply be restarted.
+# Usage: python bulk_ingest.py <directory> [--extract-workers N] [--batch-size N]
+# Note: stop the server first (or point it at a separate CHROMA_DIR); Chroma
+# does not support two processes writing to the same directory.
+import os
+import sys
+import time
+import argparse
+
+from dotenv import load_dotenv
+
+sys.path.append(os.getcwd())
+
+def find_pdfs(directory: str):
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith(".pdf"):
+                yield os.path.join(root, name)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-index a directory of PDFs.")
+    parser.add_argument("directory")
+    parser.add_argument("--extract-workers", type=int, default=None,
+                        help="Page extraction processes (0 = one per core). Default: EXTRACT_WORKERS")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Chunks embedded per batch. Default: INGEST_BATCH_SIZE")
+    args = parser.parse_args()
+
+    load_dotenv()
+    from backend import config
+    if args.batch_size:
+        config.INGEST_BATCH_SIZE = args.batch_size
+
+    from backend.file_processor import MultimodalIngestor
+    from backend.rag_engine import RAGEngine
+    from backend.thumbnails import ThumbnailStore
+    from backend.upload_store import UploadStore
+
+    paths = list(find_pdfs(args.directory))
+    print(f"📚 Found {len(paths)} PDF(s) in {args.directory}")
+    ingestor = MultimodalIngestor(api_key=os.getenv("GOOGLE_API_KEY"), extract_workers=args.extract_workers)
+    rag_engine = RAGEngine()
+    upload_store = UploadStore(
+        root=config.UPLOAD_DIR,
+        max_upload_bytes=config.UPLOAD_MAX_MB * 1024 * 1024,
+        retention_seconds=config.UPLOAD_RETENTION_DAYS * 86400,
+        max_total_bytes=int(config.UPLOAD_STORE_MAX_GB * 1024 ** 3),
+        chunk_size=config.UPLOAD_CHUNK_KB * 1024,
+    )
+    thumbnail_store = None
+    if config.THUMBNAILS_ENABLED:
+        thumbnail_store = ThumbnailStore(config.THUMBNAIL_DIR, width=config.THUMBNAIL_WIDTH,
+                                         quality=config.THUMBNAIL_QUALITY)
+
+    def render_thumbnails(stored_path: str, file_hash: str):
+        if thumbnail_store and not thumbnail_store.has(file_hash):
+            try:
+                thumbnail_store.render(stored_path, file_hash)
+            except Exception as e:
+                print(f"⚠️ Thumbnail Warning: {e}")  # Previews are optional: rendered on demand instead
+
+    start = time.perf_counter()
+    totals = {"files": 0, "skipped": 0, "failed": 0, "pages": 0, "vectors": 0}
+    for n, path in enumerate(paths, 1):
+        source = os.path.splitext(os.path.basename(path))[0] + ".pdf"  # Same naming as /upload
+        print(f"\n[{n}/{len(paths)}] {path}")
+        try:
+            # Stored (or refreshed) even when unchanged, so earlier bulk loads become servable
+            stored = upload_store.store_file(path, ".pdf")
+            file_hash = stored.file_hash
+            if rag_engine.is_indexed(source, file_hash):
+                print(f"♻️  '{source}' is unchanged since the last ingest. Skipping.")
+                render_thumbnails(stored.path, file_hash)  # Earlier bulk loads had none
+                totals["skipped"] += 1
+                continue
+            docs = ingestor.process_pdf(stored.path, source=source)
+            stats = rag_engine.ingest_document(docs, file_hash=file_hash, publish=False)
+            render_thumbnails(stored.path, file_hash)
+            totals["files"] += 1
+            totals["pages"] += stats["pages"]
+            totals["vectors"] += stats["vectors"]
+        except KeyboardInterrupt:
+            print("\n🛑 Interrupted. Already indexed files are kept; rerun to continue.")
+            break
+        except Exception as e:
+            print(f"❌ Failed: {e}")
+            totals["failed"] += 1
+
+    if rag_engine.partitions.backend == "snapshot" and totals["files"]:
+        rag_engine.publish_snapshot()  # Every document whose snapshot is now stale
+    rag_engine.shutdown()
+    ingestor.vision.shutdown()
+    ingestor.extractor.shutdown()
+
+    seconds = time.perf_counter() - start
+    print(f"\n✅ Bulk ingest finished in {seconds:.1f}s")
+    print(f"   Files indexed: {totals['files']} | skipped (unchanged): {totals['skipped']} | failed: {totals['failed']}")
+    print(f"   Pages: {totals['pages']} ({totals['pages'] / seconds:.1f}/s) | "
+          f"Vectors: {totals['vectors']} ({totals['vectors'] / seconds:.1f}/s)")
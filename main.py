@@ -1,20 +1,104 @@
 import os
-import shutil
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import json
+import asyncio
+import threading
+from contextlib import aclosing, asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse # <--- Added FileResponse
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse, PlainTextResponse # <--- Added FileResponse
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
+from pydantic import BaseModel, Field
 
 # Import our backend modules
-from backend.rag_engine import RAGEngine
-from backend.file_processor import MultimodalIngestor, SecurityCheck, FileConverter
+# (only the light ones: models and SDKs are loaded in the background by load_engine)
+from backend import config
+from backend.jobs import Job, JobManager, QueueFull
+from backend.concurrency import ConcurrencyLimiter, Overloaded
+from backend.startup import StartupReport
+from backend.upload_store import UploadSizeLimit, UploadStore, UploadTooLarge
+from backend.office import prune_conversion_cache
+from backend.thumbnails import ThumbnailStore, is_document_id
+from backend.models import ChatRequest
+from backend.sessions import SessionStore
+from backend.telemetry import telemetry
 
 # Fix for SQLite on Linux (if needed)
 __import__('pysqlite3')
 import sys
 sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 
-app = FastAPI()
+# --- Engine Lifecycle ---
+# The server binds immediately; models load (and warm up) in the background.
+# /healthz answers right away, /ready only once the engine can serve queries.
+ingestor = None
+rag_engine = None
+startup = StartupReport()
+
+def load_engine(warm_up: bool = config.WARMUP_ENABLED):
+    """
+    Imports the heavy modules, builds the ingestor and RAG engine, and runs a
+    warm-up inference. Each step is timed in the startup report.
+    """
+    global ingestor, rag_engine
+    try:
+        with startup.stage("import backend.file_processor"):
+            from backend.file_processor import MultimodalIngestor
+        with startup.stage("import backend.rag_engine"):
+            from backend import rag_engine as rag_engine_module
+
+        with startup.stage("init MultimodalIngestor"):
+            new_ingestor = MultimodalIngestor(api_key=os.getenv("GOOGLE_API_KEY"))
+        with startup.stage("init RAGEngine"):
+            # Reuses weights loaded before fork by serve.py, if any
+            engine = rag_engine_module.RAGEngine(preloaded=rag_engine_module.PRELOADED_MODELS)
+
+        if warm_up:
+            for name, seconds in engine.warm_up().items():
+                startup.record(f"warm-up {name}", seconds)
+
+        ingestor, rag_engine = new_ingestor, engine
+        startup.mark_ready()
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        startup.mark_failed(e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Started here (not at import) so every worker forked by serve.py gets its own threads
+    telemetry.start(
+        export_path=config.TELEMETRY_EXPORT_PATH or None,
+        export_interval=config.TELEMETRY_EXPORT_INTERVAL_SECONDS,
+        profile_threshold=config.PROFILE_SLOW_REQUESTS_MS / 1000,
+        profile_dir=config.PROFILE_DIR,
+        profile_interval=config.PROFILE_SAMPLE_INTERVAL_MS / 1000,
+    )
+    if config.STARTUP_MODE == "eager":
+        load_engine()
+    else:
+        threading.Thread(target=load_engine, name="engine-loader", daemon=True).start()
+    await run_in_threadpool(_enforce_retention)
+    yield
+    job_manager.shutdown()
+    if ingestor is not None:
+        from backend.file_processor import shutdown_conversion_service
+        shutdown_conversion_service()
+    if rag_engine is not None:
+        rag_engine.shutdown()
+    telemetry.shutdown()
+
+def _require_ready():
+    if startup.status == "failed":
+        raise HTTPException(status_code=503, detail=f"Server failed to start: {startup.error}")
+    if not startup.ready:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server is warming up ({startup.status}). Please retry shortly.",
+            headers={"Retry-After": "5"},
+        )
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -25,67 +109,438 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Engine
-ingestor = MultimodalIngestor(api_key=os.getenv("GOOGLE_API_KEY"))
-rag_engine = RAGEngine()
+# Oversized uploads are refused while they arrive, before the multipart body is parsed and spooled
+# (the slack covers the multipart framing; UploadStore.save() enforces the exact file limit)
+app.add_middleware(UploadSizeLimit, max_bytes=config.UPLOAD_MAX_MB * 1024 * 1024 + 64 * 1024)
+
+# Caps concurrent /chat streams; excess requests queue briefly, then get a 503
+chat_limiter = ConcurrencyLimiter(
+    max_active=config.CHAT_MAX_CONCURRENT,
+    max_waiting=config.CHAT_MAX_QUEUED,
+    queue_timeout=config.CHAT_QUEUE_TIMEOUT_SECONDS,
+)
+
+# Background ingestion (bounded so chat latency stays flat during bulk uploads)
+job_manager = JobManager(
+    max_workers=config.MAX_CONCURRENT_JOBS,
+    max_queued=config.MAX_QUEUED_JOBS,
+    history_size=config.JOB_HISTORY_SIZE,
+    state_dir=config.JOB_STATE_DIR or None,
+)
+
+# Uploads: streamed to disk, size-capped, stored once per distinct content (SHA-256)
+upload_store = UploadStore(
+    root=config.UPLOAD_DIR,
+    max_upload_bytes=config.UPLOAD_MAX_MB * 1024 * 1024,
+    retention_seconds=config.UPLOAD_RETENTION_DAYS * 86400,
+    max_total_bytes=int(config.UPLOAD_STORE_MAX_GB * 1024 ** 3),
+    chunk_size=config.UPLOAD_CHUNK_KB * 1024,
+)
+
+# Page previews for citations (rendered once per stored PDF, during ingestion)
+thumbnail_store = None
+if config.THUMBNAILS_ENABLED:
+    thumbnail_store = ThumbnailStore(config.THUMBNAIL_DIR, width=config.THUMBNAIL_WIDTH,
+                                     quality=config.THUMBNAIL_QUALITY)
 
-class ChatRequest(BaseModel):
-    message: str
+def _indexed_hashes() -> set:
+    """Content hashes of indexed documents (read from the manifest file while the engine loads)."""
+    if rag_engine is not None:
+        return rag_engine.manifest.file_hashes()
+    from backend.manifest import IndexManifest
+    return IndexManifest(config.INDEX_MANIFEST_PATH).file_hashes()
+
+def _enforce_retention():
+    """
+    Upload store limits (indexed documents are kept: citations point to them); thumbnails
+    go with their PDF. Converted PDFs cached for deleted uploads are bounded afterwards.
+    """
+    indexed = _indexed_hashes()
+    upload_store.enforce_retention(in_use=indexed.__contains__)
+    if thumbnail_store:
+        thumbnail_store.prune(lambda file_hash: upload_store.pdf_path(file_hash) is not None)
+    prune_conversion_cache(config.CONVERSION_CACHE_DIR, int(config.CONVERSION_CACHE_MAX_GB * 1024 ** 3))
+
+def _source_name(original_name: str) -> str:
+    """The document name used in the index (and in /files URLs)."""
+    return os.path.splitext(os.path.basename(original_name))[0] + ".pdf"
+
+# Batch Q&A (evaluation runs, bulk FAQ generation) gets its own, smaller pool
+batch_limiter = ConcurrencyLimiter(
+    max_active=config.CHAT_BATCH_MAX_CONCURRENT,
+    max_waiting=config.CHAT_BATCH_MAX_CONCURRENT * 2,
+    queue_timeout=config.CHAT_QUEUE_TIMEOUT_SECONDS,
+)
+
+# Conversations: /chat turns that carry a session_id share history and retrieval state
+session_store = SessionStore(
+    max_sessions=config.SESSION_MAX,
+    ttl_seconds=config.SESSION_TTL_SECONDS,
+    recent_turns=config.SESSION_RECENT_TURNS,
+    history_max_tokens=config.SESSION_HISTORY_MAX_TOKENS,
+    answer_max_tokens=config.SESSION_ANSWER_MAX_TOKENS,
+    max_candidates=config.SESSION_MAX_CANDIDATES,
+)
+
+class ChatBatchRequest(BaseModel):
+    questions: List[str] = Field(min_length=1, max_length=config.CHAT_BATCH_MAX_QUESTIONS)
+    documents: Optional[List[str]] = Field(None, min_length=1)  # Limit retrieval to these documents
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: models are loaded and warmed up. Includes the startup report."""
+    report = startup.to_dict()
+    if not startup.ready:
+        return JSONResponse(status_code=503, content=report)
+    return report
 
 @app.get("/")
 def read_root():
     return FileResponse("static/index.html")
 
-# --- NEW ENDPOINT: Serve Converted Files ---
+# --- Document Serving ---
+# Stored PDFs are content-addressed, so their SHA-256 is a strong ETag. FileResponse
+# answers Range / If-Range requests (206 / 416), so viewers can fetch only the bytes they need.
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in {tag.strip() for tag in if_none_match.split(",")}
+
+def _immutable_cache_control() -> str:
+    return f"public, max-age={config.DOCUMENT_CACHE_MAX_AGE_SECONDS}, immutable"
+
+def _serve_pdf(request: Request, file_hash: Optional[str], filename: Optional[str], cache_control: str):
+    file_path = upload_store.pdf_path(file_hash) if file_hash and is_document_id(file_hash) else None
+    if not file_path:
+        if file_hash and rag_engine and file_hash in rag_engine.manifest.file_hashes():
+            # Indexed before files were kept (or by an older bulk_ingest.py)
+            raise HTTPException(status_code=404, detail="The original file of this document is not stored. "
+                                                        "Re-upload it (or re-run bulk_ingest.py) to view it.")
+        raise HTTPException(status_code=404, detail="File not found")
+    headers = {"ETag": f'"{file_hash}"', "Cache-Control": cache_control}
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(file_path, media_type="application/pdf", filename=filename,
+                        content_disposition_type="inline", headers=headers)
+
 @app.get("/files/{filename}")
-async def get_file(filename: str):
-    file_path = filename
-    if os.path.exists(file_path):
-        return FileResponse(file_path)
-    raise HTTPException(status_code=404, detail="File not found")
+async def get_file(filename: str, request: Request):
+    """
+    An indexed document by name (name -> content hash -> stored PDF). A name can
+    point to new content after a re-upload, so clients revalidate (304 if unchanged).
+    """
+    file_hash = rag_engine.manifest.file_hash(filename) if rag_engine else None
+    return _serve_pdf(request, file_hash, filename, "no-cache")
+
+@app.get("/documents/{document_id}/pdf")
+async def get_document_pdf(document_id: str, request: Request):
+    """A stored PDF by content hash (the 'document_id' of /upload and /documents). Never changes: cached for good."""
+    return _serve_pdf(request, document_id, None, _immutable_cache_control())
+
+@app.get("/documents/{document_id}/pages/{page}/thumbnail")
+async def get_page_thumbnail(document_id: str, page: int, request: Request):
+    """Low-resolution JPEG preview of one page (1-based, like the [Page X] citations)."""
+    if not thumbnail_store or not is_document_id(document_id):
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    headers = {"ETag": f'"{document_id}-{page}-{config.THUMBNAIL_WIDTH}-{config.THUMBNAIL_QUALITY}"',
+               "Cache-Control": _immutable_cache_control()}
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    path = thumbnail_store.path(document_id, page)
+    if path is None:
+        # Stored before thumbnails existed (or still rendering): render just this page
+        pdf_path = upload_store.pdf_path(document_id)
+        if pdf_path:
+            path = await run_in_threadpool(thumbnail_store.render_page, pdf_path, document_id, page)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
+
+# --- Indexed Documents ---
+@app.get("/documents")
+async def list_documents():
+    """Indexed documents (the names /chat accepts in 'documents') with their page and vector counts."""
+    _require_ready()
+    documents = []
+    for source in rag_engine.manifest.sources():
+        entry = rag_engine.manifest.get_source(source) or {}
+        pages = entry.get("pages", {})
+        documents.append({
+            "filename": source,
+            "document_id": entry.get("file_hash"),
+            "pages": len(pages),
+            "vectors": sum(len(page["ids"]) for page in pages.values()),
+            "indexed_at": entry.get("indexed_at"),
+        })
+    return {"documents": documents, "index_version": rag_engine.index_version}
+
+@app.delete("/documents/{filename}")
+async def delete_document(filename: str):
+    """Removes a document from the index (drops its partition)."""
+    _require_ready()
+    if not await run_in_threadpool(rag_engine.remove_document, filename):
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"status": "deleted", "filename": filename}
 
 # Serve Static Assets (CSS/JS)
 @app.get("/static/{filename}")
 async def get_static(filename: str):
     return FileResponse(f"static/{filename}")
 
-@app.post("/upload")
+def run_ingestion_pipeline(job: Job) -> dict:
+    """
+    The heavy part of an upload: conversion, page extraction (with vision)
+    and indexing. Runs on the JobManager's worker pool, never on the event loop.
+    """
+    final_path = job.filename
+
+    # 0. Skip files that are already indexed byte-for-byte (hash = stored file name)
+    file_hash = UploadStore.hash_of(final_path)
+    source = _source_name(job.original_name)
+    if rag_engine.is_indexed(source, file_hash) and upload_store.pdf_path(file_hash):
+        print(f"♻️  '{source}' is unchanged since the last ingest. Skipping.")
+        return {"filename": source, "document_id": file_hash, "original_name": job.original_name, "unchanged": True}
+
+    # 1. Convert DOCX to PDF (if needed)
+    # This function now uses LibreOffice on Linux
+    if final_path.endswith(".docx"):
+        from backend.file_processor import FileConverter
+
+        job.set_stage("converting")
+        with telemetry.span("conversion"):
+            converted = upload_store.pdf_path(file_hash) or FileConverter.docx_to_pdf(final_path)
+        if converted.endswith(".pdf") and os.path.exists(final_path):
+            os.remove(final_path)  # The DOCX is only an intermediate
+        final_path = converted
+
+    # 2. Ingest (Read Text & Images)
+    job.set_stage("extracting")
+    docs = ingestor.process_pdf(final_path, progress=job.set_progress, source=source)
+
+    job.set_stage("indexing")
+    rag_engine.ingest_document(docs, progress=job.set_progress, file_hash=file_hash)
+
+    # 3. Page previews for citations
+    if thumbnail_store and not thumbnail_store.has(file_hash):
+        job.set_stage("thumbnails")
+        try:
+            with telemetry.span("thumbnails"):
+                thumbnail_store.render(final_path, file_hash, progress=job.set_progress)
+        except Exception as e:
+            print(f"⚠️ Thumbnail Warning: {e}")  # Previews are optional: rendered on demand instead
+
+    # 4. Return the document name (/files/{filename}) and id (/documents/{document_id}/...)
+    return {
+        "filename": source,
+        "document_id": file_hash,
+        "original_name": job.original_name,
+    }
+
+@app.post("/upload", status_code=202)
 async def upload_file(file: UploadFile = File(...)):
-    temp_filename = f"temp_{file.filename}"
-    
+    _require_ready()
+    from backend.file_processor import SecurityCheck
+    ext = os.path.splitext(file.filename or "")[1].lower()
+    stored = None
+
     try:
-        # 1. Save File Locally
-        with open(temp_filename, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
+        # 1. Stream into the content-addressed store (hashed + size-checked on the way)
+        with telemetry.span("upload_save"):
+            stored = await upload_store.save(file, ext)
+
         # 2. Security Check
-        if not SecurityCheck.validate_file(temp_filename):
-            os.remove(temp_filename)
+        with telemetry.span("security_check"):
+            is_valid = await run_in_threadpool(SecurityCheck.validate_file, stored.path)
+        if not is_valid:
+            if not stored.existed:
+                os.remove(stored.path)
             raise HTTPException(status_code=400, detail="Security Check Failed: Invalid file type.")
 
-        # 3. Convert DOCX to PDF (if needed)
-        # This function now uses LibreOffice on Linux
-        final_path = temp_filename
-        if temp_filename.endswith(".docx"):
-            final_path = FileConverter.docx_to_pdf(temp_filename)
-
-        # 4. Ingest (Read Text & Images)
-        docs = ingestor.process_pdf(final_path)
-        rag_engine.ingest_document(docs)
-        
-        # 5. Return the NEW filename (the PDF version)
+        # 3. Identical bytes already indexed under this name: nothing to do
+        source = _source_name(file.filename)
+        pdf_path = upload_store.pdf_path(stored.file_hash)
+        if rag_engine.is_indexed(source, stored.file_hash) and pdf_path:
+            if stored.path != pdf_path and os.path.exists(stored.path):
+                os.remove(stored.path)  # DOCX duplicate of an already converted file
+            print(f"♻️  '{source}' is unchanged since the last ingest. Skipping.")
+            return {"status": "unchanged", "filename": source, "document_id": stored.file_hash,
+                    "original_name": file.filename}
+
+        # 4. Queue the rest of the pipeline and return right away
+        job = job_manager.submit(Job(stored.path, file.filename), run_ingestion_pipeline)
+        await run_in_threadpool(_enforce_retention)
         return {
-            "status": "success", 
-            "filename": os.path.basename(final_path),
+            "status": "queued",
+            "job_id": job.id,
             "original_name": file.filename
         }
 
+    except HTTPException:
+        raise
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except QueueFull as e:
+        if stored and not stored.existed and os.path.exists(stored.path): os.remove(stored.path)
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
-        if os.path.exists(temp_filename): os.remove(temp_filename)
+        if stored and not stored.existed and os.path.exists(stored.path): os.remove(stored.path)
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- Ingestion Job Endpoints ---
+def _get_job_or_404(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return _get_job_or_404(job_id).to_dict()
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    _get_job_or_404(job_id)
+    return job_manager.cancel(job_id).to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events stream of job progress. Closes once the job finishes."""
+    job = _get_job_or_404(job_id)
+
+    async def event_stream():
+        last_version = -1
+        while True:
+            finished = job.is_finished
+            if job.version != last_version:
+                last_version = job.version
+                yield f"data: {json.dumps(job.to_dict())}\n\n"
+            if finished:
+                break
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+def _runtime_stats() -> dict:
+    """Cache hit rates and queue depths (the engine's only once it is loaded)."""
+    stats = {
+        "chat": chat_limiter.stats(),
+        "sessions": session_store.stats(),
+        "chat_batch": batch_limiter.stats(),
+        "jobs": {"queued": job_manager.pending_count(), "running": job_manager.running_count()},
+    }
+    if thumbnail_store:
+        stats["thumbnails"] = thumbnail_store.stats()
+    if startup.ready:
+        from backend.file_processor import get_conversion_service
+        stats.update({
+            **rag_engine.cache_stats(),
+            "vision": ingestor.vision.stats(),
+            "conversion": get_conversion_service().stats(),
+        })
+    return stats
+
+telemetry.add_collector("runtime", _runtime_stats)
+
+@app.get("/stats")
+async def get_stats():
+    """Cache hit rates, queue depths and per-stage latencies (JSON)."""
+    _require_ready()
+    return {
+        **_runtime_stats(),
+        "uploads": await run_in_threadpool(upload_store.stats),
+        "latency": telemetry.summary(),
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Per-stage latency histograms, cache hit rates and queue depths (Prometheus text format)."""
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4")
+
+class LimitedStreamingResponse(StreamingResponse):
+    """StreamingResponse that frees its concurrency slot however the stream ends."""
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self._release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
 @app.post("/chat")
-async def chat(request: ChatRequest):
-    return StreamingResponse(rag_engine.stream_answer(request.message), media_type="text/plain")
\ No newline at end of file
+async def chat(request: ChatRequest, http_request: Request):
+    _require_ready()
+    # Resolved before taking a slot: anything that can fail between acquire() and the response leaks it
+    session = session_store.get_or_create(request.session_id) if request.session_id else None
+
+    # Queue (bounded) or shed load before any work starts
+    try:
+        await chat_limiter.acquire()
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "2"})
+
+    async def answer_stream():
+        with telemetry.span("chat_request", profile=True):
+            async with aclosing(rag_engine.astream_answer(request.message, session=session,
+                                                               sources=request.documents)) as stream:
+                async for chunk in stream:
+                    # Stop generating as soon as the client is gone
+                    if await http_request.is_disconnected():
+                        break
+                    yield chunk
+
+    try:
+        return LimitedStreamingResponse(answer_stream(), release=chat_limiter.release, media_type="text/plain")
+    except Exception:
+        chat_limiter.release()
+        raise
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """History, retrieval-candidate count and the last turns' hits of a conversation."""
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session.to_dict()
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"status": "deleted", "session_id": session_id}
+
+@app.post("/chat/batch")
+async def chat_batch(request: ChatBatchRequest):
+    """
+    Answers many questions in one call (JSON, not streamed): batched embedding,
+    vector search and reranking, then bounded-concurrency generation.
+    Each result includes the retrieved pages and their reranker scores.
+    """
+    _require_ready()
+    try:
+        await batch_limiter.acquire()
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+    try:
+        start = asyncio.get_running_loop().time()
+        results = await rag_engine.answer_batch(request.questions,
+                                                concurrency=config.CHAT_BATCH_GENERATION_CONCURRENCY,
+                                                sources=request.documents)
+        return {
+            "results": results,
+            "seconds": round(asyncio.get_running_loop().time() - start, 3),
+            "index_version": rag_engine.index_version,
+        }
+    finally:
+        batch_limiter.release()
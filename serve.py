@@ -0,0 +1,117 @@
+# serve.py
+# Preload-then-fork launcher for multi-worker deployments.
+# The parent process loads the model weights once, then forks N uvicorn workers
+# that share those weights copy-on-write (instead of N private copies).
+# Each worker still builds its own Chroma client, ONNX sessions and thread pools
+# (none of those survive fork) and warms up in the background as usual.
+#
+# State shared between workers:
+#   - the index manifest: reloaded when another worker saves it, saved with a locked
+#     read-merge-write, so every worker sees new documents and moves to the new
+#     index version (which invalidates its retrieval/answer caches);
+#   - ingestion jobs: mirrored to JOB_STATE_DIR, so /jobs/{id} polls and the SSE
+#     stream work whichever worker they land on.
+# Conversations (/chat session_id) are NOT shared: they live in the worker that created
+# them, and the workers here share one socket, so a follow-up turn that lands on another
+# worker starts the conversation afresh (the answer is still grounded; history and
+# candidate reuse are lost). For full continuity, run single-worker instances behind a
+# load balancer with sticky routing on session_id.
+# Usage: python serve.py [--workers 4] [--host 0.0.0.0] [--port 8000]
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import argparse
+
+import uvicorn
+
+sys.path.append(os.getcwd())
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(app, sock: socket.socket):
+    # Restore default signal handling; uvicorn installs its own
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config(app, lifespan="on", log_level="info"))
+    server.run(sockets=[sock])
+
+def main():
+    parser = argparse.ArgumentParser(description="Preload models, then fork uvicorn workers.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    sock = bind_socket(args.host, args.port)
+    print(f"🔌 Listening on {args.host}:{args.port} with {args.workers} workers")
+    if args.workers > 1:
+        print("⚠️ Conversation history is per worker: follow-up turns may land on another worker.")
+
+    # 1. Load the weights once, in the parent (no inference: that would start
+    #    OpenMP/torch thread pools, which are not fork-safe)
+    start = time.perf_counter()
+    import main as app_module
+    from backend import rag_engine
+    rag_engine.PRELOADED_MODELS = rag_engine.preload_models()
+    print(f"📦 Models preloaded in {time.perf_counter() - start:.1f}s")
+
+    # 2. Move everything allocated so far out of the GC's reach, so collections
+    #    in the workers don't touch (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+
+    # 3. Fork workers and keep them alive
+    children = {}
+    stopping = False
+
+    def spawn() -> int:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(app_module.app, sock)
+            finally:
+                os._exit(0)
+        children[pid] = time.monotonic()
+        return pid
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started_at = children.pop(pid, None)
+        if stopping or started_at is None:
+            continue
+        print(f"⚠️ Worker {pid} exited (status {status}). Restarting...")
+        if time.monotonic() - started_at < 5:
+            time.sleep(1)  # Don't spin if workers crash on startup
+        spawn()
+
+    print("👋 All workers stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -1,80 +1,192 @@
 import json
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
+import sys
+import time
+import asyncio
+import hashlib
+import argparse
 from dotenv import load_dotenv
 
 # Load Environment Variables
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-def run_evaluation():
+REPORT_PATH = "simulation/report.json"
+RESULTS_PATH = "simulation/eval_results.json"
+CACHE_PATH = "simulation/judge_cache.json"
+
+# Bump whenever JUDGE_PROMPT changes: cached verdicts of older versions are ignored
+JUDGE_PROMPT_VERSION = "v1"
+JUDGE_PROMPT = """
+        You are a strict technical grader. Compare the ACTUAL ANSWER with the EXPECTED ANSWER.
+
+        Question: {question}
+
+        EXPECTED ANSWER: {expected}
+
+        ACTUAL ANSWER: {answer}
+
+        Rule:
+        - If the ACTUAL answer contains the core correct information from the EXPECTED answer, grade it PASS.
+        - If it is wrong, missing key numbers, or says "Data Not Found" when it shouldn't, grade it FAIL.
+        - Output ONLY the word "PASS" or "FAIL" followed by a very short reason.
+
+        Format: PASS - Reason... OR FAIL - Reason...
+        """
+
+def verdict_key(question: str, expected: str, answer: str) -> str:
+    answer_hash = hashlib.sha256(answer.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{JUDGE_PROMPT_VERSION}\x00{question}\x00{expected}\x00{answer_hash}".encode("utf-8")).hexdigest()
+
+class VerdictCache:
+    """Persistent verdict store: unchanged answers are never sent to the judge twice."""
+    def __init__(self, path: str = None):
+        self.path = path  # None: in-memory only (--no-cache)
+        self.data = {}
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                self.data = json.load(f)
+
+    def get(self, key: str):
+        return self.data.get(key)
+
+    def put(self, key: str, verdict: dict):
+        self.data[key] = verdict
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+def parse_verdict(text: str) -> dict:
+    text = text.strip()
+    status = "PASS" if "PASS" in text.upper() else "FAIL"
+    return {"status": status, "reason": text.replace("PASS - ", "").replace("FAIL - ", "")}
+
+def percentiles(values) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "max": None, "mean": None}
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+    return {"p50": pick(0.50), "p95": pick(0.95), "max": values[-1], "mean": round(sum(values) / len(values), 3)}
+
+async def judge(judge_llm, item: dict, semaphore: asyncio.Semaphore, max_retries: int, backoff: float) -> dict:
+    prompt = JUDGE_PROMPT.format(question=item["question"], expected=item["expected"], answer=item["agent_answer"])
+    async with semaphore:
+        for attempt in range(max_retries + 1):
+            try:
+                response = await judge_llm.ainvoke(prompt)
+                return parse_verdict(response.content)
+            except Exception as e:
+                if attempt == max_retries:
+                    return {"status": "ERROR", "reason": str(e)}
+                await asyncio.sleep(backoff * (2 ** attempt))
+
+async def grade_all(report_data, cache: VerdictCache, concurrency: int, max_retries: int, backoff: float):
+    """Returns (verdicts, cached_flags); only uncached answers are sent to the judge, concurrently."""
+    keys = [verdict_key(item["question"], item["expected"], item["agent_answer"]) for item in report_data]
+    verdicts = [cache.get(key) for key in keys]
+    cached = [v is not None for v in verdicts]
+    todo = [i for i, v in enumerate(verdicts) if v is None]
+
+    if todo:
+        # 2. Initialize the Judge (Gemini) only when something needs grading
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        judge_llm = ChatGoogleGenerativeAI(
+            model="gemini-2.0-flash",
+            temperature=0,
+            google_api_key=GOOGLE_API_KEY
+        )
+        semaphore = asyncio.Semaphore(concurrency)
+        fresh = await asyncio.gather(*(judge(judge_llm, report_data[i], semaphore, max_retries, backoff) for i in todo))
+        for i, verdict in zip(todo, fresh):
+            verdicts[i] = verdict
+            if verdict["status"] != "ERROR":  # Errors are retried on the next run
+                cache.put(keys[i], {**verdict, "prompt_version": JUDGE_PROMPT_VERSION, "judged_at": time.time()})
+    return verdicts, cached
+
+def run_evaluation(concurrency: int = 8, max_retries: int = 3, backoff: float = 1.0, use_cache: bool = True):
     print("⚖️  Judge Agent Initialized. Grading responses...")
-    
+    start = time.perf_counter()
+
     # 1. Load the Simulation Report
     try:
-        with open("simulation/report.json", "r") as f:
+        with open(REPORT_PATH, "r") as f:
             report_data = json.load(f)
     except FileNotFoundError:
         print("❌ Report not found. Run sim_agent.py first.")
         return
 
-    # 2. Initialize the Judge (Gemini)
-    judge_llm = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash",
-        temperature=0,
-        google_api_key=GOOGLE_API_KEY
-    )
+    previous = {}
+    if os.path.exists(RESULTS_PATH):
+        with open(RESULTS_PATH, "r") as f:
+            previous = {case["question"]: case["status"] for case in json.load(f).get("cases", [])}
 
-    score = 0
+    cache = VerdictCache(CACHE_PATH if use_cache else None)
     total = len(report_data)
-    
-    print(f"\n📝 Grading {total} Test Cases...\n")
-    print(f"{'ID':<5} | {'Result':<10} | {'Latency':<10} | {'Reason'}")
-    print("-" * 80)
-
-    for i, item in enumerate(report_data):
-        question = item['question']
-        agent_ans = item['agent_answer']
-        expected_ans = item['expected']
-        
-        # 3. Create Grading Prompt
-        # We ask the AI to be an objective judge.
-        grading_prompt = f"""
-        You are a strict technical grader. Compare the ACTUAL ANSWER with the EXPECTED ANSWER.
-        
-        Question: {question}
-        
-        EXPECTED ANSWER: {expected_ans}
-        
-        ACTUAL ANSWER: {agent_ans}
-        
-        Rule:
-        - If the ACTUAL answer contains the core correct information from the EXPECTED answer, grade it PASS.
-        - If it is wrong, missing key numbers, or says "Data Not Found" when it shouldn't, grade it FAIL.
-        - Output ONLY the word "PASS" or "FAIL" followed by a very short reason.
-        
-        Format: PASS - Reason... OR FAIL - Reason...
-        """
-        
-        try:
-            # Ask the Judge
-            grade_response = judge_llm.invoke(grading_prompt).content.strip()
-            
-            # Parse Result
-            status = "PASS" if "PASS" in grade_response.upper() else "FAIL"
-            if status == "PASS":
-                score += 1
-            
-            # Print row
-            print(f"{i+1:<5} | {status:<10} | {item['latency']}s      | {grade_response.replace('PASS - ', '').replace('FAIL - ', '')[:50]}...")
-            
-        except Exception as e:
-            print(f"{i+1:<5} | ERROR      | -           | {e}")
+    print(f"\n📝 Grading {total} Test Cases (concurrency {concurrency})...\n")
+    verdicts, cached = asyncio.run(grade_all(report_data, cache, concurrency, max_retries, backoff))
+    cache.save()
+
+    print(f"{'ID':<5} | {'Result':<10} | {'Latency':<10} | {'Delta':<9} | {'Reason'}")
+    print("-" * 90)
+    cases = []
+    for i, (item, verdict, was_cached) in enumerate(zip(report_data, verdicts, cached)):
+        before = previous.get(item["question"])
+        if before is None:
+            delta = "new"
+        elif before == verdict["status"]:
+            delta = "same"
+        elif verdict["status"] == "PASS":
+            delta = "fixed"
+        else:
+            delta = "regressed"
+        cases.append({
+            "id": i + 1,
+            "question": item["question"],
+            "status": verdict["status"],
+            "reason": verdict["reason"],
+            "latency": item.get("latency"),
+            "cached": was_cached,
+            "previous_status": before,
+            "delta": delta,
+        })
+        print(f"{i+1:<5} | {verdict['status']:<10} | {str(item.get('latency')) + 's':<10} | {delta:<9} | {verdict['reason'][:50]}...")
 
     # 4. Final Score
-    accuracy = (score / total) * 100
-    print("-" * 80)
-    print(f"\n🎯 Final Accuracy Score: {accuracy}% ({score}/{total})\n")
+    passed = sum(1 for c in cases if c["status"] == "PASS")
+    accuracy = (passed / total) * 100 if total else 0.0
+    summary = {
+        "accuracy": round(accuracy, 2),
+        "passed": passed,
+        "total": total,
+        "errors": sum(1 for c in cases if c["status"] == "ERROR"),
+        "cached": sum(cached),
+        "judged": total - sum(cached),
+        "fixed": sum(1 for c in cases if c["delta"] == "fixed"),
+        "regressed": sum(1 for c in cases if c["delta"] == "regressed"),
+        "latency_seconds": percentiles([c["latency"] for c in cases if c["latency"] is not None]),
+        "eval_seconds": round(time.perf_counter() - start, 2),
+        "prompt_version": JUDGE_PROMPT_VERSION,
+    }
+    with open(RESULTS_PATH, "w") as f:
+        json.dump({"summary": summary, "cases": cases}, f, indent=2)
+
+    print("-" * 90)
+    print(f"\n🎯 Final Accuracy Score: {accuracy:.1f}% ({passed}/{total})")
+    print(f"   {summary['judged']} judged, {summary['cached']} from cache, {summary['errors']} error(s) | "
+          f"{summary['fixed']} fixed, {summary['regressed']} regressed | {summary['eval_seconds']}s")
+    print(f"   Results saved to '{RESULTS_PATH}'.\n")
+    return summary
 
 if __name__ == "__main__":
-    run_evaluation()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Grade simulation/report.json with an LLM judge.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Judge calls in flight")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--no-cache", action="store_true", help="Regrade everything (cache is not updated)")
+    args = parser.parse_args()
+    summary = run_evaluation(concurrency=args.concurrency, max_retries=args.retries, use_cache=not args.no_cache)
+    sys.exit(0 if summary else 1)
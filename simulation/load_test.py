@@ -0,0 +1,192 @@
+# simulation/load_test.py
+# Concurrent load generator for /chat (async, streaming).
+# Measures per request: time-to-first-token, gaps between streamed chunks and total
+# latency (p50/p95/p99), plus throughput and error rates. Writes a JSON report that
+# can be compared against a saved baseline. Streams that carry an in-band error
+# ("⚠️ Retrieval Error" / "⚠️ Generator Error", sent with HTTP 200) count as failed
+# and are left out of the latency percentiles.
+#
+# For capacity tests without network, start the server with LLM_BACKEND=stub.
+#
+# Usage:
+#   python simulation/load_test.py --concurrency 32 --duration 60 --profile ramp --ramp 20
+#   python simulation/load_test.py --out simulation/load_baseline.json
+#   python simulation/load_test.py --compare simulation/load_baseline.json
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+
+import httpx
+
+GOLD_DATA = "simulation/gold_standard.json"
+
+# /chat reports failures inside the stream (with HTTP 200): such requests are errors, not answers
+STREAM_ERRORS = {"retrieval_error": "⚠️ Retrieval Error:".encode(), "generator_error": "⚠️ Generator Error:".encode()}
+MARKER_OVERLAP = max(len(marker) for marker in STREAM_ERRORS.values())
+
+def percentiles(values) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+    return {"p50": round(pick(0.50), 4), "p95": round(pick(0.95), 4),
+            "p99": round(pick(0.99), 4), "max": round(values[-1], 4)}
+
+class LoadTest:
+    def __init__(self, url: str, questions, concurrency: int, duration: float, profile: str,
+                 ramp: float, steps: int, timeout: float, cache_bust: bool):
+        self.url = url
+        self.questions = questions
+        self.concurrency = concurrency
+        self.duration = duration
+        self.profile = profile
+        self.ramp = ramp
+        self.steps = steps
+        self.timeout = timeout
+        self.cache_bust = cache_bust
+        self.records = []
+        self._counter = 0
+
+    def start_delay(self, worker: int) -> float:
+        """When each virtual user starts, per ramp profile."""
+        if self.profile == "ramp":
+            return self.ramp * worker / self.concurrency
+        if self.profile == "step":
+            per_step = max(1, self.concurrency // self.steps)
+            return (self.ramp / self.steps) * (worker // per_step)
+        return 0.0  # constant
+
+    def next_question(self) -> str:
+        self._counter += 1
+        question = self.questions[self._counter % len(self.questions)]
+        # Unique suffix defeats the retrieval/answer caches (measures the uncached path)
+        return f"{question} (#{self._counter})" if self.cache_bust else question
+
+    async def one_request(self, client: httpx.AsyncClient, worker: int, started_at: float):
+        question = self.next_question()
+        record = {"worker": worker, "t": round(time.perf_counter() - started_at, 3), "ok": False,
+                  "status": None, "error": None, "ttft": None, "total": None, "gaps": [], "bytes": 0}
+        start = time.perf_counter()
+        try:
+            async with client.stream("POST", self.url, json={"message": question}, timeout=self.timeout) as response:
+                record["status"] = response.status_code
+                last = None
+                carry = b""  # A marker may be split across chunks
+                async for chunk in response.aiter_bytes():
+                    now = time.perf_counter()
+                    if last is None:
+                        record["ttft"] = now - start
+                    else:
+                        record["gaps"].append(now - last)
+                    last = now
+                    record["bytes"] += len(chunk)
+                    window = carry + chunk
+                    for error, marker in STREAM_ERRORS.items():
+                        if marker in window:
+                            record["error"] = error
+                    carry = window[-MARKER_OVERLAP:]
+            record["total"] = time.perf_counter() - start
+            record["ok"] = record["status"] == 200 and record["error"] is None
+            if record["status"] != 200:
+                record["error"] = f"HTTP {record['status']}"
+        except httpx.TimeoutException:
+            record["error"] = "timeout"
+        except httpx.HTTPError as e:
+            record["error"] = type(e).__name__
+        self.records.append(record)
+
+    async def user(self, client: httpx.AsyncClient, worker: int, started_at: float, stop_at: float):
+        await asyncio.sleep(self.start_delay(worker))
+        while time.perf_counter() < stop_at:
+            await self.one_request(client, worker, started_at)
+            if not self.records[-1]["ok"]:
+                await asyncio.sleep(0.1)  # Don't hammer a server that is refusing/failing
+
+    async def run(self) -> dict:
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(limits=limits) as client:
+            started_at = time.perf_counter()
+            stop_at = started_at + self.duration
+            await asyncio.gather(*(self.user(client, w, started_at, stop_at) for w in range(self.concurrency)))
+            elapsed = time.perf_counter() - started_at
+        return self.summary(elapsed)
+
+    def summary(self, elapsed: float) -> dict:
+        ok = [r for r in self.records if r["ok"]]
+        errors = {}
+        for r in self.records:
+            if not r["ok"]:
+                errors[r["error"]] = errors.get(r["error"], 0) + 1
+        return {
+            "config": {"url": self.url, "concurrency": self.concurrency, "duration": self.duration,
+                       "profile": self.profile, "ramp": self.ramp, "cache_bust": self.cache_bust},
+            "requests": len(self.records),
+            "succeeded": len(ok),
+            "error_rate": round(1 - len(ok) / len(self.records), 4) if self.records else 0.0,
+            "errors": errors,
+            "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+            "ttft_seconds": percentiles([r["ttft"] for r in ok if r["ttft"] is not None]),
+            "total_seconds": percentiles([r["total"] for r in ok]),
+            "gap_seconds": percentiles([g for r in ok for g in r["gaps"]]),
+        }
+
+def print_summary(summary: dict):
+    print(f"\n📊 {summary['requests']} requests | {summary['succeeded']} ok | "
+          f"error rate {summary['error_rate'] * 100:.1f}% | {summary['throughput_rps']} req/s")
+    if summary["errors"]:
+        print(f"   Errors: {summary['errors']}")
+    print(f"\n{'Metric':<14} | {'p50':<8} | {'p95':<8} | {'p99':<8} | {'max':<8}")
+    print("-" * 56)
+    for key, label in (("ttft_seconds", "TTFT (s)"), ("gap_seconds", "Chunk gap (s)"), ("total_seconds", "Total (s)")):
+        p = summary[key]
+        print(f"{label:<14} | {str(p['p50']):<8} | {str(p['p95']):<8} | {str(p['p99']):<8} | {str(p['max']):<8}")
+
+def compare(summary: dict, baseline: dict):
+    print("\n📊 Compared to baseline (lower is better, except throughput):")
+    rows = [("throughput_rps", None), ("error_rate", None)]
+    rows += [(key, p) for key in ("ttft_seconds", "gap_seconds", "total_seconds") for p in ("p50", "p95", "p99")]
+    for key, p in rows:
+        old = baseline.get(key) if p is None else (baseline.get(key) or {}).get(p)
+        new = summary.get(key) if p is None else summary[key].get(p)
+        label = key if p is None else f"{key} {p}"
+        if old is None or new is None:
+            continue
+        delta = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"   {label:<22} {old:>10} -> {new:<10} ({delta})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load test for /chat.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/chat")
+    parser.add_argument("--concurrency", type=int, default=16, help="Virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds")
+    parser.add_argument("--profile", choices=("constant", "ramp", "step"), default="constant")
+    parser.add_argument("--ramp", type=float, default=10, help="Seconds to reach full concurrency (ramp/step)")
+    parser.add_argument("--steps", type=int, default=4, help="Number of steps (step profile)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--cache-bust", action="store_true", help="Make every question unique")
+    parser.add_argument("--questions", default=GOLD_DATA)
+    parser.add_argument("--out", default="simulation/load_report.json")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.questions, "r") as f:
+        questions = [case["question"] for case in json.load(f)]
+    random.Random(args.seed).shuffle(questions)
+
+    print(f"🚦 Load test: {args.concurrency} users, {args.duration:g}s, profile={args.profile} -> {args.url}")
+    test = LoadTest(args.url, questions, args.concurrency, args.duration, args.profile,
+                    args.ramp, args.steps, args.timeout, args.cache_bust)
+    summary = asyncio.run(test.run())
+    print_summary(summary)
+
+    with open(args.out, "w") as f:
+        json.dump({**summary, "records": test.records}, f, indent=2)
+    print(f"\n💾 Report saved to {args.out}")
+
+    if args.compare and os.path.exists(args.compare):
+        with open(args.compare, "r") as f:
+            compare(summary, json.load(f))
@@ -1,18 +1,43 @@
 import requests
 import json
+import sys
 import time
 
 # Configuration
 API_URL = "http://127.0.0.1:8000/chat"
+BATCH_URL = "http://127.0.0.1:8000/chat/batch"
 GOLD_DATA = "simulation/gold_standard.json"
 
-def run_simulation():
+def run_batch_simulation(test_cases):
+    """All questions in one /chat/batch call (batched retrieval + reranking on the server)."""
+    print(f"📋 Sending {len(test_cases)} test cases to /chat/batch...\n")
+    start_time = time.time()
+    response = requests.post(BATCH_URL, json={"questions": [case["question"] for case in test_cases]})
+    response.raise_for_status()
+    print(f"   ✅ Received {len(test_cases)} answers ({round(time.time() - start_time, 2)}s total)\n")
+
+    results = []
+    for case, item in zip(test_cases, response.json()["results"]):
+        results.append({
+            "question": case["question"],
+            "agent_answer": item["answer"] if item["error"] is None else f"⚠️ {item['error']}",
+            "expected": case["expected_answer"],
+            "latency": item["latency_seconds"],
+            "sources": item["sources"],
+        })
+    return results
+
+def run_simulation(batch: bool = True):
     print("🤖 Agent A (User Simulator) Initialized...")
     
     # Load Questions
     with open(GOLD_DATA, "r") as f:
         test_cases = json.load(f)
-    
+
+    if batch:
+        save_report(run_batch_simulation(test_cases))
+        return
+
     results = []
 
     print(f"📋 Starting Evaluation of {len(test_cases)} test cases...\n")
@@ -46,11 +71,14 @@ def run_simulation():
         except Exception as e:
             print(f"   ❌ Error: {e}\n")
 
-    # Save Report
+    save_report(results)
+
+def save_report(results):
     with open("simulation/report.json", "w") as f:
         json.dump(results, f, indent=2)
     
     print("🚀 Simulation Complete. Results saved to 'simulation/report.json'.")
 
 if __name__ == "__main__":
-    run_simulation()
\ No newline at end of file
+    # --sequential: one /chat request per question (the old behaviour)
+    run_simulation(batch="--sequential" not in sys.argv)
\ No newline at end of file
@@ -1,6 +1,12 @@
 document.addEventListener("DOMContentLoaded", () => {
     const API_URL = "http://127.0.0.1:8000";
     let currentPdfUrl = null;
+    // Questions are scoped to the document on screen (null: search every document)
+    let currentDocument = null;
+    // Content hash of the document on screen: its PDF and page thumbnails are cached for good
+    let currentDocumentId = null;
+    // One conversation per page load: follow-up questions share history and retrieval
+    const sessionId = (crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random()}`).replace(/[^A-Za-z0-9_-]/g, '');
 
     // --- DOM Elements ---
     const chatBox = document.getElementById('chat-box');
@@ -75,14 +81,29 @@ document.addEventListener("DOMContentLoaded", () => {
             });
 
             if (response.ok) {
-                const data = await response.json();
-                
+                const job = await response.json();
+
+                // Identical file already indexed: no job, show it right away
+                let data = job;
+                if (job.status !== 'unchanged') {
+                    statusArea.innerHTML = `<div style="color: yellow;">⏳ Queued: ${job.original_name}</div>`;
+
+                    // Ingestion runs in the background; follow its progress over SSE
+                    data = await followJob(job.job_id, statusArea);
+                    if (!data) return;
+                }
+
                 statusArea.innerHTML = `<div style="color: #4ade80;">✅ Ready: ${data.filename}</div>`;
 
                 // --- THE FIX ---
                 // OLD: currentPdfUrl = URL.createObjectURL(file); 
                 // NEW: Use the file served by the backend
-                currentPdfUrl = `${API_URL}/files/${data.filename}`;
+                // Immutable (content-addressed) URL when available: reloads come from the browser cache
+                currentPdfUrl = data.document_id
+                    ? `${API_URL}/documents/${data.document_id}/pdf`
+                    : `${API_URL}/files/${data.filename}`;
+                currentDocument = data.filename;
+                currentDocumentId = data.document_id || null;
                 
                 // Show PDF Frame
                 const pdfFrame = document.getElementById('pdf-frame');
@@ -96,6 +117,8 @@ document.addEventListener("DOMContentLoaded", () => {
 
                 appendMessage(`I have read <strong>${data.original_name}</strong>. Ask me anything!`, 'bot');
 
+            } else if (response.status === 413) {
+                statusArea.innerHTML = `<div style="color: red;">❌ File too large</div>`;
             } else {
                 statusArea.innerHTML = `<div style="color: red;">❌ Upload Failed</div>`;
             }
@@ -106,6 +129,37 @@ document.addEventListener("DOMContentLoaded", () => {
     }
 
 
+    // Resolves with the job result once ingestion is done, or null if it failed / was cancelled
+    function followJob(jobId, statusArea) {
+        return new Promise((resolve) => {
+            const events = new EventSource(`${API_URL}/jobs/${jobId}/events`);
+
+            events.onmessage = (e) => {
+                const job = JSON.parse(e.data);
+
+                if (job.status === 'done') {
+                    events.close();
+                    resolve(job.result);
+                } else if (job.status === 'failed' || job.status === 'cancelled') {
+                    events.close();
+                    statusArea.innerHTML = `<div style="color: red;">❌ Ingestion ${job.status}: ${job.error || ''}</div>`;
+                    resolve(null);
+                } else {
+                    const pages = job.total_pages ? ` ${job.pages_done}/${job.total_pages} pages` : '';
+                    const eta = job.eta_seconds !== null ? ` (~${Math.ceil(job.eta_seconds)}s left)` : '';
+                    statusArea.innerHTML = `<div style="color: yellow;">⏳ ${job.stage}...${pages}${eta}</div>`;
+                }
+            };
+
+            events.onerror = () => {
+                events.close();
+                statusArea.innerHTML = `<div style="color: red;">❌ Lost connection to ingestion job</div>`;
+                resolve(null);
+            };
+        });
+    }
+
+
     // --- 3. THE CLICK FIX (Event Delegation) ---
     chatBox.addEventListener('click', (e) => {
         if (e.target.classList.contains('citation')) {
@@ -115,6 +169,33 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     });
 
+    // Citation previews: hovering a page number shows its thumbnail
+    const preview = document.createElement('img');
+    preview.className = 'citation-preview';
+    preview.alt = '';
+    preview.style.cssText = 'position: fixed; display: none; width: 200px; z-index: 1000; pointer-events: none; ' +
+        'background: white; border: 1px solid #334155; border-radius: 6px; box-shadow: 0 8px 24px rgba(0, 0, 0, 0.4);';
+    preview.addEventListener('error', () => { preview.style.display = 'none'; });
+    document.body.appendChild(preview);
+
+    function thumbnailUrl(pageNum) {
+        return `${API_URL}/documents/${currentDocumentId}/pages/${pageNum}/thumbnail`;
+    }
+
+    chatBox.addEventListener('mouseover', (e) => {
+        if (!e.target.classList.contains('citation') || !currentDocumentId) return;
+        const rect = e.target.getBoundingClientRect();
+        preview.src = thumbnailUrl(e.target.getAttribute('data-page'));
+        preview.style.left = `${Math.max(8, Math.min(rect.left, window.innerWidth - 216))}px`;
+        // Above the citation if there is room, otherwise below it
+        preview.style.top = rect.top > 300 ? `${rect.top - 292}px` : `${rect.bottom + 8}px`;
+        preview.style.display = 'block';
+    });
+
+    chatBox.addEventListener('mouseout', (e) => {
+        if (e.target.classList.contains('citation')) preview.style.display = 'none';
+    });
+
     function jumpToPage(pageNum) {
         if (!currentPdfUrl) {
             alert("⚠️ No PDF loaded yet. Please upload a file.");
@@ -191,7 +272,11 @@ document.addEventListener("DOMContentLoaded", () => {
             const response = await fetch(`${API_URL}/chat`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ message: text }) 
+                body: JSON.stringify({
+                    message: text,
+                    session_id: sessionId,
+                    documents: currentDocument ? [currentDocument] : null
+                })
             });
 
             const reader = response.body.getReader();
@@ -250,6 +335,13 @@ document.addEventListener("DOMContentLoaded", () => {
             });
             return `[Page ${links.join(', ')}]`;
         });
+
+        // Fetch the cited pages' thumbnails now, so hovering shows them instantly
+        if (currentDocumentId) {
+            element.querySelectorAll('.citation').forEach(citation => {
+                new Image().src = thumbnailUrl(citation.getAttribute('data-page'));
+            });
+        }
     }
 
     if (sendBtn) sendBtn.addEventListener('click', sendMessage);
@@ -0,0 +1,29 @@
+from backend import config
+from backend.chunking import Chunker, TokenCounter
+
+HEADING = "4.2 TIMER STATUS REGISTERS"
+PARAGRAPH = " ".join(
+    f"The timer status register bit {i} is set when the counter overflows and cleared by writing one."
+    for i in range(30)
+)
+
+def make_chunker() -> Chunker:
+    # The default settings; the reranker tokenizer (bundled) makes token counts exact
+    return Chunker(max_tokens=256, overlap_tokens=32, counter=TokenCounter(config.CHUNK_TOKENIZER_PATH))
+
+def test_heading_stays_with_oversized_paragraph():
+    chunker = make_chunker()
+    chunks = chunker.split_text(f"{HEADING}\n{PARAGRAPH}")
+
+    assert len(chunks) > 1
+    assert chunks[0].startswith(HEADING + "\n")
+    assert all(chunker.counter.count(c) <= chunker.max_tokens for c in chunks)
+    # Nothing of the paragraph is lost
+    assert " ".join(c.split("\n", 1)[-1] for c in chunks).split() == PARAGRAPH.split()
+
+def test_heading_starts_a_new_chunk():
+    chunks = make_chunker().split_text(f"Intro sentence.\n\n{HEADING}\nShort paragraph.")
+    assert chunks == ["Intro sentence.", f"{HEADING}\nShort paragraph."]
+
+def test_heading_only_page_is_kept():
+    assert make_chunker().split_text(HEADING) == [HEADING]
@@ -0,0 +1,52 @@
+import multiprocessing
+
+import numpy as np
+
+from backend.embedding_cache import DiskVectorStore, text_key
+
+DIM = 8
+
+def vector_of(key: bytes) -> np.ndarray:
+    # Derived from the key, so a key pointing at another text's vector shows up
+    return np.frombuffer(key[:DIM], dtype=np.uint8).astype(np.float32)
+
+def _write(directory: str, capacity: int, worker: int, count: int):
+    store = DiskVectorStore(directory, capacity, "test-model")
+    for batch in range(0, count, 5):
+        keys = [text_key(f"{worker}-{i}", "doc") for i in range(batch, batch + 5)]
+        store.put_many(keys, np.stack([vector_of(k) for k in keys]))
+        store.get_many(keys)
+    store.flush()
+
+def test_concurrent_writers_never_mix_up_vectors(tmp_path):
+    directory, capacity, workers, count = str(tmp_path), 64, 6, 40
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_write, args=(directory, capacity, w, count)) for w in range(workers)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert all(p.exitcode == 0 for p in procs)
+
+    store = DiskVectorStore(directory, capacity, "test-model")
+    # Every slot was handed out to exactly one write: the last 'capacity' vectors are all there
+    assert store.next_slot == (workers * count) % capacity
+    assert len(store) == capacity
+    keys = [text_key(f"{w}-{i}", "doc") for w in range(workers) for i in range(count)]
+    found = 0
+    for key, vector in zip(keys, store.get_many(keys)):
+        if vector is not None:
+            found += 1
+            assert np.allclose(vector, vector_of(key))
+    assert found == capacity
+
+def test_second_process_does_not_reset_the_store(tmp_path):
+    first = DiskVectorStore(str(tmp_path), 16, "test-model")
+    second = DiskVectorStore(str(tmp_path), 16, "test-model")  # Opened before any file existed
+    a, b = text_key("a", "doc"), text_key("b", "doc")
+    first.put_many([a], np.stack([vector_of(a)]))
+    second.put_many([b], np.stack([vector_of(b)]))
+
+    assert np.allclose(first.get_many([a])[0], vector_of(a))
+    assert np.allclose(second.get_many([a])[0], vector_of(a))  # Picked up when second wrote
+    assert DiskVectorStore(str(tmp_path), 16, "test-model").next_slot == 2
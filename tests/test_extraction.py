@@ -0,0 +1,53 @@
+import io
+
+import fitz
+from PIL import Image
+
+from backend import config
+from backend.pdf_extract import PageExtractor
+
+def png(color) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (120, 120), color).save(buf, format="PNG")
+    return buf.getvalue()
+
+def make_pdf(path, pages):
+    doc = fitz.open()
+    logo, diagram = png("red"), png("blue")
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {i + 1}")
+        page.insert_image(fitz.Rect(72, 100, 192, 220), stream=logo)
+        if i == 4:
+            page.insert_image(fitz.Rect(72, 300, 192, 420), stream=diagram)
+    doc.save(path)
+    doc.close()
+
+def test_ranges_come_in_page_order_and_bounded(tmp_path):
+    pdf = str(tmp_path / "doc.pdf")
+    make_pdf(pdf, 40)
+    for workers in (1, 2):
+        extractor = PageExtractor(workers=workers, min_pages_per_worker=4, max_pages_per_range=6)
+        ranges = list(extractor.iter_ranges(pdf, 40))
+        extractor.shutdown()
+        assert max(len(r) for r in ranges) <= 6
+        assert [p.page for r in ranges for p in r] == list(range(1, 41))
+
+def test_ingestion_describes_every_range(tmp_path, monkeypatch):
+    from backend.file_processor import MultimodalIngestor
+    from backend.vision import StubVisionClient
+
+    monkeypatch.setattr(config, "VISION_CACHE_DIR", str(tmp_path / "vision"))
+    pdf = str(tmp_path / "doc.pdf")
+    make_pdf(pdf, 10)
+    ingestor = MultimodalIngestor(api_key=None, extract_workers=1, vision_client=StubVisionClient())
+    ingestor.extractor.max_pages_per_range = 3
+    done = []
+    docs = ingestor.process_pdf(pdf, progress=lambda page, total: done.append(page))
+    ingestor.vision.shutdown()
+
+    assert [d.metadata["page"] for d in docs] == done == list(range(1, 11))
+    assert all("[Visual Diagram 1 Description]" in d.page_content for d in docs)
+    assert "[Visual Diagram 2 Description]" in docs[4].page_content
+    # The logo repeated on every page (and across ranges) is described once
+    assert ingestor.vision.stats()["deduplicated"] == 9
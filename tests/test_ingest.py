@@ -0,0 +1,64 @@
+import pytest
+from langchain_core.documents import Document
+
+from backend import config
+from backend.jobs import JobCancelled
+from backend.manifest import IndexManifest
+from backend.rag_engine import RAGEngine
+
+class FakeCollection:
+    def __init__(self):
+        self.rows = {}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.rows.update(zip(ids, documents))
+
+class FakeStore:
+    def __init__(self):
+        self._collection = FakeCollection()
+
+    def get(self, include=None):
+        return {"ids": list(self._collection.rows)}
+
+    def delete(self, ids):
+        for i in ids:
+            self._collection.rows.pop(i, None)
+
+class FakePartitions:
+    def __init__(self):
+        self.stores = {}
+
+    def store(self, source):
+        return self.stores.setdefault(source, FakeStore())
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[float(len(t)), 1.0] for t in texts]
+
+def make_engine(tmp_path):
+    engine = RAGEngine.__new__(RAGEngine)  # Just the ingestion path: no models, no Chroma
+    engine.manifest = IndexManifest(str(tmp_path / "manifest.json"))
+    engine.partitions = FakePartitions()
+    engine.embeddings = FakeEmbeddings()
+    return engine
+
+def pages(version: str, n: int = 6):
+    return {str(p): [Document(page_content=f"{version} page {p}", metadata={"page": p})] for p in range(1, n + 1)}
+
+def test_cancelled_reingest_leaves_the_old_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "INGEST_BATCH_SIZE", 2)
+    engine = make_engine(tmp_path)
+    engine._ingest_source("doc.pdf", pages("v1"), "h1", None)
+    before = dict(engine.partitions.store("doc.pdf")._collection.rows)
+    old_entry = engine.manifest.get_source("doc.pdf")
+
+    def cancel_midway(done, total):
+        if done:
+            raise JobCancelled("cancelled")
+
+    with pytest.raises(JobCancelled):
+        engine._ingest_source("doc.pdf", pages("v2"), "h2", cancel_midway)
+
+    # Only the old version is searchable, and the manifest still describes it
+    assert engine.partitions.store("doc.pdf")._collection.rows == before
+    assert engine.manifest.get_source("doc.pdf") == old_entry
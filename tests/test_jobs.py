@@ -0,0 +1,49 @@
+import threading
+
+from backend.jobs import Job, JobManager
+
+def test_job_state_is_visible_to_other_workers(tmp_path):
+    owner = JobManager(state_dir=str(tmp_path), write_interval=0)
+    other = JobManager(state_dir=str(tmp_path))
+    started, release = threading.Event(), threading.Event()
+
+    def pipeline(job):
+        job.set_stage("indexing")
+        job.set_progress(3, 10)
+        started.set()
+        release.wait(5)
+        return {"filename": "a.pdf"}
+
+    job = owner.submit(Job("a.pdf", "a.pdf"), pipeline)
+    assert started.wait(5)
+    view = other.get(job.id)
+    assert view is not None and not view.is_finished
+    assert view.to_dict()["stage"] == "indexing"
+    assert view.to_dict()["pages_done"] == 3
+
+    release.set()
+    job._future.result(5)
+    assert other.get(job.id).is_finished
+    assert other.get(job.id).to_dict()["result"] == {"filename": "a.pdf"}
+    assert other.get("0" * 32) is None
+    owner.shutdown()
+
+def test_cancel_through_another_worker(tmp_path):
+    owner = JobManager(state_dir=str(tmp_path), write_interval=0)
+    other = JobManager(state_dir=str(tmp_path))
+    started = threading.Event()
+
+    def pipeline(job):
+        started.set()
+        for i in range(500):
+            job.set_progress(i, 500)
+            threading.Event().wait(0.01)
+        return {}
+
+    job = owner.submit(Job("a.pdf", "a.pdf"), pipeline)
+    assert started.wait(5)
+    other.cancel(job.id)
+    job._future.result(10)
+    assert job.status == "cancelled"
+    assert other.get(job.id).to_dict()["status"] == "cancelled"
+    owner.shutdown()
@@ -0,0 +1,68 @@
+import multiprocessing
+
+from backend.manifest import IndexManifest
+
+def page(ids):
+    return {"1": {"hash": "h", "ids": ids}}
+
+def test_saves_from_two_processes_merge(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    a = IndexManifest(path, reload_interval=0)
+    b = IndexManifest(path, reload_interval=0)
+
+    a.set_source("a.pdf", "ha", page(["a1"]))
+    a.bump_version()
+    b.set_source("b.pdf", "hb", page(["b1"]))
+    b.bump_version()
+    a.save()
+    b.save()  # Must not erase a.pdf
+
+    fresh = IndexManifest(path)
+    assert sorted(fresh.sources()) == ["a.pdf", "b.pdf"]
+    assert fresh.version == 2
+
+def test_other_process_changes_are_picked_up(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    reader = IndexManifest(path, reload_interval=0)
+    writer = IndexManifest(path, reload_interval=0)
+    assert reader.sources() == [] and reader.version == 0
+
+    writer.set_source("new.pdf", "h", page(["n1"]))
+    writer.bump_version()
+    writer.save()
+    assert reader.sources() == ["new.pdf"]
+    assert reader.version == 1
+
+    writer.remove_source("new.pdf")
+    writer.bump_version()
+    writer.save()
+    assert reader.sources() == []
+    assert reader.version == 2
+
+def test_unsaved_changes_survive_a_reload(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    local = IndexManifest(path, reload_interval=0)
+    other = IndexManifest(path, reload_interval=0)
+
+    local.set_source("mine.pdf", "h", page(["m1"]))  # Mid-ingest, not saved yet
+    other.set_source("theirs.pdf", "h", page(["t1"]))
+    other.save()
+    assert sorted(local.sources()) == ["mine.pdf", "theirs.pdf"]
+
+def _ingest(path: str, name: str):
+    manifest = IndexManifest(path, reload_interval=0)
+    manifest.set_source(name, name, page([name]))
+    manifest.bump_version()
+    manifest.save()
+
+def test_concurrent_saves_lose_nothing(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_ingest, args=(path, f"doc{i}.pdf")) for i in range(8)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    manifest = IndexManifest(path)
+    assert len(manifest.sources()) == 8
+    assert manifest.version == 8
@@ -0,0 +1,30 @@
+import os
+import time
+
+from backend.office import prune_conversion_cache
+
+def cached(cache_dir, name, size, age_seconds):
+    path = os.path.join(cache_dir, f"{name}.pdf")
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    old = time.time() - age_seconds
+    os.utime(path, (old, old))
+    return path
+
+def test_only_entries_whose_stored_pdf_is_gone_count(tmp_path):
+    cache_dir, store_dir = tmp_path / "cache", tmp_path / "store"
+    cache_dir.mkdir()
+    store_dir.mkdir()
+    linked = cached(str(cache_dir), "linked", 100, age_seconds=7200)
+    os.link(linked, store_dir / "linked.pdf")  # Still in the upload store: costs nothing extra
+    oldest = cached(str(cache_dir), "oldest", 100, age_seconds=7200)
+    newer = cached(str(cache_dir), "newer", 100, age_seconds=3700)
+
+    assert prune_conversion_cache(str(cache_dir), max_bytes=150) == 1
+    assert not os.path.exists(oldest)
+    assert os.path.exists(newer) and os.path.exists(linked)
+
+def test_recent_entries_are_kept(tmp_path):
+    fresh = cached(str(tmp_path), "fresh", 100, age_seconds=10)
+    assert prune_conversion_cache(str(tmp_path), max_bytes=0) == 0
+    assert os.path.exists(fresh)
@@ -0,0 +1,43 @@
+import os
+
+from backend.manifest import IndexManifest
+from backend.partitions import PartitionedIndex, partition_name
+from backend.vector_snapshot import SnapshotWriter
+
+def ingest_elsewhere(tmp_path, source, vector, text):
+    """What another worker (or bulk_ingest.py) leaves behind: a published snapshot and a saved manifest entry."""
+    manifest = IndexManifest(str(tmp_path / "manifest.json"))
+    version = manifest.bump_version()
+    writer = SnapshotWriter(os.path.join(str(tmp_path / "snapshots"), partition_name(source)))
+    writer.add([f"{source}-1"], [vector], [text], [{"source": source, "page": 1}])
+    writer.publish(version)
+    manifest.set_source(source, "h-" + source, {"1": {"hash": "p", "ids": [f"{source}-1"]}}, version=version)
+    manifest.save()
+
+def make_index(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.json"), reload_interval=0)
+    return PartitionedIndex(client=None, embeddings=None, manifest=manifest, backend="snapshot",
+                            snapshot_root=str(tmp_path / "snapshots"))
+
+def test_documents_ingested_by_another_process_are_searched(tmp_path):
+    ingest_elsewhere(tmp_path, "a.pdf", [1.0, 0.0], "alpha")
+    index = make_index(tmp_path)
+    assert [doc.page_content for doc, _ in index.search([0.0, 1.0], k=5)] == ["alpha"]
+
+    ingest_elsewhere(tmp_path, "b.pdf", [0.0, 1.0], "beta")
+    assert index.sources() == ["a.pdf", "b.pdf"]
+    assert [doc.page_content for doc, _ in index.search([0.0, 1.0], k=5)] == ["beta", "alpha"]
+    assert [doc.page_content for doc, _ in index.search([0.0, 1.0], k=5, sources=["b.pdf"])] == ["beta"]
+    index.shutdown()
+
+def test_documents_removed_by_another_process_are_not_searched(tmp_path):
+    ingest_elsewhere(tmp_path, "a.pdf", [1.0, 0.0], "alpha")
+    ingest_elsewhere(tmp_path, "b.pdf", [0.0, 1.0], "beta")
+    index = make_index(tmp_path)
+    assert len(index.search([1.0, 1.0], k=5)) == 2
+
+    other = IndexManifest(str(tmp_path / "manifest.json"))
+    other.remove_source("b.pdf")
+    other.save()
+    assert [doc.page_content for doc, _ in index.search([1.0, 1.0], k=5)] == ["alpha"]
+    index.shutdown()
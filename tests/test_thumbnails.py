@@ -0,0 +1,35 @@
+import os
+
+import fitz
+
+from backend.thumbnails import ThumbnailStore
+
+HASH = "a" * 64
+
+def make_pdf(path, pages=3):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"Page {i + 1}")
+    doc.save(path)
+    doc.close()
+
+def test_render_keeps_pages_rendered_on_demand(tmp_path):
+    pdf = str(tmp_path / "doc.pdf")
+    make_pdf(pdf)
+    store = ThumbnailStore(str(tmp_path / "thumbs"))
+
+    on_demand = store.render_page(pdf, HASH, 2)
+    assert store.render(pdf, HASH) == 3
+    # The live directory was filled in place, not deleted and swapped
+    assert store.path(HASH, 2) == on_demand
+    assert all(store.path(HASH, page) for page in (1, 2, 3))
+    assert not [name for name in os.listdir(store.root) if name.startswith(".render-")]
+
+def test_render_moves_a_new_document_in_whole(tmp_path):
+    pdf = str(tmp_path / "doc.pdf")
+    make_pdf(pdf, pages=2)
+    store = ThumbnailStore(str(tmp_path / "thumbs"))
+
+    assert not store.has(HASH)
+    store.render(pdf, HASH)
+    assert sorted(os.listdir(os.path.join(store.root, HASH))) == ["1.jpg", "2.jpg"]
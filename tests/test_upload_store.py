@@ -0,0 +1,75 @@
+import os
+import time
+
+from backend.manifest import IndexManifest
+from backend.upload_store import UploadStore
+
+def stored(store, tmp_path, content: bytes, age_days: float):
+    src = tmp_path / "src.pdf"
+    src.write_bytes(content)
+    item = store.store_file(str(src))
+    old = time.time() - age_days * 86400
+    os.utime(item.path, (old, old))
+    return item
+
+def make_store(tmp_path, **overrides):
+    settings = dict(max_upload_bytes=10_000, retention_seconds=30 * 86400, max_total_bytes=10_000)
+    settings.update(overrides)
+    return UploadStore(str(tmp_path / "uploads"), **settings)
+
+def test_retention_keeps_indexed_files(tmp_path):
+    store = make_store(tmp_path)
+    indexed = stored(store, tmp_path, b"indexed", age_days=60)
+    orphan = stored(store, tmp_path, b"orphan", age_days=60)
+
+    manifest = IndexManifest(str(tmp_path / "manifest.json"))
+    manifest.set_source("indexed.pdf", indexed.file_hash, {"1": {"hash": "h", "ids": ["i1"]}})
+    manifest.save()
+
+    assert store.enforce_retention(in_use=manifest.file_hashes().__contains__) == 1
+    assert store.pdf_path(indexed.file_hash) == indexed.path
+    assert store.pdf_path(orphan.file_hash) is None
+
+def test_size_cap_skips_indexed_files(tmp_path):
+    store = make_store(tmp_path, max_total_bytes=10)
+    oldest = stored(store, tmp_path, b"a" * 8, age_days=3)
+    newer = stored(store, tmp_path, b"b" * 8, age_days=2)
+
+    # The oldest file is indexed: the cap is met by deleting the next one instead
+    assert store.enforce_retention(in_use={oldest.file_hash}.__contains__) == 1
+    assert os.path.exists(oldest.path)
+    assert not os.path.exists(newer.path)
+
+def limited_app(max_bytes):
+    from fastapi import FastAPI, File, UploadFile
+    from backend.upload_store import UploadSizeLimit
+
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimit, max_bytes=max_bytes)
+    seen = []
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        seen.append(len(await file.read()))
+        return {"size": seen[-1]}
+    return app, seen
+
+def test_oversized_uploads_are_refused_before_parsing():
+    from fastapi.testclient import TestClient
+
+    app, seen = limited_app(max_bytes=4096)
+    client = TestClient(app)
+    assert client.post("/upload", files={"file": ("a.pdf", b"x" * 1000)}).json() == {"size": 1000}
+
+    response = client.post("/upload", files={"file": ("a.pdf", b"x" * 10_000)})
+    assert response.status_code == 413
+
+    # No Content-Length (chunked): cut off while streaming
+    boundary = "b0undary"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.pdf\"\r\n\r\n".encode()
+            + b"x" * 10_000 + f"\r\n--{boundary}--\r\n".encode())
+    chunks = iter([body[i:i + 1024] for i in range(0, len(body), 1024)])
+    response = client.post("/upload", content=chunks,
+                           headers={"content-type": f"multipart/form-data; boundary={boundary}"})
+    assert response.status_code == 413
+    assert seen == [1000]  # The handler never ran for the oversized ones